@@ -0,0 +1,175 @@
+"""Benchmark antes/después de la migración 0001_indices_consultas.
+
+Carga un volumen grande de equipos, mantenimientos y notificaciones sintéticos
+y mide cada consulta de los servicios en su forma original (sin los índices
+nuevos, vía IGNORE INDEX, y con los filtros MONTH()/YEAR()) frente a la forma
+actual (rangos sargables con los índices). Imprime una tabla Markdown.
+
+Uso (contra el MySQL de docker-compose, puerto 3307):
+    pip install pymysql
+    python database/benchmarks/bench_indices.py --seed --equipos 200000 --mantenimientos 1000000
+    python database/benchmarks/bench_indices.py --runs 20
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+import pymysql
+
+BATCH = 5000
+ESTADOS = ["operativo", "operativo", "operativo", "mantenimiento", "baja"]
+TIPOS = ["preventivo", "correctivo", "predictivo"]
+
+EQUIPOS_IDX = "idx_equipos_fecha_registro, idx_equipos_estado_fecha, idx_equipos_categoria_fecha"
+
+CASES = [
+    (
+        "GET /equipos?estado=operativo",
+        f"SELECT * FROM equipos IGNORE INDEX ({EQUIPOS_IDX}) WHERE estado_operativo = 'operativo' ORDER BY fecha_registro DESC LIMIT 50",
+        "SELECT * FROM equipos WHERE estado_operativo = 'operativo' ORDER BY fecha_registro DESC LIMIT 50",
+    ),
+    (
+        "GET /equipos?categoria=Laptops",
+        f"""SELECT e.* FROM equipos e IGNORE INDEX ({EQUIPOS_IDX})
+            JOIN categorias_equipos c IGNORE INDEX (idx_categorias_nombre) ON e.categoria_id = c.id
+            WHERE c.nombre = 'Laptops' ORDER BY e.fecha_registro DESC LIMIT 50""",
+        """SELECT e.* FROM equipos e JOIN categorias_equipos c ON e.categoria_id = c.id
+            WHERE c.nombre = 'Laptops' ORDER BY e.fecha_registro DESC LIMIT 50""",
+    ),
+    (
+        "/dashboard equipos operativos",
+        f"SELECT COUNT(*) FROM equipos IGNORE INDEX ({EQUIPOS_IDX}) WHERE estado_operativo = 'operativo'",
+        "SELECT COUNT(*) FROM equipos WHERE estado_operativo = 'operativo'",
+    ),
+    (
+        "/dashboard mantenimientos del mes",
+        """SELECT COUNT(*), COALESCE(SUM(costo), 0) FROM mantenimientos IGNORE INDEX (idx_mantenimientos_programada)
+            WHERE MONTH(fecha_programada) = MONTH(CURRENT_DATE()) AND YEAR(fecha_programada) = YEAR(CURRENT_DATE())""",
+        """SELECT COUNT(*), COALESCE(SUM(costo), 0) FROM mantenimientos
+            WHERE fecha_programada >= CURRENT_DATE() - INTERVAL (DAYOFMONTH(CURRENT_DATE()) - 1) DAY
+            AND fecha_programada < CURRENT_DATE() - INTERVAL (DAYOFMONTH(CURRENT_DATE()) - 1) DAY + INTERVAL 1 MONTH""",
+    ),
+    (
+        "/costos-mantenimiento?year=2024",
+        """SELECT DATE_FORMAT(fecha_realizada, '%M') as mes, tipo, SUM(costo) FROM mantenimientos
+            IGNORE INDEX (idx_mantenimientos_realizada) WHERE YEAR(fecha_realizada) = 2024 GROUP BY mes, tipo""",
+        """SELECT DATE_FORMAT(fecha_realizada, '%M') as mes, tipo, SUM(costo) FROM mantenimientos
+            WHERE fecha_realizada >= '2024-01-01' AND fecha_realizada < '2025-01-01' GROUP BY mes, tipo""",
+    ),
+    (
+        "GET /notificaciones?leida=0",
+        "SELECT * FROM notificaciones IGNORE INDEX (idx_notificaciones_leida) WHERE leida = 0 ORDER BY id DESC LIMIT 10",
+        "SELECT * FROM notificaciones WHERE leida = 0 ORDER BY id DESC LIMIT 10",
+    ),
+]
+
+
+def seed(conn, n_equipos, n_mant, n_notif):
+    rnd = random.Random(42)
+    today = date.today()
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM categorias_equipos")
+        categorias = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT id FROM ubicaciones")
+        ubicaciones = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM equipos")
+        first_id = cur.fetchone()[0] + 1
+
+        for start in range(0, n_equipos, BATCH):
+            rows = []
+            for i in range(start, min(start + BATCH, n_equipos)):
+                registro = today - timedelta(days=rnd.randint(0, 2000), seconds=rnd.randint(0, 86399))
+                rows.append((
+                    f"BENCH-{first_id + i:08d}", rnd.choice(categorias), f"Equipo {i}", "Marca",
+                    rnd.choice(ubicaciones), rnd.choice(ESTADOS), rnd.randint(300, 5000), registro,
+                ))
+            cur.executemany(
+                """INSERT INTO equipos (codigo_inventario, categoria_id, nombre, marca, ubicacion_actual_id,
+                   estado_operativo, costo_compra, fecha_registro) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+                rows,
+            )
+            conn.commit()
+
+        cur.execute("SELECT MIN(id), MAX(id) FROM equipos")
+        min_id, max_id = cur.fetchone()
+        for start in range(0, n_mant, BATCH):
+            rows = []
+            for _ in range(start, min(start + BATCH, n_mant)):
+                programada = today - timedelta(days=rnd.randint(-60, 1500))
+                realizada = programada + timedelta(days=rnd.randint(0, 10)) if programada < today else None
+                rows.append((
+                    rnd.randint(min_id, max_id), rnd.choice(TIPOS), programada, realizada,
+                    rnd.randint(20, 900), "completado" if realizada else "programado",
+                ))
+            cur.executemany(
+                """INSERT INTO mantenimientos (equipo_id, tipo, fecha_programada, fecha_realizada, costo, estado)
+                   VALUES (%s, %s, %s, %s, %s, %s)""",
+                rows,
+            )
+            conn.commit()
+
+        for start in range(0, n_notif, BATCH):
+            rows = [
+                ("alerta", f"Notificación {i}", "Generada para benchmark", rnd.random() < 0.9)
+                for i in range(start, min(start + BATCH, n_notif))
+            ]
+            cur.executemany("INSERT INTO notificaciones (tipo, titulo, mensaje, leida) VALUES (%s, %s, %s, %s)", rows)
+            conn.commit()
+        cur.execute("ANALYZE TABLE equipos, mantenimientos, notificaciones")
+        cur.fetchall()
+
+
+def measure(cur, sql, runs):
+    cur.execute(sql)
+    cur.fetchall()
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        cur.execute(sql)
+        cur.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    cur.execute("EXPLAIN " + sql)
+    plan = cur.fetchone()
+    return statistics.median(timings), max(timings), plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3307)
+    parser.add_argument("--user", default="user_ti")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--db", default="ti_management")
+    parser.add_argument("--seed", action="store_true", help="cargar datos sintéticos antes de medir")
+    parser.add_argument("--equipos", type=int, default=200000)
+    parser.add_argument("--mantenimientos", type=int, default=1000000)
+    parser.add_argument("--notificaciones", type=int, default=300000)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    conn = pymysql.connect(host=args.host, port=args.port, user=args.user, password=args.password,
+                           database=args.db, cursorclass=pymysql.cursors.DictCursor)
+    if args.seed:
+        seed(conn, args.equipos, args.mantenimientos, args.notificaciones)
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT (SELECT COUNT(*) FROM equipos) e, (SELECT COUNT(*) FROM mantenimientos) m, "
+                    "(SELECT COUNT(*) FROM notificaciones) n")
+        counts = cur.fetchone()
+        print(f"\nequipos={counts['e']} mantenimientos={counts['m']} notificaciones={counts['n']} runs={args.runs}\n")
+        print("| Consulta | Antes (mediana / máx ms) | Plan antes | Después (mediana / máx ms) | Plan después | Mejora |")
+        print("|---|---|---|---|---|---|")
+        for name, before, after in CASES:
+            b_med, b_max, b_plan = measure(cur, before, args.runs)
+            a_med, a_max, a_plan = measure(cur, after, args.runs)
+            print(
+                f"| {name} | {b_med:.1f} / {b_max:.1f} | {b_plan['type']} {b_plan['key'] or '-'} ({b_plan['rows']} filas) "
+                f"| {a_med:.1f} / {a_max:.1f} | {a_plan['type']} {a_plan['key'] or '-'} ({a_plan['rows']} filas) "
+                f"| x{b_med / a_med if a_med else 0:.1f} |"
+            )
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
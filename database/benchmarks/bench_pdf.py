@@ -0,0 +1,136 @@
+"""Benchmark del PDF de inventario: render original frente al render por páginas.
+
+El original (POST /export/pdf antes de los trabajos en segundo plano) hacía
+fetchall(), armaba una sola Table con todas las filas y la construía con
+SimpleDocTemplate en un BytesIO. El actual (reportes_service/render.py) lee de
+a lotes y dibuja tablas del tamaño de una página directo en el archivo.
+
+Cada caso corre en un proceso aparte para medir su pico de memoria (ru_maxrss).
+Las filas son sintéticas por defecto, así que no hace falta MySQL; con --mysql
+se usa render_equipos_pdf contra la base (cargarla antes con bench_indices.py
+--seed) y el tamaño lo da la tabla equipos. Imprime una tabla Markdown.
+
+Uso:
+    python database/benchmarks/bench_pdf.py
+    python database/benchmarks/bench_pdf.py --rows 10000 100000 500000 --legacy-max 50000
+    python database/benchmarks/bench_pdf.py --mysql --port 3307
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "services", "reportes_service"))
+import render  # noqa: E402
+
+ESTADOS = ["operativo", "operativo", "operativo", "mantenimiento", "baja"]
+
+
+def synthetic_rows(n, grouped=False):
+    rnd = random.Random(42)
+    ubicaciones = [f"Pabellón {chr(65 + i)} - Aula {100 + j}" for i in range(8) for j in range(12)]
+    for i in range(n):
+        ubicacion = ubicaciones[i * len(ubicaciones) // n] if grouped else rnd.choice(ubicaciones)
+        yield (
+            f"BENCH-{i:08d}", f"Equipo {i}", rnd.choice(["Dell", "HP", "Lenovo", None]),
+            rnd.choice(ESTADOS), ubicacion, rnd.randint(300, 5000), ubicacion,
+        )
+
+
+def legacy_pdf(rows, output_path):
+    # Copia del render original: todas las filas en memoria y una sola Table
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+    from reportlab.lib.pagesizes import A4
+
+    data = list(rows)
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    table_data = [render.HEADER]
+    for row in data:
+        costo_fmt = f"${float(row[5]):,.2f}" if row[5] else "$0.00"
+        table_data.append([
+            str(row[0]), str(row[1])[:20], str(row[2]) if row[2] else '-',
+            str(row[3]), str(row[4])[:20], costo_fmt
+        ])
+    t = Table(table_data, colWidths=render.COL_WIDTHS)
+    t.setStyle(TableStyle(render.TABLE_STYLE))
+    doc.build([t])
+    with open(output_path, "wb") as f:
+        f.write(buffer.getvalue())
+    return {"filas": len(data), "paginas": doc.page}
+
+
+def run_case(args):
+    """Proceso hijo: genera un PDF e imprime sus métricas en JSON."""
+    output_path = args.output
+    started = time.perf_counter()
+    if args.mysql:
+        db_config = {"host": args.host, "port": args.port, "user": args.user, "password": args.password, "db": args.db}
+        result = render.render_equipos_pdf(db_config, output_path, agrupar_por=args.agrupar_por)
+    elif args.mode == "original":
+        result = legacy_pdf(synthetic_rows(args.case_rows), output_path)
+    else:
+        rows = synthetic_rows(args.case_rows, grouped=bool(args.agrupar_por))
+        result = render.write_equipos_pdf(rows, output_path, args.case_rows, args.agrupar_por)
+    result.update(
+        segundos=time.perf_counter() - started,
+        pico_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        archivo_mb=os.path.getsize(output_path) / 1024 / 1024,
+    )
+    print(json.dumps(result))
+
+
+def spawn(args, mode, rows, output_path):
+    command = [sys.executable, __file__, "--case", mode, "--case-rows", str(rows), "--output", output_path]
+    if args.agrupar_por:
+        command += ["--agrupar-por", args.agrupar_por]
+    if args.mysql:
+        command += ["--mysql", "--host", args.host, "--port", str(args.port), "--user", args.user,
+                    "--password", args.password, "--db", args.db]
+    out = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--legacy-max", type=int, default=50000,
+                        help="no medir el render original por encima de estas filas (tarda y consume demasiado)")
+    parser.add_argument("--agrupar-por", choices=sorted(render.GROUPS), default=None)
+    parser.add_argument("--mysql", action="store_true", help="leer los equipos de MySQL en vez de filas sintéticas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3307)
+    parser.add_argument("--user", default="user_ti")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--db", default="ti_management")
+    parser.add_argument("--case", dest="mode", choices=["original", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--case-rows", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_case(args)
+        return
+
+    sizes = [0] if args.mysql else args.rows
+    print("\n| Filas | Render | Tiempo (s) | Pico memoria (MB) | Páginas | Archivo (MB) |")
+    print("|---|---|---|---|---|---|")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            modes = ["streaming"] if args.mysql or args.agrupar_por else ["original", "streaming"]
+            for mode in modes:
+                if mode == "original" and rows > args.legacy_max:
+                    print(f"| {rows} | {mode} | - | - | - | - |")
+                    continue
+                r = spawn(args, mode, rows, os.path.join(tmp, f"{mode}_{rows}.pdf"))
+                print(f"| {r['filas']} | {mode} | {r['segundos']:.1f} | {r['pico_mb']:.0f} | {r['paginas']} | {r['archivo_mb']:.1f} |")
+
+
+if __name__ == "__main__":
+    main()
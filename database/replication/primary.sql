@@ -0,0 +1,6 @@
+-- Usuario con el que la réplica de lectura (mysql-replica) sigue el binlog del primario
+CREATE USER IF NOT EXISTS 'replicador'@'%' IDENTIFIED WITH mysql_native_password BY 'replica_password';
+GRANT REPLICATION SLAVE ON *.* TO 'replicador'@'%';
+
+-- Permite a los servicios consultar el retraso de replicación (DB_REPLICA_MAX_LAG)
+GRANT REPLICATION CLIENT ON *.* TO 'user_ti'@'%';
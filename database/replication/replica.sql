@@ -0,0 +1,11 @@
+-- La réplica arranca vacía y recibe todo (base, usuarios y esquema) desde el
+-- binlog del primario gracias a la posición automática por GTID
+CHANGE REPLICATION SOURCE TO
+    SOURCE_HOST = 'mysql',
+    SOURCE_PORT = 3306,
+    SOURCE_USER = 'replicador',
+    SOURCE_PASSWORD = 'replica_password',
+    SOURCE_AUTO_POSITION = 1,
+    GET_SOURCE_PUBLIC_KEY = 1;
+
+START REPLICA;
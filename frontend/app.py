@@ -35,28 +35,22 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def get_dashboard_data():
+def get_batch(peticiones, timeout=10):
+    # Una sola petición al gateway para todos los datos de la página
     try:
-        # Aumentamos el timeout a 10 segundos por si la DB está lenta
-        response = requests.get(f"{API_URL}/api/reportes/dashboard", timeout=10)
+        response = requests.post(f"{API_URL}/api/batch", json={"requests": peticiones}, timeout=timeout)
         if response.status_code == 200:
-            return response.json()
-        return None
+            return {r["id"]: r["body"] for r in response.json()["responses"] if r["status"] == 200}
+        return {}
     except Exception as e:
         # Imprimimos el error en la consola de Docker para depurar
-        print(f"Error conectando al dashboard: {e}")
-        return None
+        print(f"Error conectando al gateway: {e}")
+        return {}
 
-def get_notificaciones():
-    try:
-        response = requests.get(f"{API_URL}/api/agents/notificaciones?leida=false", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            if isinstance(data, list):
-                return data
-        return []
-    except:
-        return []
+datos = get_batch([
+    {"id": "dashboard", "service": "reportes", "path": "dashboard"},
+    {"id": "notificaciones", "service": "agents", "path": "notificaciones", "params": {"leida": 0}},
+])
 
 # Título principal con la clase corregida
 st.markdown('<div class="main-header">🖥️ Sistema de Gestión de Equipos de TI</div>', unsafe_allow_html=True)
@@ -68,7 +62,9 @@ with st.sidebar:
     st.divider()
     
     st.subheader("🔔 Notificaciones")
-    notificaciones = get_notificaciones()
+    notificaciones = datos.get("notificaciones")
+    if not isinstance(notificaciones, list):
+        notificaciones = []
     if notificaciones:
         st.warning(f"**{len(notificaciones)}** pendientes")
         with st.expander("Ver recientes"):
@@ -88,7 +84,7 @@ with st.sidebar:
                 st.error("Error al ejecutar agentes")
 
 # Dashboard Logic
-dashboard_data = get_dashboard_data()
+dashboard_data = datos.get("dashboard")
 
 if dashboard_data:
     # Fila 1
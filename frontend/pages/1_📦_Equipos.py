@@ -9,39 +9,85 @@ API_URL = os.getenv("API_GATEWAY_URL", "http://api-gateway:8000")
 
 st.title("📦 Gestión de Equipos")
 
-def get_data(endpoint, params=None):
+def get_batch(peticiones):
+    # Una sola petición al gateway para todos los datos de la página
     try:
-        response = requests.get(f"{API_URL}/api/{endpoint}", params=params)
-        if response.status_code == 200: return response.json()
+        response = requests.post(f"{API_URL}/api/batch", json={"requests": peticiones})
+        if response.status_code == 200:
+            return {r["id"]: r["body"] for r in response.json()["responses"] if r["status"] == 200}
     except: pass
-    return []
+    return {}
 
-tab1, tab2 = st.tabs(["📋 Lista de Equipos", "➕ Nuevo Equipo"])
+COLUMNAS = ['codigo_inventario', 'nombre', 'marca', 'modelo', 'estado_operativo', 'ubicacion_nombre']
+
+# Los filtros se leen del estado de la sesión para poder pedirlo todo junto
+params = {"fields": ",".join(COLUMNAS), "limit": 50}
+if st.session_state.get("cat_filter", "Todas") != "Todas": params['categoria'] = st.session_state["cat_filter"]
+if st.session_state.get("state_filter", "Todos") != "Todos": params['estado'] = st.session_state["state_filter"]
+
+# Cursores de las páginas visitadas; se reinician al cambiar los filtros
+filtros = (params.get('categoria'), params.get('estado'))
+if st.session_state.get("filtros_previos") != filtros:
+    st.session_state["filtros_previos"] = filtros
+    st.session_state["cursores"] = []
+if st.session_state["cursores"]: params['cursor'] = st.session_state["cursores"][-1]
+
+datos = get_batch([
+    {"id": "categorias", "service": "equipos", "path": "categorias"},
+    {"id": "equipos", "service": "equipos", "path": "equipos", "params": params},
+    {"id": "ubicaciones", "service": "equipos", "path": "ubicaciones"},
+])
+categorias = datos.get("categorias", [])
+pagina = datos.get("equipos", {})
+equipos = pagina.get("items", [])
+ubicaciones = datos.get("ubicaciones", [])
+
+tab1, tab2, tab3 = st.tabs(["📋 Lista de Equipos", "➕ Nuevo Equipo", "📥 Importar"])
 
 with tab1:
+    busqueda = st.text_input("🔎 Buscar por código, serie, nombre, marca, modelo o especificación")
+    if busqueda:
+        try:
+            res = requests.get(f"{API_URL}/api/equipos/equipos/buscar",
+                               params={"q": busqueda, "fields": ",".join(COLUMNAS)}, timeout=5)
+            if res.status_code == 200:
+                resultado = res.json()
+                st.caption(f"{resultado['total']} coincidencias")
+                if resultado["items"]:
+                    st.dataframe(pd.DataFrame(resultado["items"])[COLUMNAS], use_container_width=True)
+            else:
+                st.warning(res.json().get("detail", "Búsqueda no disponible"))
+        except Exception as e:
+            st.error(f"Error de conexión: {e}")
+        st.divider()
+
     col1, col2, col3 = st.columns(3)
-    categorias = get_data("equipos/categorias")
     cat_opts = ["Todas"] + [c['nombre'] for c in categorias]
     
-    with col1: cat_filter = st.selectbox("Categoría", cat_opts)
-    with col2: state_filter = st.selectbox("Estado", ["Todos", "operativo", "en_reparacion", "obsoleto"])
+    with col1: st.selectbox("Categoría", cat_opts, key="cat_filter")
+    with col2: st.selectbox("Estado", ["Todos", "operativo", "en_reparacion", "obsoleto"], key="state_filter")
     with col3: 
         st.write("")
         if st.button("🔄 Actualizar"):
             pass
 
-    params = {}
-    if cat_filter != "Todas": params['categoria'] = cat_filter
-    if state_filter != "Todos": params['estado'] = state_filter
-
-    equipos = get_data("equipos/equipos", params)
-    
     if equipos:
         df = pd.DataFrame(equipos)
-        st.dataframe(df[['codigo_inventario', 'nombre', 'marca', 'modelo', 'estado_operativo', 'ubicacion_nombre']], use_container_width=True)
+        st.dataframe(df[COLUMNAS], use_container_width=True)
     else:
         st.info("No se encontraron equipos")
 
+    p1, p2, p3 = st.columns([1, 1, 4])
+    # on_click actualiza el cursor antes de que la página se vuelva a ejecutar
+    with p1:
+        st.button("⬅️ Anterior", disabled=not st.session_state["cursores"],
+                  on_click=lambda: st.session_state["cursores"].pop())
+    with p2:
+        st.button("Siguiente ➡️", disabled=not pagina.get("next_cursor"),
+                  on_click=lambda: st.session_state["cursores"].append(pagina["next_cursor"]))
+    with p3:
+        st.caption(f"Página {len(st.session_state['cursores']) + 1}")
+
 with tab2:
     st.subheader("Registrar Nuevo Equipo")
     with st.form("new_team"):
@@ -56,7 +102,6 @@ with tab2:
             serie = st.text_input("Serie")
             costo = st.number_input("Costo", min_value=0.0)
             fecha = st.date_input("Fecha Compra")
-            ubicaciones = get_data("equipos/ubicaciones")
             ubi_id = st.selectbox("Ubicación", [u['id'] for u in ubicaciones], format_func=lambda x: next((u['nombre_completo'] for u in ubicaciones if u['id']==x),''))
 
         if st.form_submit_button("Guardar"):
@@ -78,4 +123,27 @@ with tab2:
                 else: 
                     st.error(f"Error al crear: {res.text}")
             except Exception as e:
-                st.error(f"Error de conexión: {e}")
\ No newline at end of file
+                st.error(f"Error de conexión: {e}")
+
+with tab3:
+    st.subheader("Importación masiva (CSV o Excel)")
+    st.caption("Columnas: codigo_inventario, nombre, categoria (o categoria_id), ubicacion ('Edificio - Aula'), "
+               "proveedor (razón social o RUC), marca, modelo, numero_serie, costo_compra, fecha_compra, "
+               "fecha_garantia_fin, estado_operativo, especificaciones (JSON), notas")
+    archivo = st.file_uploader("Archivo", type=["csv", "xlsx"])
+    atomico = st.checkbox("Todo o nada (si una fila falla no se importa ninguna)")
+    if archivo and st.button("Importar"):
+        try:
+            res = requests.post(f"{API_URL}/api/equipos/equipos/importar",
+                                params={"modo": "atomico" if atomico else "lotes"},
+                                files={"archivo": (archivo.name, archivo.getvalue())}, timeout=120)
+            if res.status_code == 200:
+                r = res.json()
+                st.success(f"✅ {r['insertados']} de {r['filas']} equipos importados en {r['duracion_ms'] / 1000:.1f} s")
+                if r["errores"]:
+                    st.warning(f"{r['con_errores']} filas con errores")
+                    st.dataframe(pd.DataFrame(r["errores"]), use_container_width=True)
+            else:
+                st.error(f"Error al importar: {res.text}")
+        except Exception as e:
+            st.error(f"Error de conexión: {e}")
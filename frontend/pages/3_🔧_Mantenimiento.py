@@ -2,7 +2,7 @@ import streamlit as st
 import requests
 import pandas as pd
 import os
-from datetime import date
+from datetime import date, timedelta
 
 st.set_page_config(page_title="Mantenimiento", page_icon="🔧", layout="wide")
 API_URL = os.getenv("API_GATEWAY_URL", "http://api-gateway:8000")
@@ -17,12 +17,30 @@ def get_data(endpoint):
     except: pass
     return []
 
-tab1, tab2 = st.tabs(["📅 Calendario y Estado", "➕ Programar Mantenimiento"])
+tab1, tab2, tab3 = st.tabs(["📅 Calendario y Estado", "➕ Programar Mantenimiento", "🗓️ Programación Masiva"])
 
 with tab1:
     st.subheader("Historial y Programación")
-    mantenimientos = get_data("mantenimientos/mantenimientos")
-    
+    hoy = date.today()
+    col_desde, col_hasta = st.columns(2)
+    ventana_desde = col_desde.date_input("Desde", value=hoy.replace(day=1), key="cal_desde")
+    ventana_hasta = col_hasta.date_input("Hasta", value=hoy.replace(day=1) + timedelta(days=60), key="cal_hasta")
+
+    # Solo la ventana visible: el servicio pagina y devuelve los conteos por día
+    calendario = {}
+    try:
+        res = requests.get(f"{API_URL}/api/mantenimientos/mantenimientos/calendario",
+                           params={"from": str(ventana_desde), "to": str(ventana_hasta), "limit": 1000}, timeout=5)
+        if res.status_code == 200:
+            calendario = res.json()
+    except: pass
+    mantenimientos = calendario.get("items", [])
+
+    if calendario.get("dias"):
+        st.bar_chart(pd.DataFrame(calendario["dias"]).set_index("fecha")["total"])
+    if calendario.get("next_cursor"):
+        st.caption("Se muestran las primeras 1000 órdenes de la ventana; acótela para ver el resto.")
+
     if mantenimientos and isinstance(mantenimientos, list):
         df = pd.DataFrame(mantenimientos)
         
@@ -45,8 +63,9 @@ with tab1:
 with tab2:
     st.subheader("Nueva Orden de Mantenimiento")
     
-    # Cargamos equipos para el dropdown
-    equipos = get_data("equipos/equipos")
+    # Cargamos equipos para el dropdown (solo las columnas que se muestran)
+    equipos = get_data("equipos/equipos?fields=id,codigo_inventario,nombre&limit=500")
+    equipos = equipos.get("items", []) if isinstance(equipos, dict) else []
     if equipos and isinstance(equipos, list):
         opciones = {e['id']: f"{e['codigo_inventario']} - {e['nombre']}" for e in equipos}
         
@@ -82,4 +101,49 @@ with tab2:
                 except Exception as e:
                     st.error(f"Error de conexión: {e}")
     else:
-        st.error("No se pudieron cargar los equipos. Verifique el servicio de Equipos.")
\ No newline at end of file
+        st.error("No se pudieron cargar los equipos. Verifique el servicio de Equipos.")
+with tab3:
+    st.subheader("Programar por Categoría o Ubicación")
+    categorias = get_data("equipos/categorias")
+    ubicaciones = get_data("equipos/ubicaciones")
+    cat_opciones = {None: "Todas", **{c["id"]: c["nombre"] for c in categorias}}
+    ubi_opciones = {None: "Todas", **{u["id"]: u["nombre_completo"] for u in ubicaciones}}
+
+    with st.form("form_lote"):
+        col1, col2 = st.columns(2)
+        with col1:
+            categoria_id = st.selectbox("Categoría", options=list(cat_opciones.keys()), format_func=lambda x: cat_opciones[x])
+            ubicacion_id = st.selectbox("Ubicación", options=list(ubi_opciones.keys()), format_func=lambda x: ubi_opciones[x])
+            tipo_lote = st.selectbox("Tipo", ["Preventivo", "Correctivo", "Actualización Software"], key="tipo_lote")
+            prioridad_lote = st.selectbox("Prioridad", ["Baja", "Media", "Alta", "Urgente"], key="prioridad_lote")
+        with col2:
+            desde = st.date_input("Desde", value=date.today())
+            hasta = st.date_input("Hasta", value=date.today())
+            capacidad = st.number_input("Máximo de órdenes por día", min_value=1, max_value=1000, value=10)
+            habiles = st.checkbox("Solo días hábiles", value=True)
+        descripcion_lote = st.text_area("Descripción", key="descripcion_lote")
+        col_a, col_b = st.columns(2)
+        previsualizar = col_a.form_submit_button("👁️ Previsualizar")
+        confirmar = col_b.form_submit_button("💾 Programar")
+
+    if previsualizar or confirmar:
+        payload = {
+            "categoria_id": categoria_id, "ubicacion_id": ubicacion_id,
+            "tipo": tipo_lote.lower(), "prioridad": prioridad_lote.lower(), "descripcion": descripcion_lote,
+            "desde": str(desde), "hasta": str(hasta), "capacidad_diaria": int(capacidad),
+            "solo_dias_habiles": habiles, "dry_run": not confirmar,
+        }
+        try:
+            res = requests.post(f"{API_URL}/api/mantenimientos/mantenimientos/lote", json=payload, timeout=30)
+            if res.status_code == 200:
+                r = res.json()
+                if r["dry_run"]:
+                    st.info(f"{r['programados']} órdenes a programar · {r['ya_programados']} equipos ya programados · {r['sin_cupo']} sin cupo")
+                else:
+                    st.success(f"✅ {r['programados']} mantenimientos programados")
+                if r["por_dia"]:
+                    st.bar_chart(pd.Series(r["por_dia"], name="órdenes"))
+            else:
+                st.error(f"Error: {res.json().get('detail', res.text)}")
+        except Exception as e:
+            st.error(f"Error de conexión: {e}")
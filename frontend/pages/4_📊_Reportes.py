@@ -3,6 +3,7 @@ import requests
 import pandas as pd
 import plotly.express as px
 import os
+import time
 from datetime import datetime
 
 st.set_page_config(page_title="Reportes", page_icon="📊", layout="wide")
@@ -10,22 +11,34 @@ API_URL = os.getenv("API_GATEWAY_URL", "http://api-gateway:8000")
 
 st.title("📊 Reportes y Análisis")
 
-# Función auxiliar segura
-def get_data_safe(endpoint):
+# Función auxiliar segura: todas las consultas de la página en un solo lote
+def get_batch_safe(endpoints):
+    peticiones = [{"id": e, "service": "reportes", "path": e, "params": p} for e, p in endpoints.items()]
+    datos = {e: [] for e in endpoints}
     try:
-        res = requests.get(f"{API_URL}/api/reportes/{endpoint}", timeout=5)
-        if res.status_code == 200:
-            data = res.json()
-            if isinstance(data, list):
-                return data
+        res = requests.post(f"{API_URL}/api/batch", json={"requests": peticiones}, timeout=10)
+        if res.status_code != 200:
+            st.error(f"Error del gateway: {res.status_code}")
+            return datos
+        for r in res.json()["responses"]:
+            if r["status"] != 200:
+                continue
+            if isinstance(r["body"], list):
+                datos[r["id"]] = r["body"]
             else:
                 # Si no es lista, es un error del backend devuelto como JSON
-                st.warning(f"Respuesta inesperada en {endpoint}: {data}")
-                return []
-        return []
+                st.warning(f"Respuesta inesperada en {r['id']}: {r['body']}")
+        return datos
     except Exception as e:
-        st.error(f"Error conectando a {endpoint}: {e}")
-        return []
+        st.error(f"Error conectando al gateway: {e}")
+        return datos
+
+datos = get_batch_safe({
+    "equipos-por-ubicacion": {},
+    "equipos-por-estado": {},
+    "costos-mantenimiento": {"year": datetime.now().year},
+    "equipos-por-categoria": {},
+})
 
 tab1, tab2, tab3 = st.tabs(["📈 Gráficos", "📄 Exportar", "🔍 Análisis"])
 
@@ -33,7 +46,7 @@ with tab1:
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("### 📍 Equipos por Ubicación")
-        data = get_data_safe("equipos-por-ubicacion")
+        data = datos["equipos-por-ubicacion"]
         if data:
             fig = px.bar(pd.DataFrame(data), x='ubicacion', y='cantidad', title="Distribución por Ubicación")
             st.plotly_chart(fig, use_container_width=True)
@@ -42,7 +55,7 @@ with tab1:
             
     with col2:
         st.markdown("### 🟢 Equipos por Estado")
-        data = get_data_safe("equipos-por-estado")
+        data = datos["equipos-por-estado"]
         if data:
             # Aseguramos nombres de columnas correctos según el API
             df = pd.DataFrame(data)
@@ -54,7 +67,7 @@ with tab1:
 
     st.markdown("---")
     st.markdown("### 💵 Costos Mantenimiento (Año Actual)")
-    data = get_data_safe(f"costos-mantenimiento?year={datetime.now().year}")
+    data = datos["costos-mantenimiento"]
     if data:
         df = pd.DataFrame(data)
         if not df.empty:
@@ -66,30 +79,80 @@ with tab2:
     col1, col2 = st.columns(2)
     with col1:
         st.info("Generar PDF con listado de equipos")
+        agrupar = st.selectbox("Agrupar con subtotales por", ["Sin agrupar", "Ubicación", "Categoría"])
+        agrupar_por = {"Ubicación": "ubicacion", "Categoría": "categoria"}.get(agrupar)
         
-        # Lógica de descarga directa
+        # El PDF se genera en segundo plano: se crea el trabajo y se consulta su avance
         if st.button("📄 Generar PDF"):
-            with st.spinner("Generando documento..."):
+            try:
+                res = requests.post(f"{API_URL}/api/reportes/export/jobs", json={"tipo": "equipos", "agrupar_por": agrupar_por}, timeout=10)
+                if res.status_code == 202:
+                    st.session_state["reporte_job"] = res.json()["id"]
+                else:
+                    st.error(f"Error en el servidor al generar PDF: {res.json().get('detail', res.status_code)}")
+            except Exception as e:
+                st.error(f"Fallo conexión: {e}")
+
+        job_id = st.session_state.get("reporte_job")
+        if job_id:
+            barra = st.progress(0.0, text="En cola...")
+            try:
+                while True:
+                    job = requests.get(f"{API_URL}/api/reportes/export/jobs/{job_id}", timeout=10).json()
+                    barra.progress(min(float(job.get("progreso") or 0), 1.0), text=job.get("mensaje") or job.get("estado", ""))
+                    if job.get("estado") not in ("pendiente", "procesando"):
+                        break
+                    time.sleep(1)
+
+                if job.get("estado") == "listo":
+                    archivo = requests.get(f"{API_URL}/api/reportes/export/jobs/{job_id}/file", timeout=60)
+                    st.download_button(
+                        label="📥 Descargar PDF Ahora",
+                        data=archivo.content,
+                        file_name="reporte_equipos.pdf",
+                        mime="application/pdf"
+                    )
+                    st.success("Documento generado. Haz clic arriba para bajarlo.")
+                else:
+                    st.error(f"Error en el servidor al generar PDF: {job.get('error') or job.get('detail')}")
+                    del st.session_state["reporte_job"]
+            except Exception as e:
+                st.error(f"Fallo conexión: {e}")
+
+    with col2:
+        st.info("Planillas de inventario, mantenimientos y costos")
+        hojas = st.multiselect(
+            "Hojas", ["equipos", "mantenimientos", "costos"], default=["equipos", "mantenimientos", "costos"]
+        )
+        rango = st.date_input("Mantenimientos entre", value=(), help="Vacío: todo el historial")
+        params = {}
+        if len(rango) == 2:
+            params = {"desde": rango[0].isoformat(), "hasta": rango[1].isoformat()}
+
+        formato = st.radio("Formato", ["Excel (.xlsx)", "CSV (una hoja)"], horizontal=True)
+        if st.button("📗 Generar planilla") and hojas:
+            with st.spinner("Exportando..."):
                 try:
-                    # Hacemos la petición al backend
-                    res = requests.post(f"{API_URL}/api/reportes/export/pdf", json={"type": "equipos"})
-                    
-                    if res.status_code == 200:
-                        # Si es exitoso, mostramos el botón de descarga real
-                        st.download_button(
-                            label="📥 Descargar PDF Ahora",
-                            data=res.content,
-                            file_name="reporte_equipos.pdf",
-                            mime="application/pdf"
+                    if formato.startswith("Excel"):
+                        res = requests.get(
+                            f"{API_URL}/api/reportes/export/xlsx",
+                            params={**params, "hojas": ",".join(hojas)}, timeout=300
                         )
-                        st.success("Documento generado. Haz clic arriba para bajarlo.")
+                        nombre, mime = "inventario.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    else:
+                        res = requests.get(
+                            f"{API_URL}/api/reportes/export/csv", params={**params, "hoja": hojas[0]}, timeout=300
+                        )
+                        nombre, mime = f"{hojas[0]}.csv", "text/csv"
+                    if res.status_code == 200:
+                        st.download_button(label="📥 Descargar planilla", data=res.content, file_name=nombre, mime=mime)
                     else:
-                        st.error("Error en el servidor al generar PDF")
+                        st.error(f"Error en el servidor al exportar: {res.status_code}")
                 except Exception as e:
                     st.error(f"Fallo conexión: {e}")
 
 with tab3:
     st.subheader("Análisis de Valor")
-    data = get_data_safe("equipos-por-categoria")
+    data = datos["equipos-por-categoria"]
     if data:
         st.dataframe(pd.DataFrame(data), use_container_width=True)
\ No newline at end of file
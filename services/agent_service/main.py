@@ -1,18 +1,21 @@
 from fastapi import FastAPI
 import aiomysql
-import os
+from common.compression import CompressionMiddleware
+from common.metrics import instrument, timed_execute
+from common.db import ReadYourWritesMiddleware, db, db_lifespan
 
-app = FastAPI(title="Agent Service")
+app = FastAPI(title="Agent Service", lifespan=db_lifespan)
+# Comprime JSON grandes en el salto hacia el gateway
+app.add_middleware(CompressionMiddleware)
+# Escrituras y peticiones con X-Read-Your-Writes leen del primario, no de réplicas
+app.add_middleware(ReadYourWritesMiddleware)
+# Latencias por ruta y por sentencia SQL en /metrics (formato Prometheus)
+instrument(app, "agent")
 
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'mysql'),
-    'user': os.getenv('DB_USER', 'user_ti'),
-    'password': os.getenv('DB_PASSWORD', 'password'),
-    'db': os.getenv('DB_NAME', 'ti_management'),
-    'port': 3306,
-    'autocommit': True,
-    'charset': 'utf8mb4'
-}
+@app.get("/db/pool")
+async def db_pool_stats():
+    # Uso del pool, para dimensionarlo frente a max_connections de MySQL
+    return db.stats()
 
 @app.post("/run-all-agents")
 async def run_agents():
@@ -22,8 +25,7 @@ async def run_agents():
 @app.get("/notificaciones")
 async def notificaciones(leida: int = 0):
     # MySQL usa 1/0 para booleanos
-    pool = await aiomysql.create_pool(**DB_CONFIG)
-    async with pool.acquire() as conn:
+    async with db.acquire(readonly=True) as conn:
         async with conn.cursor(aiomysql.DictCursor) as cur:
-            await cur.execute("SELECT * FROM notificaciones WHERE leida = %s ORDER BY id DESC LIMIT 10", (leida,))
+            await timed_execute(cur, "SELECT * FROM notificaciones WHERE leida = %s ORDER BY id DESC LIMIT 10", (leida,))
             return await cur.fetchall()
\ No newline at end of file
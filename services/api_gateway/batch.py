@@ -0,0 +1,61 @@
+import base64
+import json
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import StreamingResponse
+
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    service: str
+    path: str
+    params: Optional[Dict[str, Any]] = None
+    body: Optional[Any] = None
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+
+class SubRequest:
+    """Petición interna con la misma interfaz que usa el proxy de una Request real."""
+
+    def __init__(self, item):
+        self.method = item.method.upper()
+        self.query_params = QueryParams({k: str(v) for k, v in (item.params or {}).items()})
+        self._body = json.dumps(item.body).encode() if item.body is not None else b""
+        # El salto al servicio va igual en gzip (send_upstream); identity hace que
+        # stream_response entregue el cuerpo ya descomprimido a decode_body
+        raw_headers = [(b"accept-encoding", b"identity")]
+        if self._body:
+            raw_headers += [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(self._body)).encode()),
+            ]
+        self.headers = Headers(raw=raw_headers)
+
+    async def stream(self):
+        yield self._body
+
+
+async def read_body(response):
+    if isinstance(response, StreamingResponse):
+        try:
+            return b"".join([chunk async for chunk in response.body_iterator])
+        finally:
+            if response.background is not None:
+                await response.background()
+    return response.body
+
+
+def decode_body(content_type, body):
+    if not body:
+        return {"body": None}
+    if "json" in content_type:
+        return {"body": json.loads(body)}
+    if content_type.startswith("text/"):
+        return {"body": body.decode("utf-8", errors="replace")}
+    # Contenido binario (ej. PDF): se devuelve en base64
+    return {"body": base64.b64encode(body).decode(), "encoding": "base64"}
@@ -0,0 +1,130 @@
+import hashlib
+import time
+from collections import OrderedDict
+from pools import env_bool, env_int
+
+# TTL (segundos) por ruta GET cacheable: (servicio, ruta) -> ttl
+CACHE_RULES = {
+    ("equipos", "categorias"): 300,
+    ("equipos", "ubicaciones"): 300,
+    ("proveedores", "proveedores"): 120,
+    ("reportes", "dashboard"): 15,
+    ("reportes", "equipos-por-ubicacion"): 60,
+    ("reportes", "equipos-por-estado"): 60,
+    ("reportes", "equipos-por-categoria"): 60,
+    ("reportes", "costos-mantenimiento"): 60,
+}
+
+# Una escritura en un servicio invalida también a los que leen sus tablas
+INVALIDATES = {
+    "equipos": {"equipos", "reportes"},
+    "proveedores": {"proveedores", "equipos", "reportes"},
+    "mantenimientos": {"mantenimientos", "reportes"},
+}
+
+# Cabeceras que no se guardan: se recalculan al servir desde la caché
+UNCACHED_HEADERS = {"content-length", "content-encoding", "etag"}
+
+
+class CacheEntry:
+    def __init__(self, body, status_code, headers, ttl):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {k: v for k, v in headers.items() if k.lower() not in UNCACHED_HEADERS}
+        self.etag = headers.get("etag") or f'"{hashlib.sha1(body).hexdigest()}"'
+        self.expires_at = time.monotonic() + ttl
+
+    @property
+    def size(self):
+        return len(self.body)
+
+    def is_fresh(self):
+        return time.monotonic() < self.expires_at
+
+
+class ResponseCache:
+    """Caché LRU en memoria para GETs idempotentes, acotada por entradas y bytes."""
+
+    def __init__(self, rules=CACHE_RULES, max_entries=1000, max_bytes=50 * 1024 * 1024):
+        self.rules = rules
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        # Generación por servicio: evita guardar respuestas leídas antes de una escritura
+        self.generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def ttl_for(self, service_name, path):
+        return self.rules.get((service_name, path.strip("/")))
+
+    @staticmethod
+    def make_key(service_name, path, query_params):
+        query = "&".join(f"{k}={v}" for k, v in sorted(query_params.multi_items()))
+        return (service_name, path.strip("/"), query)
+
+    def generation(self, service_name):
+        return self.generations.get(service_name, 0)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or not entry.is_fresh():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key, entry, generation):
+        if generation != self.generation(key[0]) or entry.size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = entry
+        self.total_bytes += entry.size
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, service_name):
+        affected = INVALIDATES.get(service_name, {service_name})
+        for name in affected:
+            self.generations[name] = self.generation(name) + 1
+        for key in [k for k in self.entries if k[0] in affected]:
+            self._remove(key)
+            self.invalidations += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry.size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def build_cache():
+    if not env_bool("GATEWAY_CACHE_ENABLED", True):
+        return ResponseCache(rules={})
+    return ResponseCache(
+        max_entries=env_int("GATEWAY_CACHE_MAX_ENTRIES", 1000),
+        max_bytes=env_int("GATEWAY_CACHE_MAX_BYTES", 50 * 1024 * 1024),
+    )
@@ -0,0 +1,63 @@
+import asyncio
+from collections import Counter
+from pools import env_bool
+
+# Rutas GET cuyas peticiones idénticas simultáneas se resuelven con una sola
+# llamada al microservicio. Solo respuestas pequeñas: el resultado se guarda
+# completo en memoria para repartirlo entre todos los que esperan.
+COALESCE_ROUTES = {
+    ("equipos", "categorias"),
+    ("equipos", "ubicaciones"),
+    ("proveedores", "proveedores"),
+    ("reportes", "dashboard"),
+    ("reportes", "equipos-por-ubicacion"),
+    ("reportes", "equipos-por-estado"),
+    ("reportes", "equipos-por-categoria"),
+    ("reportes", "costos-mantenimiento"),
+    ("agents", "notificaciones"),
+}
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una única ejecución."""
+
+    def __init__(self, routes=COALESCE_ROUTES):
+        self.routes = routes
+        self.in_flight = {}
+        self.executions = 0
+        self.coalesced = Counter()
+
+    def enabled_for(self, service_name, path):
+        return (service_name, path.strip("/")) in self.routes
+
+    async def do(self, key, fn):
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.coalesced[f"{key[0]}/{key[1]}"] += 1
+        else:
+            # La llamada corre en su propia tarea: si el cliente que la inició
+            # se desconecta, los demás siguen recibiendo el resultado
+            task = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: self._finish(key, t))
+            self.in_flight[key] = task
+            self.executions += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self.in_flight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # marca la excepción como recuperada
+
+    def stats(self):
+        return {
+            "in_flight": len(self.in_flight),
+            "upstream_calls": self.executions,
+            "coalesced_total": sum(self.coalesced.values()),
+            "coalesced_by_route": dict(self.coalesced),
+        }
+
+
+def build_singleflight():
+    if not env_bool("GATEWAY_COALESCE_ENABLED", True):
+        return SingleFlight(routes=set())
+    return SingleFlight()
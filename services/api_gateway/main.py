@@ -1,8 +1,20 @@
 from fastapi import FastAPI, Request, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
+import asyncio
+import contextvars
 import httpx
 import os
-
-app = FastAPI(title="API Gateway - Sistema TI")
+import time
+from typing import Optional
+from pools import build_pools, close_pools
+from cache import CacheEntry, ResponseCache, build_cache
+from coalescing import build_singleflight
+from resilience import ServiceUnavailable, build_guards
+from batch import BatchRequest, SubRequest, decode_body, read_body
+from common.compression import CompressionMiddleware, accepts, compression_stats
+from common.metrics import instrument
 
 # Definir URLs de los microservicios
 SERVICES = {
@@ -13,6 +25,39 @@ SERVICES = {
     "agents": os.getenv("AGENT_SERVICE_URL", "http://agent-service:8000"),
 }
 
+BATCH_MAX_ITEMS = int(os.getenv("GATEWAY_BATCH_MAX_ITEMS", 20))
+
+# Cabeceras propias de cada conexión que no deben reenviarse entre saltos
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+REQUEST_EXCLUDED_HEADERS = HOP_BY_HOP_HEADERS | {"host"}
+# uvicorn ya agrega las suyas en la respuesta del gateway
+RESPONSE_EXCLUDED_HEADERS = HOP_BY_HOP_HEADERS | {"date", "server"}
+# Al leer la respuesta completa el cuerpo queda descomprimido y con otro tamaño
+BUFFERED_EXCLUDED_HEADERS = RESPONSE_EXCLUDED_HEADERS | {"content-length", "content-encoding"}
+
+def filter_headers(headers, excluded):
+    return {k: v for k, v in headers.items() if k.lower() not in excluded}
+
+@asynccontextmanager
+async def lifespan(app):
+    # Un cliente por microservicio, reutilizado entre peticiones (keep-alive)
+    app.state.pools = build_pools(SERVICES)
+    app.state.cache = build_cache()
+    app.state.singleflight = build_singleflight()
+    app.state.guards = build_guards(SERVICES)
+    yield
+    await close_pools(app.state.pools)
+
+app = FastAPI(title="API Gateway - Sistema TI", lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+instrument(app, "api_gateway", expand_params={"service_name": set(SERVICES)}, queries=False)
+
+# Tiempo acumulado esperando a los microservicios en la petición actual (Server-Timing)
+upstream_timing = contextvars.ContextVar("upstream_timing", default=None)
+
 @app.get("/")
 async def root():
     return {"message": "API Gateway Funcionando"}
@@ -21,38 +66,242 @@ async def root():
 async def health_check():
     return {"status": "gateway_active"}
 
-@app.api_route("/api/{service_name}/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
-async def gateway_proxy(service_name: str, path: str, request: Request):
+@app.get("/admin/pools")
+async def pools_stats():
+    return {name: pool.snapshot() for name, pool in app.state.pools.items()}
+
+@app.get("/admin/upstreams")
+async def upstreams_stats():
+    return {name: guard.snapshot() for name, guard in app.state.guards.items()}
+
+@app.get("/admin/compression")
+async def compression_stats_view():
+    return compression_stats.snapshot()
+
+@app.get("/admin/cache")
+async def cache_stats():
+    return app.state.cache.stats()
+
+@app.get("/admin/coalescing")
+async def coalescing_stats():
+    return app.state.singleflight.stats()
+
+@app.delete("/admin/cache")
+async def cache_clear(service: Optional[str] = None):
+    cache = app.state.cache
+    for name in ([service] if service else list(SERVICES)):
+        cache.invalidate(name)
+    return {"message": "Caché invalidada", **cache.stats()}
+
+async def send_upstream(service_name, path, request):
+    pool = app.state.pools[service_name]
+    guard = app.state.guards[service_name]
+    # El cuerpo se reenvía en streaming, sin cargarlo en memoria del gateway
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    
+    # Petición al microservicio (conexión tomada del pool del servicio)
+    headers = filter_headers(request.headers, REQUEST_EXCLUDED_HEADERS)
+    # El salto interno siempre va comprimido; se adapta al cliente al responder
+    headers["accept-encoding"] = "gzip"
+    upstream_request = pool.client.build_request(
+        method=request.method,
+        url=f"/{path}",
+        headers=headers,
+        params=request.query_params,
+        content=request.stream() if has_body else None,
+        timeout=pool.timeout_for(path),
+    )
+    
+    # Bulkhead + circuit breaker: falla rápido si el servicio está caído o saturado.
+    # El permiso se devuelve con el resultado cuando termina el cuerpo (ticket.release)
+    ticket = await guard.acquire()
+    started = time.perf_counter()
+    try:
+        upstream_response = await pool.send(upstream_request, stream=True)
+    except httpx.PoolTimeout:
+        # Saturación del propio gateway, no cuenta como fallo del servicio
+        ticket.release(success=None)
+        raise
+    except BaseException:
+        ticket.release(success=False)
+        raise
+    timing = upstream_timing.get()
+    if timing is not None:
+        timing["upstream"] += time.perf_counter() - started
+    return upstream_response, ticket
+
+async def guarded_body(content, upstream_response, ticket):
+    # El cuerpo cuenta para el bulkhead y el circuito: un corte a mitad es un fallo
+    outcome = None
+    try:
+        async for chunk in content:
+            yield chunk
+        outcome = upstream_response.status_code < 500
+    except httpx.HTTPError:
+        outcome = False
+        raise
+    finally:
+        ticket.release(success=outcome)
+
+def stream_response(upstream_response, ticket, request):
+    # --- CORRECCIÓN CLAVE ---
+    # Devolvemos los bytes crudos a medida que llegan, con el status y las
+    # cabeceras del microservicio. Sirve para JSONs y también Archivos (PDFs)
+    content = upstream_response.aiter_raw()
+    excluded = RESPONSE_EXCLUDED_HEADERS
+    encoding = upstream_response.headers.get("content-encoding")
+    if encoding and not accepts(request.headers.get("accept-encoding", ""), encoding):
+        # El cliente no entiende la codificación del servicio: se descomprime aquí
+        content = upstream_response.aiter_bytes()
+        excluded = BUFFERED_EXCLUDED_HEADERS
+
+    async def close():
+        await upstream_response.aclose()
+        # Si el cliente se fue antes de empezar el cuerpo, el permiso se libera aquí
+        ticket.release(success=None)
+
+    return StreamingResponse(
+        guarded_body(content, upstream_response, ticket),
+        status_code=upstream_response.status_code,
+        headers=filter_headers(upstream_response.headers, excluded),
+        background=BackgroundTask(close),
+    )
+
+def etag_matches(if_none_match, etag):
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def cached_response(entry, request, cache_status):
+    cache = app.state.cache
+    headers = {**entry.headers, "etag": entry.etag, "x-cache": cache_status}
+    if etag_matches(request.headers.get("if-none-match", ""), entry.etag):
+        cache.not_modified += 1
+        headers.pop("content-type", None)
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, status_code=entry.status_code, headers=headers)
+
+async def fetch_buffered(service_name, path, request):
+    upstream_response, ticket = await send_upstream(service_name, path, request)
+    outcome = None
+    try:
+        body = await upstream_response.aread()
+        outcome = upstream_response.status_code < 500
+    except httpx.HTTPError:
+        outcome = False
+        raise
+    finally:
+        ticket.release(success=outcome)
+        await upstream_response.aclose()
+    return upstream_response.status_code, filter_headers(upstream_response.headers, BUFFERED_EXCLUDED_HEADERS), body
+
+async def coalesced_fetch(service_name, path, request):
+    """GETs idénticos en vuelo comparten una sola llamada al microservicio.
+
+    Devuelve (generación, status, headers, body). La generación de la caché se
+    lee justo antes de llamar al servicio y forma parte de la clave: tras una
+    invalidación nadie se suma a una llamada que empezó antes de la escritura.
+    """
+    cache = app.state.cache
+
+    async def fetch():
+        generation = cache.generation(service_name)
+        return (generation, *await fetch_buffered(service_name, path, request))
+
+    singleflight = app.state.singleflight
+    if not singleflight.enabled_for(service_name, path):
+        return await fetch()
+    key = (*ResponseCache.make_key(service_name, path, request.query_params), cache.generation(service_name))
+    return await singleflight.do(key, fetch)
+
+async def cached_get(service_name, path, request, ttl):
+    cache = app.state.cache
+    key = cache.make_key(service_name, path, request.query_params)
+    # "Cache-Control: no-cache" fuerza a consultar al microservicio
+    bypass = "no-cache" in request.headers.get("cache-control", "")
+    entry = None if bypass else cache.get(key)
+    if entry is not None:
+        return cached_response(entry, request, "HIT")
+    
+    generation, status_code, headers, body = await coalesced_fetch(service_name, path, request)
+    if status_code != 200:
+        return Response(content=body, status_code=status_code, headers=headers)
+    
+    entry = CacheEntry(body, status_code, headers, ttl)
+    # Si hubo una escritura mientras tanto, la respuesta puede ser anterior: no se guarda
+    if generation == cache.generation(service_name):
+        cache.set(key, entry, generation)
+    return cached_response(entry, request, "MISS")
+
+def server_timing(total, upstream, cache_status):
+    parts = [f"gateway;dur={(total - upstream) * 1000:.1f}", f"upstream;dur={upstream * 1000:.1f}"]
+    if cache_status:
+        parts.append(f'cache;desc="{cache_status}"')
+    return ", ".join(parts)
+
+async def proxy_request(service_name, path, request):
+    # Mide el tiempo propio del gateway frente al de los microservicios
+    timing = {"upstream": 0.0}
+    token = upstream_timing.set(timing)
+    started = time.perf_counter()
+    try:
+        response = await forward_request(service_name, path, request)
+    finally:
+        upstream_timing.reset(token)
+    total = time.perf_counter() - started
+    response.headers["server-timing"] = server_timing(total, timing["upstream"], response.headers.get("x-cache"))
+    return response
+
+async def forward_request(service_name, path, request):
     if service_name not in SERVICES:
         raise HTTPException(status_code=404, detail=f"Servicio '{service_name}' no encontrado")
     
-    target_url = f"{SERVICES[service_name]}/{path}"
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            # Reenviar el cuerpo de la petición original
-            body = await request.body()
-            
-            # Petición al microservicio
-            upstream_response = await client.request(
-                method=request.method,
-                url=target_url,
-                headers=request.headers,
-                params=request.query_params,
-                content=body,
-                timeout=30.0
-            )
-            
-            # --- CORRECCIÓN CLAVE ---
-            # Devolvemos la respuesta cruda (bytes) y el tipo de contenido correcto
-            # Esto permite pasar JSONs y también Archivos (PDFs)
-            return Response(
-                content=upstream_response.content,
-                status_code=upstream_response.status_code,
-                media_type=upstream_response.headers.get("content-type")
-            )
-            
-        except httpx.ConnectError:
-            raise HTTPException(status_code=503, detail=f"El servicio {service_name} no está disponible")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Gateway Error: {str(e)}")
\ No newline at end of file
+    try:
+        # Quien pide leer sus propias escrituras no puede recibir una copia cacheada
+        if request.method == "GET" and not request.headers.get("x-read-your-writes"):
+            ttl = app.state.cache.ttl_for(service_name, path)
+            if ttl:
+                return await cached_get(service_name, path, request, ttl)
+            if app.state.singleflight.enabled_for(service_name, path):
+                _, status_code, headers, body = await coalesced_fetch(service_name, path, request)
+                return Response(content=body, status_code=status_code, headers=headers)
+        
+        upstream_response, ticket = await send_upstream(service_name, path, request)
+        if request.method != "GET":
+            # Cualquier escritura deja obsoletas las lecturas cacheadas del servicio
+            app.state.cache.invalidate(service_name)
+        return stream_response(upstream_response, ticket, request)
+        
+    except ServiceUnavailable as e:
+        raise HTTPException(status_code=503, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    except httpx.PoolTimeout:
+        raise HTTPException(status_code=503, detail=f"El servicio {service_name} está saturado, intente nuevamente")
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail=f"El servicio {service_name} no respondió a tiempo")
+    except httpx.ConnectError:
+        raise HTTPException(status_code=503, detail=f"El servicio {service_name} no está disponible")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Gateway Error: {str(e)}")
+
+async def run_batch_item(index, item):
+    result = {"id": item.id if item.id is not None else str(index), "service": item.service, "path": item.path}
+    try:
+        response = await proxy_request(item.service, item.path.strip("/"), SubRequest(item))
+        body = await read_body(response)
+        result["status"] = response.status_code
+        result.update(decode_body(response.headers.get("content-type", ""), body))
+    except HTTPException as e:
+        result.update({"status": e.status_code, "body": {"detail": e.detail}})
+    return result
+
+@app.post("/api/batch")
+async def gateway_batch(batch: BatchRequest):
+    # Varias peticiones a los microservicios en un solo viaje del cliente,
+    # ejecutadas en paralelo y con el mismo caché/protecciones que el proxy
+    if len(batch.requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo {BATCH_MAX_ITEMS} peticiones por lote")
+    results = await asyncio.gather(*[run_batch_item(i, item) for i, item in enumerate(batch.requests)])
+    return {"responses": results}
+
+@app.api_route("/api/{service_name}/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+async def gateway_proxy(service_name: str, path: str, request: Request):
+    return await proxy_request(service_name, path, request)
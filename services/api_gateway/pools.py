@@ -0,0 +1,165 @@
+import os
+import time
+import httpx
+from common.metrics import observe_pool_wait
+
+
+def env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+def env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "si")
+
+
+def service_setting(service_name, key, default, cast):
+    # Valores globales del gateway; cada upstream puede sobreescribirlos
+    # con el prefijo del servicio (ej. REPORTES_MAX_CONNECTIONS=5)
+    return cast(f"{service_name.upper()}_{key}", cast(f"GATEWAY_{key}", default))
+
+
+# Rutas que hacen mucho más trabajo que una consulta: plazo propio, por debajo de
+# lo que espera el cliente para que el gateway conteste antes de que este se rinda
+ROUTE_TIMEOUTS = {
+    ("equipos", "equipos/importar"): env_float("EQUIPOS_IMPORT_TIMEOUT", 110.0),
+}
+
+
+def pool_config(service_name):
+    def setting(key, default, cast):
+        return service_setting(service_name, key, default, cast)
+
+    return {
+        "timeout": setting("TIMEOUT", 30.0, env_float),
+        "max_connections": setting("MAX_CONNECTIONS", 50, env_int),
+        "max_keepalive": setting("MAX_KEEPALIVE", 20, env_int),
+        "keepalive_expiry": setting("KEEPALIVE_EXPIRY", 30.0, env_float),
+        "pool_timeout": setting("POOL_TIMEOUT", 5.0, env_float),
+        "http2": setting("HTTP2", False, env_bool),
+    }
+
+
+class UpstreamPool:
+    """Cliente HTTP de larga vida hacia un microservicio, con métricas de uso."""
+
+    def __init__(self, name, base_url, config):
+        self.name = name
+        self.base_url = base_url
+        self.config = config
+        http2 = config["http2"]
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print(f"⚠️ HTTP/2 solicitado para {name} pero 'h2' no está instalado, usando HTTP/1.1")
+                http2 = False
+        self.http2 = http2
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=config["max_connections"],
+                max_keepalive_connections=config["max_keepalive"],
+                keepalive_expiry=config["keepalive_expiry"],
+            ),
+            timeout=httpx.Timeout(config["timeout"], pool=config["pool_timeout"]),
+        )
+        self.in_flight = 0
+        # Conexiones ocupadas (en HTTP/2, flujos), contadas con los eventos de
+        # traza y no con el estado interno del pool de httpcore
+        self.connections_in_use = 0
+        self.connections_in_use_max = 0
+        self.connections_opened = 0
+        self.total_requests = 0
+        self.pool_timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def timeout_for(self, path):
+        seconds = ROUTE_TIMEOUTS.get((self.name, path.strip("/")))
+        if seconds is None:
+            return httpx.USE_CLIENT_DEFAULT
+        return httpx.Timeout(seconds, pool=self.config["pool_timeout"])
+
+    async def send(self, request, stream=False):
+        checkout = _Checkout(self, time.perf_counter())
+        request.extensions["trace"] = checkout
+        self.in_flight += 1
+        self.total_requests += 1
+        try:
+            return await self.client.send(request, stream=stream)
+        except httpx.PoolTimeout:
+            self.pool_timeouts += 1
+            raise
+        except BaseException:
+            # Fallos al conectar no llegan a "response_closed"
+            checkout.release()
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "limits": self.config,
+            "connections_in_use": self.connections_in_use,
+            "connections_in_use_max": self.connections_in_use_max,
+            "connections_opened": self.connections_opened,
+            "in_flight": self.in_flight,
+            "total_requests": self.total_requests,
+            "pool_timeouts": self.pool_timeouts,
+            "wait_avg_ms": round(self.wait_total / self.total_requests * 1000, 3) if self.total_requests else 0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class _Checkout:
+    """Traza de httpcore de una petición: espera por una conexión y tiempo que la ocupa.
+
+    El primer evento marca el fin de la espera por una conexión libre (nueva o
+    reutilizada del pool) y "response_closed" su devolución, también cuando la
+    petición falla tras enviarse.
+    """
+
+    def __init__(self, pool, started):
+        self.pool = pool
+        self.started = started
+        self.acquired = False
+        self.released = False
+
+    async def __call__(self, event_name, info):
+        pool = self.pool
+        if not self.acquired:
+            self.acquired = True
+            waited = time.perf_counter() - self.started
+            pool.wait_total += waited
+            pool.wait_max = max(pool.wait_max, waited)
+            observe_pool_wait(pool.name, waited)
+            pool.connections_in_use += 1
+            pool.connections_in_use_max = max(pool.connections_in_use_max, pool.connections_in_use)
+        if event_name == "connection.connect_tcp.complete":
+            pool.connections_opened += 1
+        elif event_name.endswith(".response_closed.started"):
+            self.release()
+
+    def release(self):
+        if self.acquired and not self.released:
+            self.released = True
+            self.pool.connections_in_use -= 1
+
+
+def build_pools(services):
+    return {name: UpstreamPool(name, url, pool_config(name)) for name, url in services.items()}
+
+
+async def close_pools(pools):
+    for pool in pools.values():
+        await pool.close()
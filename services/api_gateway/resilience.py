@@ -0,0 +1,142 @@
+import asyncio
+import time
+from pools import env_float, env_int, service_setting
+
+
+class ServiceUnavailable(Exception):
+    def __init__(self, detail, retry_after=1):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def guard_config(service_name):
+    def setting(key, default, cast):
+        return service_setting(service_name, key, default, cast)
+
+    return {
+        "max_in_flight": setting("MAX_IN_FLIGHT", 20, env_int),
+        "max_queue": setting("MAX_QUEUE", 50, env_int),
+        "queue_timeout": setting("QUEUE_TIMEOUT", 5.0, env_float),
+        "failure_threshold": setting("CB_FAILURES", 5, env_int),
+        "reset_timeout": setting("CB_RESET", 30.0, env_float),
+    }
+
+
+class GuardTicket:
+    """Permiso de una petición: se devuelve una sola vez, con su resultado."""
+
+    def __init__(self, guard, probe, started):
+        self.guard = guard
+        self.probe = probe
+        self.started = started
+        self.released = False
+
+    def release(self, success):
+        if not self.released:
+            self.released = True
+            self.guard.release(self, success)
+
+
+class UpstreamGuard:
+    """Bulkhead (máximo de peticiones en vuelo + cola acotada) y circuit breaker
+    por microservicio, para que un servicio lento no arrastre a los demás.
+
+    acquire() devuelve un GuardTicket; el permiso se libera al terminar la
+    respuesta completa (cuerpo incluido), no al llegar las cabeceras.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.semaphore = asyncio.Semaphore(config["max_in_flight"])
+        self.in_flight = 0
+        self.queued = 0
+        self.shed = 0
+        self.rejected_open = 0
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = float("-inf")
+        self.probe_in_flight = False
+        self.times_opened = 0
+
+    def _check_circuit(self):
+        """Devuelve True si esta petición es la prueba del circuito medio abierto."""
+        if self.state == self.OPEN:
+            remaining = self.config["reset_timeout"] - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                self.rejected_open += 1
+                raise ServiceUnavailable(f"El servicio {self.name} no responde (circuito abierto)", retry_after=int(remaining) + 1)
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            # Solo una petición de prueba mientras el circuito está medio abierto
+            if self.probe_in_flight:
+                self.rejected_open += 1
+                raise ServiceUnavailable(f"El servicio {self.name} se está recuperando, intente nuevamente")
+            self.probe_in_flight = True
+            return True
+        return False
+
+    async def acquire(self):
+        started = time.monotonic()
+        probe = self._check_circuit()
+        try:
+            if self.semaphore.locked() and self.queued >= self.config["max_queue"]:
+                self._shed()
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.config["queue_timeout"])
+            except asyncio.TimeoutError:
+                self._shed()
+            finally:
+                self.queued -= 1
+        except BaseException:
+            if probe:
+                self.probe_in_flight = False
+            raise
+        self.in_flight += 1
+        return GuardTicket(self, probe, started)
+
+    def _shed(self):
+        self.shed += 1
+        raise ServiceUnavailable(f"El servicio {self.name} está saturado, intente nuevamente")
+
+    def release(self, ticket, success):
+        self.in_flight -= 1
+        self.semaphore.release()
+        if ticket.probe:
+            self.probe_in_flight = False
+        elif self.state != self.CLOSED or ticket.started < self.opened_at:
+            # Empezó antes de que se abriera el circuito: su resultado no dice
+            # nada del estado actual; mientras está medio abierto solo cuenta la prueba
+            return
+        if success is None:
+            return
+        if success:
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+            return
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.config["failure_threshold"]:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        return {
+            "limits": self.config,
+            "circuit": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "shed": self.shed,
+            "rejected_open": self.rejected_open,
+        }
+
+
+def build_guards(services):
+    return {name: UpstreamGuard(name, guard_config(name)) for name in services}
@@ -0,0 +1,70 @@
+import hashlib
+from starlette.datastructures import QueryParams
+import cache
+
+
+def entry(body=b"{}", ttl=60, **headers):
+    return cache.CacheEntry(body, 200, {"content-type": "application/json", **headers}, ttl)
+
+
+def test_entry_etag_and_stored_headers():
+    generated = entry(b"abc", **{"content-length": "3", "content-encoding": "gzip"})
+    assert generated.etag == f'"{hashlib.sha1(b"abc").hexdigest()}"'
+    assert generated.headers == {"content-type": "application/json"}
+    # El ETag del servicio se respeta
+    assert entry(etag='"v7"').etag == '"v7"'
+
+
+def test_key_ignores_param_order_and_slashes():
+    a = cache.ResponseCache.make_key("equipos", "/categorias/", QueryParams("b=2&a=1&a=0"))
+    b = cache.ResponseCache.make_key("equipos", "categorias", QueryParams("a=0&a=1&b=2"))
+    assert a == b == ("equipos", "categorias", "a=0&a=1&b=2")
+
+
+def test_ttl_rules():
+    responses = cache.ResponseCache()
+    assert responses.ttl_for("equipos", "/categorias") == 300
+    assert responses.ttl_for("equipos", "equipos") is None
+
+
+def test_expired_entry_is_a_miss(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    responses = cache.ResponseCache()
+    key = ("equipos", "categorias", "")
+    responses.set(key, entry(ttl=10), 0)
+    assert responses.get(key) is not None
+    now[0] += 10
+    assert responses.get(key) is None
+    assert (responses.hits, responses.misses, responses.total_bytes) == (1, 1, 0)
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    responses = cache.ResponseCache(max_entries=2, max_bytes=10)
+    for name in ("a", "b"):
+        responses.set(("s", name, ""), entry(b"1234"), 0)
+    responses.get(("s", "a", ""))
+    responses.set(("s", "c", ""), entry(b"1234"), 0)
+    assert list(responses.entries) == [("s", "a", ""), ("s", "c", "")]
+    # 4 + 4 + 6 bytes supera el máximo: sale la menos usada
+    responses.set(("s", "d", ""), entry(b"123456"), 0)
+    assert list(responses.entries) == [("s", "c", ""), ("s", "d", "")]
+    assert responses.total_bytes == 10 and responses.evictions == 2
+    # Más grande que toda la caché: no se guarda
+    responses.set(("s", "e", ""), entry(b"x" * 11), 0)
+    assert ("s", "e", "") not in responses.entries
+
+
+def test_invalidate_cascades_and_drops_stale_reads():
+    responses = cache.ResponseCache()
+    before = responses.generation("reportes")
+    responses.set(("reportes", "dashboard", ""), entry(), before)
+    responses.set(("proveedores", "proveedores", ""), entry(), responses.generation("proveedores"))
+    responses.invalidate("equipos")
+    assert list(responses.entries) == [("proveedores", "proveedores", "")]
+    assert responses.invalidations == 1
+    # Respuesta leída antes de la escritura: llega tarde y no se guarda
+    responses.set(("reportes", "dashboard", ""), entry(), before)
+    assert ("reportes", "dashboard", "") not in responses.entries
+    responses.set(("reportes", "dashboard", ""), entry(), responses.generation("reportes"))
+    assert ("reportes", "dashboard", "") in responses.entries
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+import coalescing
+
+KEY = ("reportes", "dashboard", "", 0)
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = coalescing.SingleFlight()
+        calls = []
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return {"total": 3}
+
+        waiters = [asyncio.create_task(flight.do(KEY, fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+        assert results == [{"total": 3}] * 3
+        assert len(calls) == 1
+        assert flight.stats() == {
+            "in_flight": 0,
+            "upstream_calls": 1,
+            "coalesced_total": 2,
+            "coalesced_by_route": {"reportes/dashboard": 2},
+        }
+        # Terminada la llamada, la siguiente vuelve al servicio
+        await flight.do(KEY, fetch)
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_waiter():
+    async def scenario():
+        flight = coalescing.SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0)
+            raise ConnectionError("caído")
+
+        results = await asyncio.gather(*[flight.do(KEY, fetch) for _ in range(2)], return_exceptions=True)
+        assert [type(r) for r in results] == [ConnectionError, ConnectionError]
+        assert flight.in_flight == {}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flight = coalescing.SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "ok"
+
+        first = asyncio.create_task(flight.do(KEY, fetch))
+        second = asyncio.create_task(flight.do(KEY, fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        assert await second == "ok"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+
+def test_enabled_routes():
+    flight = coalescing.SingleFlight()
+    assert flight.enabled_for("equipos", "/categorias/")
+    assert not flight.enabled_for("equipos", "equipos")
+    assert not coalescing.SingleFlight(routes=set()).enabled_for("equipos", "categorias")
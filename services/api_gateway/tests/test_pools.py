@@ -0,0 +1,64 @@
+import asyncio
+import httpx
+import pools
+
+
+async def serve(reader, writer):
+    # HTTP/1.1 mínimo con keep-alive: cada petición recibe el mismo cuerpo
+    while await reader.readuntil(b"\r\n\r\n"):
+        writer.write(b"HTTP/1.1 200 OK\r\ncontent-length: 2\r\n\r\nok")
+        await writer.drain()
+
+
+def make_pool(port):
+    config = pools.pool_config("prueba")
+    return pools.UpstreamPool("prueba", f"http://127.0.0.1:{port}", config)
+
+
+async def check_counts():
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    pool = make_pool(server.sockets[0].getsockname()[1])
+    try:
+        first = await pool.send(pool.client.build_request("GET", "/"), stream=True)
+        second = await pool.send(pool.client.build_request("GET", "/"), stream=True)
+        assert pool.snapshot()["connections_in_use"] == 2
+        await first.aread()
+        await first.aclose()
+        assert pool.snapshot()["connections_in_use"] == 1
+        await second.aclose()
+
+        # La tercera reutiliza una conexión del pool: no abre otra
+        response = await pool.send(pool.client.build_request("GET", "/"))
+        assert response.text == "ok"
+        snapshot = pool.snapshot()
+        assert snapshot["connections_in_use"] == 0
+        assert snapshot["connections_in_use_max"] == 2
+        assert snapshot["connections_opened"] == 2
+        assert snapshot["total_requests"] == 3
+    finally:
+        await pool.close()
+        server.close()
+
+
+async def check_failed_request():
+    # Conexión rechazada: nunca se ocupó una conexión del pool
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    server.close()
+    await server.wait_closed()
+    pool = make_pool(port)
+    try:
+        await pool.send(pool.client.build_request("GET", "/"))
+    except httpx.ConnectError:
+        pass
+    finally:
+        await pool.close()
+    assert pool.snapshot()["connections_in_use"] == 0
+
+
+def test_connection_counts_follow_requests():
+    asyncio.run(check_counts())
+
+
+def test_failed_connect_releases_connection():
+    asyncio.run(check_failed_request())
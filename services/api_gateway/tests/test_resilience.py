@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+import resilience
+
+
+def config(**overrides):
+    return {"max_in_flight": 1, "max_queue": 1, "queue_timeout": 5.0, "failure_threshold": 2, "reset_timeout": 30.0, **overrides}
+
+
+def test_bulkhead_queues_then_sheds():
+    async def scenario():
+        guard = resilience.UpstreamGuard("prueba", config())
+        first = await guard.acquire()
+        waiting = asyncio.create_task(guard.acquire())
+        await asyncio.sleep(0)
+        assert guard.queued == 1
+        # Cola llena: la tercera se rechaza sin esperar
+        with pytest.raises(resilience.ServiceUnavailable, match="saturado"):
+            await guard.acquire()
+        first.release(success=True)
+        second = await waiting
+        assert guard.in_flight == 1 and guard.queued == 0
+        second.release(success=True)
+        second.release(success=False)
+        assert guard.in_flight == 0 and guard.consecutive_failures == 0
+        assert guard.snapshot()["shed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_sheds():
+    async def scenario():
+        guard = resilience.UpstreamGuard("prueba", config(queue_timeout=0.01))
+        await guard.acquire()
+        with pytest.raises(resilience.ServiceUnavailable):
+            await guard.acquire()
+        assert guard.queued == 0 and guard.shed == 1
+
+    asyncio.run(scenario())
+
+
+def test_circuit_opens_and_rejects():
+    async def scenario():
+        guard = resilience.UpstreamGuard("prueba", config(max_in_flight=5))
+        stale = await guard.acquire()
+        for _ in range(2):
+            (await guard.acquire()).release(success=False)
+        assert guard.state == guard.OPEN
+        with pytest.raises(resilience.ServiceUnavailable, match="circuito abierto") as e:
+            await guard.acquire()
+        assert e.value.retry_after > 1
+        # Empezó antes de abrirse el circuito: su éxito no lo cierra
+        stale.release(success=True)
+        assert guard.state == guard.OPEN and guard.rejected_open == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("success, state", [(True, "closed"), (False, "open"), (None, "half_open")])
+def test_half_open_allows_one_probe(success, state):
+    async def scenario():
+        guard = resilience.UpstreamGuard("prueba", config(max_in_flight=5, failure_threshold=1, reset_timeout=0))
+        (await guard.acquire()).release(success=False)
+        probe = await guard.acquire()
+        assert probe.probe and guard.state == guard.HALF_OPEN
+        with pytest.raises(resilience.ServiceUnavailable, match="recuperando"):
+            await guard.acquire()
+        probe.release(success=success)
+        assert guard.state == state
+        assert not guard.probe_in_flight
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_probe_frees_the_slot():
+    async def scenario():
+        guard = resilience.UpstreamGuard("prueba", config(failure_threshold=1, reset_timeout=0))
+        (await guard.acquire()).release(success=False)
+        # Sin hueco libre: la prueba queda esperando en la cola
+        await guard.semaphore.acquire()
+        probe = asyncio.create_task(guard.acquire())
+        await asyncio.sleep(0)
+        assert guard.probe_in_flight
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert not guard.probe_in_flight and guard.queued == 0
+
+    asyncio.run(scenario())
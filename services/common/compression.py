@@ -0,0 +1,219 @@
+import os
+import time
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+
+# Codificaciones opcionales: se ofrecen solo si la librería está instalada
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+
+# Tipos ya comprimidos: comprimirlos otra vez solo gasta CPU
+SKIP_CONTENT_TYPES = (
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/x-7z-compressed",
+    "application/vnd.openxmlformats-officedocument",
+    "image/",
+    "audio/",
+    "video/",
+)
+
+
+class _GzipEncoder:
+    def __init__(self):
+        self.obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.obj.compress(data) + self.obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data):
+        return self.obj.compress(data) + self.obj.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        self.obj = brotli.Compressor(quality=4)
+
+    def compress(self, data):
+        return self.obj.process(data) + self.obj.flush()
+
+    def finish(self, data):
+        return self.obj.process(data) + self.obj.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self):
+        self.obj = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data):
+        return self.obj.compress(data) + self.obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data):
+        return self.obj.compress(data) + self.obj.flush()
+
+
+# Orden de preferencia cuando el cliente acepta varias con la misma prioridad
+ENCODERS = {"gzip": _GzipEncoder}
+if brotli is not None:
+    ENCODERS = {"br": _BrotliEncoder, **ENCODERS}
+if zstandard is not None:
+    ENCODERS = {"zstd": _ZstdEncoder, **ENCODERS}
+
+
+def parse_accept_encoding(accept_encoding):
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def accepts(accept_encoding, encoding):
+    accepted = parse_accept_encoding(accept_encoding)
+    return accepted.get(encoding, accepted.get("*", 0)) > 0
+
+
+def negotiate(accept_encoding, available=None):
+    accepted = parse_accept_encoding(accept_encoding)
+    best, best_q = None, 0.0
+    for name in available or ENCODERS:
+        q = accepted.get(name, accepted.get("*", 0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionStats:
+    def __init__(self):
+        self.by_encoding = {}
+        self.skipped = {"small": 0, "content_type": 0, "already_encoded": 0}
+
+    def record(self, encoding, bytes_in, bytes_out, cpu_seconds):
+        stats = self.by_encoding.setdefault(encoding, {"chunks": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0})
+        stats["chunks"] += 1
+        stats["bytes_in"] += bytes_in
+        stats["bytes_out"] += bytes_out
+        stats["cpu_seconds"] += cpu_seconds
+
+    def snapshot(self):
+        result = {"min_size": MIN_SIZE, "available": list(ENCODERS), "skipped": dict(self.skipped), "encodings": {}}
+        for name, stats in self.by_encoding.items():
+            result["encodings"][name] = {
+                **stats,
+                "bytes_saved": stats["bytes_in"] - stats["bytes_out"],
+                "ratio": round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else 0,
+                "cpu_seconds": round(stats["cpu_seconds"], 6),
+            }
+        return result
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """Comprime las respuestas según Accept-Encoding (zstd, br o gzip), a partir
+    de un tamaño mínimo y sin tocar contenido ya comprimido o ya codificado."""
+
+    def __init__(self, app, minimum_size=MIN_SIZE, encodings=None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = [e for e in (encodings or ENCODERS) if e in ENCODERS]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app, encoding, minimum_size):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.initial_message = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _encode(self, body, more_body):
+        started = time.thread_time()
+        out = self.encoder.compress(body) if more_body else self.encoder.finish(body)
+        compression_stats.record(self.encoding, len(body), len(out), time.thread_time() - started)
+        return out
+
+    async def send_compressed(self, message):
+        if message["type"] == "http.response.start":
+            # Se retiene hasta ver el primer trozo del cuerpo
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers:
+                compression_stats.skipped["already_encoded"] += 1
+                self.passthrough = True
+            elif headers.get("content-type", "").startswith(SKIP_CONTENT_TYPES):
+                compression_stats.skipped["content_type"] += 1
+                self.passthrough = True
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            if self.initial_message is not None:
+                await self.send(self.initial_message)
+                self.initial_message = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None:
+            if len(body) < self.minimum_size and not more_body:
+                compression_stats.skipped["small"] += 1
+                self.passthrough = True
+                await self.send(self.initial_message)
+                self.initial_message = None
+                await self.send(message)
+                return
+            self.encoder = ENCODERS[self.encoding]()
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            del headers["Content-Length"]
+            compressed = self._encode(body, more_body)
+            if not more_body:
+                headers["Content-Length"] = str(len(compressed))
+            await self.send(self.initial_message)
+            self.initial_message = None
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+
+        await self.send({"type": "http.response.body", "body": self._encode(body, more_body), "more_body": more_body})
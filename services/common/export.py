@@ -0,0 +1,81 @@
+import csv
+import io
+import os
+from datetime import date, datetime
+import aiomysql
+from fastapi.responses import StreamingResponse
+from common.db import db
+from common.metrics import timed_execute
+from common.serialization import dumps
+
+# Filas por lote: lo que se lee del cursor y se envía en cada fragmento
+BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+# Un cliente lento frena la lectura; MySQL corta la consulta si no puede escribir en este plazo
+NET_WRITE_TIMEOUT = int(os.getenv("EXPORT_NET_WRITE_TIMEOUT", 600))
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode_ndjson(rows, columns):
+    return b"".join(dumps(row) + b"\n" for row in rows)
+
+
+def encode_csv(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_csv_value(row.get(c)) for c in columns] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_query(query, params, fmt, columns, transform=None, batch_size=BATCH_SIZE):
+    """Lee con un cursor sin buffer (SSDictCursor) y emite un fragmento por lote.
+
+    El generador solo pide el siguiente lote cuando el anterior se envió, así
+    que la memoria queda acotada a un lote y un cliente lento frena la lectura.
+    Si el cliente corta, la conexión se cierra en vez de drenar las filas
+    pendientes; el pool la descarta y abre otra cuando haga falta.
+    """
+    encode = encode_csv if fmt == "csv" else encode_ndjson
+    if fmt == "csv":
+        # La cabecera sale antes de tocar la base: el cliente recibe bytes al instante.
+        # El BOM hace que Excel abra el CSV como UTF-8
+        yield ("\ufeff" + ",".join(columns) + "\r\n").encode()
+    async with db.acquire(readonly=True) as conn:
+        # La conexión vuelve al pool: el plazo ampliado se restaura al terminar
+        async with conn.cursor() as setup:
+            await setup.execute("SELECT @@SESSION.net_write_timeout")
+            (previous_timeout,) = await setup.fetchone()
+            await setup.execute("SET SESSION net_write_timeout = %s", (NET_WRITE_TIMEOUT,))
+        cur = await conn.cursor(aiomysql.SSDictCursor)
+        try:
+            await timed_execute(cur, query, params)
+            while True:
+                rows = await cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                if transform is not None:
+                    rows = await transform(rows)
+                yield encode(rows, columns)
+            await cur.close()
+        except BaseException:
+            # Cerrada, la conexión no vuelve al pool y no hay nada que restaurar
+            conn.close()
+            raise
+        async with conn.cursor() as setup:
+            await setup.execute("SET SESSION net_write_timeout = %s", (previous_timeout,))
+
+
+def export_response(query, params, fmt, columns, filename, transform=None):
+    return StreamingResponse(
+        stream_query(query, params, fmt, columns, transform),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}.{fmt}"},
+    )
@@ -0,0 +1,131 @@
+import re
+import time
+from fastapi import HTTPException, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
+from common.querylog import query_log
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por ruta y status",
+    ["service", "method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Tiempo de ejecución de sentencias SQL",
+    ["service", "statement"],
+    buckets=LATENCY_BUCKETS,
+)
+POOL_WAIT = Histogram(
+    "pool_wait_seconds",
+    "Espera para obtener una conexión del pool",
+    ["service", "pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+# Nombre del servicio para las etiquetas; lo fija instrument()
+SERVICE = {"name": "app"}
+
+_STATEMENT_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+)", re.IGNORECASE)
+
+
+def statement_label(query):
+    # Etiqueta de baja cardinalidad: verbo + primera tabla (ej. "SELECT equipos")
+    words = query.split(None, 1)
+    verb = words[0].upper() if words else "?"
+    table = _STATEMENT_TABLE.search(query)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+async def timed_execute(cur, query, params=None, statement=None, many=False):
+    started = time.perf_counter()
+    failed = True
+    try:
+        result = await (cur.executemany(query, params) if many else cur.execute(query, params))
+        failed = False
+        return result
+    finally:
+        elapsed = time.perf_counter() - started
+        DB_QUERY_LATENCY.labels(SERVICE["name"], statement or statement_label(query)).observe(elapsed)
+        # Estadísticas por huella y EXPLAIN de las lentas (/debug/queries)
+        await query_log.observe(SERVICE["name"], cur, query, params, elapsed, failed, many)
+
+
+def observe_pool_wait(pool, seconds):
+    POOL_WAIT.labels(SERVICE["name"], pool).observe(seconds)
+
+
+class MetricsMiddleware:
+    """Mide la latencia de cada petición, etiquetada con la plantilla de la ruta."""
+
+    def __init__(self, app, fastapi_app, expand_params=None):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        self.expand_params = expand_params or {}
+        self.route_paths = None
+
+    def route_label(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self.route_paths is None:
+            self.route_paths = {r.endpoint: r.path for r in self.fastapi_app.routes if hasattr(r, "endpoint")}
+        label = self.route_paths.get(endpoint, endpoint.__name__)
+        # Parámetros de baja cardinalidad que conviene ver por separado (ej. servicio
+        # del gateway); solo valores conocidos, para no disparar la cardinalidad
+        for name, allowed in self.expand_params.items():
+            value = scope.get("path_params", {}).get(name)
+            if value in allowed:
+                label = label.replace(f"{{{name}}}", str(value))
+        return label
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(
+                SERVICE["name"], scope["method"], self.route_label(scope), str(status["code"])
+            ).observe(time.perf_counter() - started)
+
+
+def instrument(app, service_name, expand_params=None, queries=True):
+    SERVICE["name"] = service_name
+    app.add_middleware(MetricsMiddleware, fastapi_app=app, expand_params=expand_params)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+    if not queries:
+        return
+
+    @app.get("/debug/queries", include_in_schema=False)
+    async def debug_queries(order_by: str = "total_ms", limit: int = 20):
+        # Sentencias que más pesan: total_ms, p95_ms, max_ms, avg_ms, count o slow
+        return query_log.top(order_by, limit)
+
+    @app.get("/debug/queries/{fp}", include_in_schema=False)
+    async def debug_query(fp: str):
+        # Detalle de una huella, con el EXPLAIN FORMAT=JSON capturado
+        stats = query_log.get(fp)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="Huella no encontrada")
+        return stats
+
+    @app.delete("/debug/queries", include_in_schema=False)
+    async def reset_queries():
+        query_log.reset()
+        return {"message": "Estadísticas reiniciadas"}
@@ -0,0 +1,169 @@
+"""Migraciones de esquema versionadas.
+
+Cada archivo de common/migrations se llama NNNN_descripcion.sql y se aplica una
+sola vez, en orden. schema_migrations guarda versión y checksum: si un archivo
+ya aplicado cambia, el arranque falla en lugar de dejar el esquema a medias.
+
+Uso manual: python -m common.migrate [--status]
+"""
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import time
+
+MIGRATIONS_DIR = os.getenv("DB_MIGRATIONS_DIR", os.path.join(os.path.dirname(__file__), "migrations"))
+MIGRATE_ON_START = os.getenv("DB_MIGRATE_ON_START", "true").lower() in ("1", "true", "yes", "si")
+LOCK_NAME = "schema_migrations"
+LOCK_TIMEOUT = int(os.getenv("DB_MIGRATE_LOCK_TIMEOUT", 120))
+
+_FILENAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+_DELIMITER = re.compile(r"^\s*DELIMITER\s+(\S+)\s*$", re.IGNORECASE)
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        descripcion VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        duracion_ms INT NOT NULL,
+        fecha_aplicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for name in sorted(os.listdir(directory)):
+        match = _FILENAME.match(name)
+        if not match:
+            continue
+        with open(os.path.join(directory, name), "rb") as f:
+            content = f.read()
+        migrations.append({
+            "version": int(match.group(1)),
+            "descripcion": match.group(2),
+            "checksum": hashlib.sha256(content).hexdigest(),
+            "sql": content.decode("utf-8"),
+        })
+    versions = [m["version"] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError(f"Versiones de migración duplicadas en {directory}")
+    return sorted(migrations, key=lambda m: m["version"])
+
+
+def split_statements(sql):
+    # Separa por ';' fuera de comillas y comentarios; admite DELIMITER (triggers)
+    statements, current = [], []
+    delimiter = ";"
+    quote = None
+    for line in sql.splitlines(keepends=True):
+        match = _DELIMITER.match(line) if quote is None and not "".join(current).strip() else None
+        if match:
+            delimiter = match.group(1)
+            continue
+        i = 0
+        while i < len(line):
+            ch = line[i]
+            if quote:
+                current.append(ch)
+                if ch == "\\":
+                    current.append(line[i + 1:i + 2])
+                    i += 1
+                elif ch == quote:
+                    quote = None
+            elif ch in ("'", '"', "`"):
+                quote = ch
+                current.append(ch)
+            elif line.startswith("--", i) or ch == "#":
+                current.append("\n")
+                break
+            elif line.startswith(delimiter, i):
+                statements.append("".join(current).strip())
+                current = []
+                i += len(delimiter)
+                continue
+            else:
+                current.append(ch)
+            i += 1
+    statements.append("".join(current).strip())
+    return [s for s in statements if s]
+
+
+async def _applied(cur):
+    await cur.execute("SELECT version, descripcion, checksum, fecha_aplicacion FROM schema_migrations ORDER BY version")
+    return {row[0]: row for row in await cur.fetchall()}
+
+
+async def migrate(conn, migrations=None):
+    """Aplica las migraciones pendientes y devuelve las versiones aplicadas."""
+    migrations = load_migrations() if migrations is None else migrations
+    applied_now = []
+    async with conn.cursor() as cur:
+        # Varias réplicas de un servicio pueden arrancar a la vez: una sola migra
+        await cur.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+        if (await cur.fetchone())[0] != 1:
+            raise MigrationError("No se obtuvo el bloqueo de migraciones")
+        try:
+            await cur.execute(CREATE_TABLE)
+            applied = await _applied(cur)
+            for m in migrations:
+                if m["version"] in applied:
+                    if applied[m["version"]][2] != m["checksum"]:
+                        raise MigrationError(
+                            f"La migración {m['version']:04d}_{m['descripcion']} cambió después de aplicarse"
+                        )
+                    continue
+                started = time.perf_counter()
+                for statement in split_statements(m["sql"]):
+                    await cur.execute(statement)
+                elapsed_ms = int((time.perf_counter() - started) * 1000)
+                await cur.execute(
+                    "INSERT INTO schema_migrations (version, descripcion, checksum, duracion_ms) VALUES (%s, %s, %s, %s)",
+                    (m["version"], m["descripcion"], m["checksum"], elapsed_ms),
+                )
+                print(f"🗄️ Migración {m['version']:04d}_{m['descripcion']} aplicada ({elapsed_ms} ms)")
+                applied_now.append(m["version"])
+        finally:
+            await cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+    return applied_now
+
+
+async def status(conn):
+    async with conn.cursor() as cur:
+        await cur.execute(CREATE_TABLE)
+        applied = await _applied(cur)
+    result = []
+    for m in load_migrations():
+        row = applied.get(m["version"])
+        result.append({
+            "version": m["version"],
+            "descripcion": m["descripcion"],
+            "estado": "pendiente" if row is None else ("aplicada" if row[2] == m["checksum"] else "modificada"),
+            "fecha_aplicacion": str(row[3]) if row else None,
+        })
+    return result
+
+
+async def _main(argv):
+    from common.db import db
+
+    await db.primary.connect()
+    try:
+        async with db.primary.acquire() as conn:
+            if "--status" in argv:
+                for m in await status(conn):
+                    print(f"{m['version']:04d}  {m['estado']:<10} {m['descripcion']}  {m['fecha_aplicacion'] or ''}")
+            else:
+                applied = await migrate(conn)
+                print(f"{len(applied)} migraciones aplicadas")
+    finally:
+        await db.primary.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,26 @@
+-- Índices compuestos alineados con las consultas de los servicios.
+-- En InnoDB cada índice secundario lleva el id al final, así que
+-- (fecha_registro) ya sirve como (fecha_registro, id) para ordenar.
+
+-- equipos_service: GET /equipos ordena por fecha_registro DESC, con filtro
+-- opcional por estado o por categoría; reportes cuenta por estado
+CREATE INDEX idx_equipos_fecha_registro ON equipos (fecha_registro);
+CREATE INDEX idx_equipos_estado_fecha ON equipos (estado_operativo, fecha_registro);
+CREATE INDEX idx_equipos_categoria_fecha ON equipos (categoria_id, fecha_registro);
+
+-- Filtro por nombre de categoría (JOIN en GET /equipos)
+CREATE INDEX idx_categorias_nombre ON categorias_equipos (nombre);
+
+-- mantenimiento_service ordena por fecha_programada; /dashboard suma el costo
+-- del mes por rango de fecha_programada (índice cubriente)
+CREATE INDEX idx_mantenimientos_programada ON mantenimientos (fecha_programada, costo);
+
+-- /costos-mantenimiento agrupa por mes y tipo dentro de un año de fecha_realizada
+CREATE INDEX idx_mantenimientos_realizada ON mantenimientos (fecha_realizada, tipo, costo);
+
+-- agent_service: últimas notificaciones leídas/no leídas
+CREATE INDEX idx_notificaciones_leida ON notificaciones (leida, id);
+
+-- Ubicaciones activas y proveedores ordenados por razón social
+CREATE INDEX idx_ubicaciones_activo ON ubicaciones (activo);
+CREATE INDEX idx_proveedores_razon_social ON proveedores (razon_social);
@@ -0,0 +1,6 @@
+-- Filtros nuevos de GET /equipos manteniendo el orden (fecha_registro, id)
+CREATE INDEX idx_equipos_ubicacion_fecha ON equipos (ubicacion_actual_id, fecha_registro);
+CREATE INDEX idx_equipos_proveedor_fecha ON equipos (proveedor_id, fecha_registro);
+
+-- Rango de fin de garantía
+CREATE INDEX idx_equipos_garantia ON equipos (fecha_garantia_fin);
@@ -0,0 +1,9 @@
+-- Versión por tabla de referencia: la suben los endpoints que escriben en ella y
+-- las instancias la comparan para invalidar su caché en memoria (common/refcache.py)
+CREATE TABLE cambios_referencia (
+    tabla VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT INTO cambios_referencia (tabla, version) VALUES ('categorias', 1), ('ubicaciones', 1), ('proveedores', 1);
@@ -0,0 +1,40 @@
+-- Claves de especificaciones consultables con índice (equipos_service/specs.py).
+-- Cada clave activa tiene en equipos una columna generada VIRTUAL spec_<clave>
+-- con JSON_VALUE sobre especificaciones y un índice secundario sobre ella.
+-- Se registran más claves en caliente con POST /equipos/especificaciones/indices.
+CREATE TABLE especificaciones_indexadas (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    clave VARCHAR(48) NOT NULL UNIQUE,
+    tipo VARCHAR(10) NOT NULL,
+    columna VARCHAR(64) NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'construyendo',
+    error TEXT,
+    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Columnas VIRTUAL: no ocupan espacio en la fila, solo en el índice.
+-- NULL ON ERROR evita que un valor no convertible haga fallar el INSERT.
+ALTER TABLE equipos
+    ADD COLUMN spec_ram_gb DECIMAL(14,3) GENERATED ALWAYS AS
+        (JSON_VALUE(especificaciones, '$.ram_gb' RETURNING DECIMAL(14,3) NULL ON EMPTY NULL ON ERROR)) VIRTUAL,
+    ADD COLUMN spec_almacenamiento_gb DECIMAL(14,3) GENERATED ALWAYS AS
+        (JSON_VALUE(especificaciones, '$.almacenamiento_gb' RETURNING DECIMAL(14,3) NULL ON EMPTY NULL ON ERROR)) VIRTUAL,
+    ADD COLUMN spec_cpu VARCHAR(128) GENERATED ALWAYS AS
+        (JSON_VALUE(especificaciones, '$.cpu' RETURNING CHAR(128) NULL ON EMPTY NULL ON ERROR)) VIRTUAL,
+    ADD COLUMN spec_sistema_operativo VARCHAR(128) GENERATED ALWAYS AS
+        (JSON_VALUE(especificaciones, '$.sistema_operativo' RETURNING CHAR(128) NULL ON EMPTY NULL ON ERROR)) VIRTUAL,
+    ALGORITHM=INSTANT;
+
+CREATE INDEX idx_equipos_spec_ram_gb ON equipos (spec_ram_gb) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX idx_equipos_spec_almacenamiento_gb ON equipos (spec_almacenamiento_gb) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX idx_equipos_spec_cpu ON equipos (spec_cpu) ALGORITHM=INPLACE LOCK=NONE;
+CREATE INDEX idx_equipos_spec_sistema_operativo ON equipos (spec_sistema_operativo) ALGORITHM=INPLACE LOCK=NONE;
+
+INSERT INTO especificaciones_indexadas (clave, tipo, columna, estado) VALUES
+    ('ram_gb', 'numero', 'spec_ram_gb', 'activa'),
+    ('almacenamiento_gb', 'numero', 'spec_almacenamiento_gb', 'activa'),
+    ('cpu', 'texto', 'spec_cpu', 'activa'),
+    ('sistema_operativo', 'texto', 'spec_sistema_operativo', 'activa');
+
+INSERT INTO cambios_referencia (tabla, version) VALUES ('especificaciones', 1);
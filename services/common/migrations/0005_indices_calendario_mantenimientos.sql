@@ -0,0 +1,9 @@
+-- mantenimiento_service: GET /mantenimientos/calendario pagina por
+-- (fecha_programada, id) dentro de una ventana de fechas. El id va implícito
+-- al final de cada índice secundario, así que el orden sale del índice.
+CREATE INDEX idx_mantenimientos_fecha ON mantenimientos (fecha_programada);
+CREATE INDEX idx_mantenimientos_estado_fecha ON mantenimientos (estado, fecha_programada);
+CREATE INDEX idx_mantenimientos_equipo_fecha ON mantenimientos (equipo_id, fecha_programada);
+
+-- Conteos por día, estado y prioridad del calendario: índice cubriente
+CREATE INDEX idx_mantenimientos_dia_estado ON mantenimientos (fecha_programada, estado, prioridad);
@@ -0,0 +1,30 @@
+-- Contadores del dashboard: /dashboard pasa de cinco agregados sobre equipos y
+-- mantenimientos a leer dos filas por PK. Los endpoints que escriben aplican su
+-- diferencia una vez por petición (common/resumen.py), no un trigger por fila;
+-- reportes_service/resumen.py reconcilia lo que escriba SQL directo.
+CREATE TABLE resumen_dashboard (
+    id TINYINT PRIMARY KEY,
+    total_equipos BIGINT NOT NULL DEFAULT 0,
+    equipos_operativos BIGINT NOT NULL DEFAULT 0,
+    valor_inventario DECIMAL(16, 2) NOT NULL DEFAULT 0,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    fecha_reconciliacion TIMESTAMP NULL
+);
+
+-- Mantenimientos y costo por mes de fecha_programada (mes = primer día del mes)
+CREATE TABLE resumen_mantenimientos_mes (
+    mes DATE PRIMARY KEY,
+    cantidad BIGINT NOT NULL DEFAULT 0,
+    costo DECIMAL(16, 2) NOT NULL DEFAULT 0
+);
+
+-- Carga inicial; lo que se escriba entre medio lo corrige la primera reconciliación
+INSERT INTO resumen_dashboard (id, total_equipos, equipos_operativos, valor_inventario, fecha_reconciliacion)
+SELECT 1, COUNT(*), COALESCE(SUM(estado_operativo <=> 'operativo'), 0), COALESCE(SUM(costo_compra), 0), NOW()
+FROM equipos;
+
+INSERT INTO resumen_mantenimientos_mes (mes, cantidad, costo)
+SELECT fecha_programada - INTERVAL (DAYOFMONTH(fecha_programada) - 1) DAY AS mes, COUNT(*), COALESCE(SUM(costo), 0)
+FROM mantenimientos
+WHERE fecha_programada IS NOT NULL
+GROUP BY mes;
@@ -0,0 +1,5 @@
+-- Versión de cambios de equipos y mantenimientos en cambios_referencia. La suben
+-- una vez por petición los endpoints que escriben (reference_cache.bump);
+-- reportes_service la consulta (una lectura por PK cada pocos segundos) para
+-- invalidar sus resultados cacheados.
+INSERT INTO cambios_referencia (tabla, version) VALUES ('equipos', 1), ('mantenimientos', 1);
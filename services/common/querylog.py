@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict, deque
+
+# Umbral a partir del cual una sentencia se considera lenta y se registra
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", 200))
+# Captura EXPLAIN FORMAT=JSON de las consultas lentas (como mucho una vez por intervalo)
+EXPLAIN_SLOW = os.getenv("DB_EXPLAIN_SLOW", "true").lower() in ("1", "true", "yes", "si")
+EXPLAIN_INTERVAL = float(os.getenv("DB_EXPLAIN_INTERVAL", 300))
+# Huellas distintas que se conservan y latencias por huella para los percentiles
+MAX_FINGERPRINTS = int(os.getenv("DB_QUERY_STATS_MAX", 500))
+WINDOW = int(os.getenv("DB_QUERY_STATS_WINDOW", 200))
+
+_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*|#[^\n]*", re.DOTALL)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"%s|%\(\w+\)s")
+_IN_LISTS = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LISTS = re.compile(r"\bvalues\s*(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*")
+_SPACES = re.compile(r"\s+")
+
+# Sentencias sobre las que MySQL acepta EXPLAIN
+_EXPLAINABLE = ("select", "with", "update", "delete")
+
+
+def fingerprint(query):
+    # Normaliza literales y placeholders para agrupar sentencias con la misma forma
+    text = _COMMENTS.sub(" ", query)
+    text = _STRINGS.sub("?", text)
+    text = _PLACEHOLDERS.sub("?", text)
+    text = _NUMBERS.sub("?", text)
+    text = _SPACES.sub(" ", text).strip().lower()
+    text = _IN_LISTS.sub("in (?+)", text)
+    text = _VALUES_LISTS.sub(r"values \1+", text)
+    return text
+
+
+def fingerprint_id(text):
+    return hashlib.md5(text.encode()).hexdigest()[:16]
+
+
+class QueryStats:
+    def __init__(self, text, sample):
+        self.text = text
+        self.sample = sample
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.latencies = deque(maxlen=WINDOW)
+        self.last_seen = None
+        self.explain = None
+        self.explained_at = 0.0
+
+    def record(self, elapsed, rows, failed):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.latencies.append(elapsed)
+        self.last_seen = time.time()
+        if failed:
+            self.errors += 1
+        elif rows and rows > 0:
+            self.rows += rows
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def snapshot(self, with_explain=False):
+        result = {
+            "fingerprint": fingerprint_id(self.text),
+            "query": self.text,
+            "sample": self.sample,
+            "count": self.count,
+            "errors": self.errors,
+            "slow": self.slow,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0,
+            "p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+            "last_seen": self.last_seen,
+            "has_explain": self.explain is not None,
+        }
+        if with_explain:
+            result["explain"] = self.explain
+        return result
+
+
+class QueryLog:
+    """Estadísticas por huella de sentencia, log de consultas lentas y su plan."""
+
+    def __init__(self):
+        self.queries = OrderedDict()
+
+    def _stats_for(self, query):
+        text = fingerprint(query)
+        stats = self.queries.get(text)
+        if stats is None:
+            stats = self.queries[text] = QueryStats(text, _SPACES.sub(" ", query).strip()[:500])
+            while len(self.queries) > MAX_FINGERPRINTS:
+                self.queries.popitem(last=False)
+        else:
+            self.queries.move_to_end(text)
+        return stats
+
+    async def observe(self, service, cur, query, params, elapsed, failed, many=False):
+        stats = self._stats_for(query)
+        stats.record(elapsed, None if failed else cur.rowcount, failed)
+        if failed or elapsed * 1000 < SLOW_QUERY_MS:
+            return
+        stats.slow += 1
+        print(f"🐢 [{service}] Consulta lenta {elapsed * 1000:.1f} ms ({fingerprint_id(stats.text)}): {stats.sample[:200]}")
+        # executemany no tiene un único juego de parámetros con el que explicar
+        if EXPLAIN_SLOW and not many and time.time() - stats.explained_at >= EXPLAIN_INTERVAL:
+            stats.explained_at = time.time()
+            stats.explain = await self._explain(cur, query, params)
+
+    async def _explain(self, cur, query, params):
+        import aiomysql
+
+        # Un cursor sin buffer tiene aún filas pendientes en la conexión
+        if isinstance(cur, aiomysql.SSCursor):
+            return None
+        if not _COMMENTS.sub(" ", query).lstrip().lower().startswith(_EXPLAINABLE):
+            return None
+        try:
+            async with cur.connection.cursor() as ecur:
+                await ecur.execute("EXPLAIN FORMAT=JSON " + query, params)
+                row = await ecur.fetchone()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            return {"error": str(e)}
+
+    def top(self, order_by="total_ms", limit=20):
+        rows = [stats.snapshot() for stats in self.queries.values()]
+        rows.sort(key=lambda r: r.get(order_by) or 0, reverse=True)
+        return rows[:limit]
+
+    def get(self, fp):
+        for stats in self.queries.values():
+            if fingerprint_id(stats.text) == fp:
+                return stats.snapshot(with_explain=True)
+        return None
+
+    def reset(self):
+        self.queries.clear()
+
+
+query_log = QueryLog()
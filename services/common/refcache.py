@@ -0,0 +1,135 @@
+import asyncio
+import os
+import time
+import aiomysql
+from common.db import db
+from common.metrics import timed_execute
+
+# Vida máxima de una tabla en memoria, aunque no se detecten cambios
+TTL = float(os.getenv("REFCACHE_TTL", 300))
+# Cada cuánto se compara la versión local con cambios_referencia en MySQL
+CHECK_INTERVAL = float(os.getenv("REFCACHE_CHECK_INTERVAL", 2))
+
+BUMP_QUERY = """
+    INSERT INTO cambios_referencia (tabla, version) VALUES (%s, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+"""
+
+
+class _Table:
+    def __init__(self, query):
+        self.query = query
+        self.rows = None
+        self.by_id = None
+        self.version = None
+        self.loaded_at = 0.0
+        # Los locks se crean dentro del event loop (en 3.9 se atan al loop al crearse)
+        self.lock = None
+        self.hits = 0
+        self.loads = 0
+
+
+class ReferenceCache:
+    """Tablas de referencia pequeñas (categorías, ubicaciones, proveedores) en
+    memoria del servicio.
+
+    Cada tabla tiene una versión en cambios_referencia que suben los endpoints
+    que la modifican. Las instancias comparan su versión con la de MySQL como
+    mucho cada CHECK_INTERVAL segundos (una lectura por PK para todas las
+    tablas); si cambió, o si pasó el TTL, la tabla se recarga una sola vez
+    aunque lleguen varias peticiones a la vez.
+    """
+
+    def __init__(self, ttl=TTL, check_interval=CHECK_INTERVAL):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.tables = {}
+        self.versions = {}
+        self.checked_at = 0.0
+        self.check_lock = None
+        self.invalidations = 0
+
+    def register(self, name, query):
+        self.tables[name] = _Table(query)
+
+    async def _check_versions(self):
+        if time.monotonic() - self.checked_at < self.check_interval:
+            return
+        if self.check_lock is None:
+            self.check_lock = asyncio.Lock()
+        async with self.check_lock:
+            if time.monotonic() - self.checked_at < self.check_interval:
+                return
+            rows = await db.fetchall("SELECT tabla, version FROM cambios_referencia", cursor_class=aiomysql.Cursor)
+            self.versions = {tabla: version for tabla, version in rows}
+            self.checked_at = time.monotonic()
+
+    async def current_versions(self):
+        # Versiones de cambios_referencia, releídas como mucho cada check_interval
+        await self._check_versions()
+        return self.versions
+
+    async def rows(self, name):
+        table = self.tables[name]
+        await self._check_versions()
+        version = self.versions.get(name, 0)
+        if table.rows is not None and table.version == version and time.monotonic() - table.loaded_at < self.ttl:
+            table.hits += 1
+            return table.rows
+        if table.lock is None:
+            table.lock = asyncio.Lock()
+        async with table.lock:
+            # Otra petición pudo recargarla mientras esperábamos el lock
+            if table.rows is None or table.version != version or time.monotonic() - table.loaded_at >= self.ttl:
+                rows = await db.fetchall(table.query)
+                table.rows = rows
+                table.by_id = {row["id"]: row for row in rows}
+                table.version = version
+                table.loaded_at = time.monotonic()
+                table.loads += 1
+        return table.rows
+
+    async def by_id(self, name):
+        await self.rows(name)
+        return self.tables[name].by_id
+
+    def invalidate(self, name):
+        table = self.tables.get(name)
+        if table is not None:
+            table.rows = None
+            self.invalidations += 1
+        # Fuerza a releer las versiones en la próxima consulta
+        self.checked_at = 0.0
+
+    async def bump(self, cur, name):
+        # Llamar en la misma conexión/transacción que la escritura
+        await timed_execute(cur, BUMP_QUERY, (name,))
+        self.invalidate(name)
+
+    def stats(self):
+        return {
+            "ttl": self.ttl,
+            "check_interval": self.check_interval,
+            "invalidations": self.invalidations,
+            "versions": self.versions,
+            "tables": {
+                name: {
+                    "cached": table.rows is not None,
+                    "rows": len(table.rows) if table.rows is not None else 0,
+                    "version": table.version,
+                    "age_s": round(time.monotonic() - table.loaded_at, 1) if table.rows is not None else None,
+                    "hits": table.hits,
+                    "loads": table.loads,
+                }
+                for name, table in self.tables.items()
+            },
+        }
+
+
+reference_cache = ReferenceCache()
+reference_cache.register("categorias", "SELECT * FROM categorias_equipos ORDER BY nombre")
+reference_cache.register(
+    "ubicaciones",
+    "SELECT *, CONCAT(edificio, ' - ', aula_oficina) as nombre_completo FROM ubicaciones ORDER BY id",
+)
+reference_cache.register("proveedores", "SELECT * FROM proveedores ORDER BY razon_social")
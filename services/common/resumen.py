@@ -0,0 +1,57 @@
+from decimal import Decimal
+from common.metrics import timed_execute
+
+# Contadores del dashboard (migración 0006). Los endpoints que escriben en
+# equipos o mantenimientos aplican aquí su diferencia una vez por petición,
+# dentro de su transacción y justo antes del commit: la fila compartida queda
+# bloqueada solo lo que tarda el commit. Lo escrito por SQL directo lo corrige
+# la reconciliación de reportes_service/resumen.py.
+
+EQUIPOS_DELTA = """
+    UPDATE resumen_dashboard SET total_equipos = total_equipos + %s,
+        equipos_operativos = equipos_operativos + %s, valor_inventario = valor_inventario + %s
+    WHERE id = 1
+"""
+MESES_DELTA = """
+    INSERT INTO resumen_mantenimientos_mes (mes, cantidad, costo) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad), costo = costo + VALUES(costo)
+"""
+
+
+def _money(value):
+    return Decimal(str(value)) if value is not None else Decimal(0)
+
+
+def equipos_delta(equipos):
+    """(total, operativos, valor) de las filas `(estado_operativo, costo_compra)` insertadas."""
+    total, operativos, valor = 0, 0, Decimal(0)
+    for estado, costo in equipos:
+        total += 1
+        operativos += estado == "operativo"
+        valor += _money(costo)
+    return total, operativos, valor
+
+
+def meses_delta(cambios):
+    """Agrupa por mes los cambios `(fecha_programada, cantidad, costo)`; sin fecha no cuentan."""
+    by_month = {}
+    for fecha, cantidad, costo in cambios:
+        if fecha is None:
+            continue
+        mes = fecha.replace(day=1)
+        prev_cantidad, prev_costo = by_month.get(mes, (0, Decimal(0)))
+        by_month[mes] = (prev_cantidad + cantidad, prev_costo + _money(costo))
+    # Orden por mes: dos transacciones bloquean las filas en el mismo orden
+    return [(mes, cantidad, costo) for mes, (cantidad, costo) in sorted(by_month.items()) if cantidad or costo]
+
+
+async def add_equipos(cur, equipos):
+    total, operativos, valor = equipos_delta(equipos)
+    if total:
+        await timed_execute(cur, EQUIPOS_DELTA, (total, operativos, valor), statement="UPDATE resumen_dashboard")
+
+
+async def add_mantenimientos(cur, cambios):
+    rows = meses_delta(cambios)
+    if rows:
+        await timed_execute(cur, MESES_DELTA, rows, statement="UPSERT resumen_mantenimientos_mes", many=True)
@@ -0,0 +1,41 @@
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from starlette.responses import Response
+
+# orjson serializa fechas en C; sin él se usa json con el mismo resultado
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, timedelta):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    raise TypeError(f"No serializable: {type(value).__name__}")
+
+
+def dumps(content):
+    if orjson is not None:
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=json_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    """Respuesta JSON que serializa las filas de MySQL tal cual (date, Decimal).
+
+    Devolverla desde el endpoint evita el jsonable_encoder de FastAPI, que
+    recorre cada valor de cada fila en Python.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
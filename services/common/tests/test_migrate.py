@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from common import migrate
+
+
+def test_split_statements():
+    sql = """
+    -- comentario; con punto y coma
+    CREATE TABLE a (x VARCHAR(10) DEFAULT 'a;b');  # otro; comentario
+    INSERT INTO a VALUES ('it\\'s; ok'), ("c;d");
+    DELIMITER //
+    CREATE TRIGGER t AFTER INSERT ON a FOR EACH ROW BEGIN
+        SET @n = @n + 1;
+    END//
+    DELIMITER ;
+    SELECT `col;umna` FROM a
+    """
+    statements = migrate.split_statements(sql)
+    assert len(statements) == 4
+    assert statements[0] == "CREATE TABLE a (x VARCHAR(10) DEFAULT 'a;b')"
+    assert statements[1] == "INSERT INTO a VALUES ('it\\'s; ok'), (\"c;d\")"
+    assert statements[2].startswith("CREATE TRIGGER t") and statements[2].endswith("SET @n = @n + 1;\n    END")
+    assert statements[3] == "SELECT `col;umna` FROM a"
+
+
+def test_load_migrations(tmp_path):
+    (tmp_path / "0002_segunda.sql").write_text("SELECT 2;")
+    (tmp_path / "0001_primera.sql").write_text("SELECT 1;")
+    (tmp_path / "notas.txt").write_text("no es una migración")
+    migrations = migrate.load_migrations(str(tmp_path))
+    assert [(m["version"], m["descripcion"]) for m in migrations] == [(1, "primera"), (2, "segunda")]
+    assert len(migrations[0]["checksum"]) == 64
+
+    (tmp_path / "02_repetida.sql").write_text("SELECT 3;")
+    with pytest.raises(migrate.MigrationError, match="duplicadas"):
+        migrate.load_migrations(str(tmp_path))
+
+
+def test_repository_migrations_parse():
+    migrations = migrate.load_migrations()
+    assert [m["version"] for m in migrations] == list(range(1, len(migrations) + 1))
+    for m in migrations:
+        assert migrate.split_statements(m["sql"]), m["descripcion"]
+
+
+class FakeCursor:
+    def __init__(self, applied):
+        self.applied = applied
+        self.executed = []
+        self.result = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=None):
+        self.executed.append(query)
+        self.result = [(1,)] if "GET_LOCK" in query else self.applied
+
+    async def fetchone(self):
+        return self.result[0]
+
+    async def fetchall(self):
+        return self.result
+
+
+class FakeConnection:
+    def __init__(self, applied):
+        self.cur = FakeCursor(applied)
+
+    def cursor(self):
+        return self.cur
+
+
+def migration(version, sql):
+    return {"version": version, "descripcion": f"m{version}", "checksum": f"c{version}", "sql": sql}
+
+
+def test_migrate_applies_pending_and_rejects_changed():
+    applied = [(1, "m1", "c1", None)]
+    conn = FakeConnection(applied)
+    assert asyncio.run(migrate.migrate(conn, [migration(1, "SELECT 1"), migration(2, "SELECT 2; SELECT 3")])) == [2]
+    assert "SELECT 1" not in conn.cur.executed
+    assert conn.cur.executed.index("SELECT 2") < conn.cur.executed.index("SELECT 3")
+    assert conn.cur.executed[-1] == "SELECT RELEASE_LOCK(%s)"
+
+    changed = {**migration(1, "SELECT 1"), "checksum": "otro"}
+    conn = FakeConnection(applied)
+    with pytest.raises(migrate.MigrationError, match="cambió"):
+        asyncio.run(migrate.migrate(conn, [changed]))
+    assert conn.cur.executed[-1] == "SELECT RELEASE_LOCK(%s)"
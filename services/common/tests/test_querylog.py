@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from common import querylog
+
+
+@pytest.mark.parametrize("a, b", [
+    ("SELECT * FROM equipos WHERE id = %s", "select *  from equipos\n where id = 42 -- detalle"),
+    ("SELECT * FROM t WHERE nombre = 'a''b' AND x = \"c\"", "SELECT * FROM t WHERE nombre = %(nombre)s AND x = 1.5"),
+    ("SELECT id FROM t2 WHERE id IN (%s, %s, %s)", "SELECT id FROM t2 WHERE id IN (%s) /* lote */"),
+    ("INSERT INTO t (a, b) VALUES (%s, %s)", "INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'y')"),
+])
+def test_same_shape_same_fingerprint(a, b):
+    assert querylog.fingerprint(a) == querylog.fingerprint(b)
+
+
+def test_fingerprint_text():
+    assert querylog.fingerprint("SELECT a FROM t1 WHERE id IN (1, 2) AND n = 'x'") == "select a from t1 where id in (?+) and n = ?"
+    assert querylog.fingerprint("SELECT a FROM t1") != querylog.fingerprint("SELECT b FROM t1")
+    assert len(querylog.fingerprint_id("select 1")) == 16
+
+
+def test_percentiles_and_snapshot():
+    stats = querylog.QueryStats("select ?", "SELECT 1")
+    for ms in range(1, 101):
+        stats.record(ms / 1000, 1, False)
+    stats.record(0.5, None, True)
+    snapshot = stats.snapshot()
+    assert snapshot["count"] == 101 and snapshot["errors"] == 1 and snapshot["rows"] == 100
+    assert snapshot["p50_ms"] == 51.0
+    assert snapshot["p95_ms"] == 96.0
+    assert snapshot["max_ms"] == 500.0
+    assert querylog.QueryStats("x", "x").percentile(0.5) == 0.0
+
+
+class FakeCursor:
+    rowcount = 3
+
+
+def test_log_groups_and_evicts(monkeypatch):
+    monkeypatch.setattr(querylog, "MAX_FINGERPRINTS", 2)
+    log = querylog.QueryLog()
+
+    async def observe(query, elapsed=0.001):
+        await log.observe("prueba", FakeCursor(), query, None, elapsed, False)
+
+    async def scenario():
+        await observe("SELECT * FROM a WHERE id = 1")
+        await observe("SELECT * FROM a WHERE id = 2")
+        await observe("SELECT * FROM b")
+        await observe("SELECT * FROM a WHERE id = 3")
+        await observe("SELECT * FROM c")
+
+    asyncio.run(scenario())
+    # "b" era la menos reciente y salió
+    assert [row["query"] for row in log.top()] == ["select * from a where id = ?", "select * from c"]
+    top = log.top()[0]
+    assert top["count"] == 3 and top["rows"] == 9
+    assert log.get(top["fingerprint"])["sample"] == "SELECT * FROM a WHERE id = 1"
+    assert log.get("no-existe") is None
@@ -0,0 +1,57 @@
+import asyncio
+from datetime import date
+from decimal import Decimal
+from common import resumen
+
+
+def test_equipos_delta():
+    assert resumen.equipos_delta([("operativo", 1000.5), ("reparacion", None), ("operativo", Decimal("0.1"))]) == (
+        3, 2, Decimal("1000.6"),
+    )
+    assert resumen.equipos_delta([]) == (0, 0, Decimal(0))
+
+
+def test_meses_delta_groups_by_month():
+    cambios = [
+        (date(2024, 3, 20), 1, None),
+        (date(2024, 2, 5), 1, 10),
+        (date(2024, 3, 1), 1, Decimal("2.5")),
+        (None, 1, 99),
+        # Cambio de costo que se compensa dentro del mes
+        (date(2024, 4, 2), 0, 5),
+        (date(2024, 4, 9), 0, -5),
+    ]
+    assert resumen.meses_delta(cambios) == [
+        (date(2024, 2, 1), 1, Decimal(10)),
+        (date(2024, 3, 1), 2, Decimal("2.5")),
+    ]
+
+
+class FakeCursor:
+    rowcount = 1
+
+    def __init__(self):
+        self.executed = []
+
+    async def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+    async def executemany(self, query, rows):
+        self.executed.append((query, rows))
+
+
+def test_add_skips_empty_deltas():
+    cur = FakeCursor()
+
+    async def scenario():
+        await resumen.add_equipos(cur, [])
+        await resumen.add_mantenimientos(cur, [(None, 1, 5)])
+        assert cur.executed == []
+        await resumen.add_equipos(cur, [("operativo", 5)])
+        await resumen.add_mantenimientos(cur, [(date(2024, 1, 3), -1, -5)])
+
+    asyncio.run(scenario())
+    assert cur.executed == [
+        (resumen.EQUIPOS_DELTA, (1, 1, Decimal(5))),
+        (resumen.MESES_DELTA, [(date(2024, 1, 1), -1, Decimal(-5))]),
+    ]
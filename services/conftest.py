@@ -0,0 +1,12 @@
+import os
+import sys
+
+# En su imagen cada servicio importa sus módulos como top-level y los
+# compartidos como common.*; los tests reproducen ese sys.path
+SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+for name in sorted(os.listdir(SERVICES_DIR)):
+    path = os.path.join(SERVICES_DIR, name)
+    if os.path.isfile(os.path.join(path, "main.py")):
+        sys.path.insert(0, path)
+sys.path.insert(0, SERVICES_DIR)
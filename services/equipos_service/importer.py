@@ -0,0 +1,221 @@
+import codecs
+import csv
+import json
+import os
+from datetime import datetime
+from pydantic import ValidationError
+from common.metrics import timed_execute
+from common.resumen import add_equipos
+
+BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+# Errores por fila que se devuelven como máximo (el total se informa igual)
+MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 1000))
+
+INSERT_COLUMNS = (
+    "codigo_inventario", "categoria_id", "nombre", "marca", "modelo", "numero_serie",
+    "especificaciones", "proveedor_id", "fecha_compra", "costo_compra",
+    "fecha_garantia_fin", "ubicacion_actual_id", "estado_operativo", "notas",
+)
+INSERT_QUERY = f"""
+    INSERT INTO equipos ({', '.join(INSERT_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(INSERT_COLUMNS))})
+"""
+
+_ESTADO = INSERT_COLUMNS.index("estado_operativo")
+_COSTO = INSERT_COLUMNS.index("costo_compra")
+
+# Columnas con nombre en lugar de id: se resuelven contra las tablas de referencia
+NAME_COLUMNS = {"categoria": "categoria_id", "ubicacion": "ubicacion_actual_id", "proveedor": "proveedor_id"}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _header(value):
+    return str(value or "").strip().lower().replace(" ", "_")
+
+
+def _key(value):
+    return " ".join(str(value).split()).lower()
+
+
+def iter_csv(file):
+    # Lectura fila a fila del archivo subido, sin cargarlo entero
+    text = codecs.getreader("utf-8-sig")(file)
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if not header:
+        raise ImportFormatError("El archivo está vacío")
+    names = [_header(h) for h in header]
+    for row in reader:
+        if any(cell.strip() for cell in row):
+            yield reader.line_num, dict(zip(names, row))
+
+
+def iter_xlsx(file):
+    from openpyxl import load_workbook
+
+    # read_only: openpyxl recorre la hoja en streaming en vez de cargarla en memoria
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            raise ImportFormatError("El archivo está vacío")
+        names = [_header(h) for h in header]
+        for number, row in enumerate(rows, start=2):
+            if any(cell not in (None, "") for cell in row):
+                yield number, dict(zip(names, row))
+    finally:
+        workbook.close()
+
+
+def reader_for(filename):
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return iter_csv
+    if name.endswith((".xlsx", ".xlsm")):
+        return iter_xlsx
+    raise ImportFormatError("Formato no soportado: use .csv o .xlsx")
+
+
+# Columnas de texto que en una hoja pueden quedar como número (1234 -> 1234.0)
+TEXT_COLUMNS = {"codigo_inventario", "numero_serie", "modelo", "nombre", "marca", "notas"}
+
+
+def _text(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _clean(raw):
+    row = {}
+    for key, value in raw.items():
+        if not key:
+            continue
+        if isinstance(value, str):
+            value = value.strip() or None
+        elif isinstance(value, datetime):
+            value = value.date()
+        elif key in TEXT_COLUMNS and isinstance(value, (int, float)) and not isinstance(value, bool):
+            # openpyxl entrega las celdas numéricas como int/float y pydantic no las pasa a str
+            value = _text(value)
+        row[key] = value
+    return row
+
+
+def parse_rows(rows, model, lookups):
+    """Valida cada fila contra el modelo; devuelve (válidas, errores).
+
+    `rows` da (número de fila, dict); las válidas son (número de fila, tupla
+    para el INSERT). Los nombres de categoría/ubicación/proveedor se traducen
+    con `lookups` (nombre -> id).
+    """
+    valid, errors = [], []
+    seen_codes = {}
+    for number, raw in rows:
+        row = _clean(raw)
+        problems = []
+        for column, id_column in NAME_COLUMNS.items():
+            name = row.pop(column, None)
+            if name is not None and row.get(id_column) is None:
+                resolved = lookups[column].get(_key(name))
+                if resolved is None:
+                    problems.append(f"{column}: '{name}' no existe")
+                else:
+                    row[id_column] = resolved
+        if isinstance(row.get("especificaciones"), str):
+            try:
+                row["especificaciones"] = json.loads(row["especificaciones"])
+            except ValueError:
+                problems.append("especificaciones: JSON inválido")
+                row.pop("especificaciones")
+        try:
+            item = model(**row)
+        except ValidationError as e:
+            problems.extend(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+            item = None
+        if item is not None and item.codigo_inventario in seen_codes:
+            problems.append(f"codigo_inventario repetido en la fila {seen_codes[item.codigo_inventario]}")
+        if problems:
+            errors.append({"fila": number, "codigo_inventario": row.get("codigo_inventario"), "errores": problems})
+            continue
+        seen_codes[item.codigo_inventario] = number
+        values = item.model_dump()
+        values["especificaciones"] = json.dumps(values["especificaciones"]) if values["especificaciones"] else None
+        valid.append((number, tuple(values[c] for c in INSERT_COLUMNS)))
+    return valid, errors
+
+
+async def existing_codes(conn, codes):
+    found = set()
+    async with conn.cursor() as cur:
+        for start in range(0, len(codes), BATCH_SIZE):
+            chunk = codes[start:start + BATCH_SIZE]
+            await timed_execute(
+                cur,
+                f"SELECT codigo_inventario FROM equipos WHERE codigo_inventario IN ({', '.join(['%s'] * len(chunk))})",
+                tuple(chunk),
+            )
+            found.update(row[0] for row in await cur.fetchall())
+    return found
+
+
+async def insert_batches(conn, valid, atomic):
+    """Inserta en lotes con executemany (un INSERT multi-fila por lote).
+
+    Modo por lotes: cada lote es una transacción; si un lote falla se reintenta
+    fila a fila para señalar solo las filas culpables. Modo atómico: una única
+    transacción que se deshace entera ante el primer error. Cada transacción
+    suma sus filas a los contadores del dashboard una sola vez, antes del commit.
+    """
+    inserted, errors = 0, []
+    async with conn.cursor() as cur:
+        if atomic:
+            await conn.begin()
+            try:
+                for start in range(0, len(valid), BATCH_SIZE):
+                    batch = valid[start:start + BATCH_SIZE]
+                    await timed_execute_many(cur, [values for _, values in batch])
+                    inserted += len(batch)
+                await add_equipos(cur, _counters(valid))
+                await conn.commit()
+            except Exception as e:
+                await conn.rollback()
+                return 0, [{"fila": None, "codigo_inventario": None, "errores": [f"Importación revertida: {e}"]}]
+            return inserted, errors
+
+        for start in range(0, len(valid), BATCH_SIZE):
+            batch = valid[start:start + BATCH_SIZE]
+            await conn.begin()
+            try:
+                await timed_execute_many(cur, [values for _, values in batch])
+                await add_equipos(cur, _counters(batch))
+                await conn.commit()
+                inserted += len(batch)
+                continue
+            except Exception:
+                await conn.rollback()
+            for number, values in batch:
+                # Camino raro (lote con errores): una transacción por fila
+                await conn.begin()
+                try:
+                    await timed_execute(cur, INSERT_QUERY, values)
+                    await add_equipos(cur, _counters([(number, values)]))
+                    await conn.commit()
+                    inserted += 1
+                except Exception as e:
+                    await conn.rollback()
+                    errors.append({"fila": number, "codigo_inventario": values[0], "errores": [str(e)]})
+    return inserted, errors
+
+
+def _counters(rows):
+    return [(values[_ESTADO], values[_COSTO]) for _, values in rows]
+
+
+async def timed_execute_many(cur, rows):
+    # executemany sobre INSERT ... VALUES: aiomysql lo envía como un solo INSERT multi-fila
+    await timed_execute(cur, INSERT_QUERY, rows, statement="INSERT equipos (lote)", many=True)
@@ -0,0 +1,146 @@
+import base64
+import json
+from datetime import datetime
+from common.refcache import reference_cache
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+# Campos que se pueden pedir con fields=, con su expresión SQL
+FIELDS = {
+    "id": "e.id",
+    "codigo_inventario": "e.codigo_inventario",
+    "categoria_id": "e.categoria_id",
+    "nombre": "e.nombre",
+    "marca": "e.marca",
+    "modelo": "e.modelo",
+    "numero_serie": "e.numero_serie",
+    "especificaciones": "e.especificaciones",
+    "proveedor_id": "e.proveedor_id",
+    "fecha_compra": "e.fecha_compra",
+    "costo_compra": "e.costo_compra",
+    "fecha_garantia_fin": "e.fecha_garantia_fin",
+    "ubicacion_actual_id": "e.ubicacion_actual_id",
+    "estado_operativo": "e.estado_operativo",
+    "estado_fisico": "e.estado_fisico",
+    "asignado_a_id": "e.asignado_a_id",
+    "notas": "e.notas",
+    "imagen_url": "e.imagen_url",
+    "fecha_registro": "e.fecha_registro",
+    "fecha_ultima_actualizacion": "e.fecha_ultima_actualizacion",
+}
+
+# Nombres que se resuelven en memoria con la caché de referencia, sin JOIN:
+# campo -> (columna con el id, tabla de la caché, columna con el nombre)
+NAME_FIELDS = {
+    "categoria_nombre": ("categoria_id", "categorias", "nombre"),
+    "ubicacion_nombre": ("ubicacion_actual_id", "ubicaciones", "nombre_completo"),
+    "proveedor_nombre": ("proveedor_id", "proveedores", "razon_social"),
+}
+
+
+class ListingError(ValueError):
+    pass
+
+
+def parse_fields(fields):
+    if not fields:
+        return list(FIELDS) + list(NAME_FIELDS)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in FIELDS and f not in NAME_FIELDS]
+    if unknown:
+        raise ListingError(f"Campos desconocidos: {', '.join(unknown)}")
+    return names
+
+
+def encode_cursor(fecha_registro, equipo_id):
+    # fecha_registro admite NULL: se codifica como null y el cursor sigue siendo válido
+    fecha = fecha_registro.isoformat() if fecha_registro is not None else None
+    raw = json.dumps([fecha, equipo_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        fecha, equipo_id = json.loads(raw)
+        return (datetime.fromisoformat(fecha) if fecha is not None else None), int(equipo_id)
+    except Exception:
+        raise ListingError("Cursor inválido")
+
+
+def after_cursor(fecha, equipo_id):
+    """Filtro de las filas que siguen al cursor en ORDER BY fecha_registro DESC, id DESC.
+
+    En MySQL los NULL van al final en orden descendente: tras una fecha siguen
+    las fechas menores y luego todas las filas sin fecha; tras una fila sin
+    fecha, solo las otras sin fecha con id menor.
+    """
+    if fecha is None:
+        return "(e.fecha_registro IS NULL AND e.id < %s)", (equipo_id,)
+    return (
+        "(e.fecha_registro < %s OR (e.fecha_registro = %s AND e.id < %s) OR e.fecha_registro IS NULL)",
+        (fecha, fecha, equipo_id),
+    )
+
+
+def select_from(names, extra_columns=()):
+    # SELECT ... FROM equipos; de los nombres solo se lee el id a resolver
+    columns = list(extra_columns)
+    for name in names:
+        if name in NAME_FIELDS:
+            columns.append(f"e.{NAME_FIELDS[name][0]} AS _{name}")
+        else:
+            columns.append(f"{FIELDS[name]} AS {name}")
+    return f"SELECT {', '.join(columns)} FROM equipos e"
+
+
+async def resolve_names(rows, names):
+    """Completa categoria_nombre/ubicacion_nombre/proveedor_nombre desde la
+    caché de tablas de referencia en lugar de hacer JOIN en cada listado."""
+    for name in names:
+        if name not in NAME_FIELDS:
+            continue
+        _, table, column = NAME_FIELDS[name]
+        by_id = await reference_cache.by_id(table)
+        for row in rows:
+            ref = by_id.get(row.pop(f"_{name}"))
+            row[name] = ref[column] if ref else None
+    return rows
+
+
+def build_where(query, filters):
+    # filters: (cláusula, valor); los None se omiten y las tuplas aportan varios parámetros
+    where, params = [], []
+    for clause, value in filters:
+        if value is not None:
+            where.append(clause)
+            params.extend(value if isinstance(value, tuple) else (value,))
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    return query, tuple(params)
+
+
+def build_query(names, filters, cursor, limit):
+    """SELECT paginado por (fecha_registro, id) descendente: cada página es un
+    rango sobre el índice, así que cuesta lo mismo la primera que la milésima."""
+    # id y fecha_registro siempre se leen: forman el cursor de la página siguiente
+    query = select_from(names, ["e.id AS _id", "e.fecha_registro AS _fecha_registro"])
+    filters = list(filters)
+    if cursor:
+        filters.append(after_cursor(*decode_cursor(cursor)))
+    query, params = build_where(query, filters)
+    # Se pide una fila de más para saber si hay página siguiente
+    query += " ORDER BY e.fecha_registro DESC, e.id DESC LIMIT %s"
+    return query, params + (limit + 1,)
+
+
+def paginate(rows, limit):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(rows[-1]["_fecha_registro"], rows[-1]["_id"])
+    for row in rows:
+        del row["_id"], row["_fecha_registro"]
+    return {"items": rows, "next_cursor": next_cursor, "limit": limit}
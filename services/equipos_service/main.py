@@ -1,26 +1,41 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
 import aiomysql
-import os
+import asyncio
 import json
+import time
+from contextlib import asynccontextmanager
 from datetime import date
+from common.compression import CompressionMiddleware
+from common.metrics import instrument, timed_execute
+from common.db import ReadYourWritesMiddleware, db, db_lifespan
+from common.export import export_response
+from common.refcache import reference_cache
+from common.resumen import add_equipos
+from listing import (
+    DEFAULT_LIMIT, MAX_LIMIT, ListingError, build_query, build_where, paginate, parse_fields, resolve_names, select_from,
+)
+from search import keep_in_sync, search_index
+from specs import SpecQueryError, active_keys, parse_spec_filters, register_key
+from importer import MAX_REPORTED_ERRORS, ImportFormatError, existing_codes, insert_batches, parse_rows, reader_for
 
-app = FastAPI(title="Equipos Service")
+@asynccontextmanager
+async def lifespan(app):
+    async with db_lifespan(app):
+        # El índice de búsqueda se construye en segundo plano y se mantiene al día
+        sync_task = asyncio.create_task(keep_in_sync(search_index))
+        yield
+        sync_task.cancel()
 
-# Configuración MySQL
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'mysql'),
-    'user': os.getenv('DB_USER', 'user_ti'),
-    'password': os.getenv('DB_PASSWORD', 'password'),
-    'db': os.getenv('DB_NAME', 'ti_management'),
-    'port': 3306,
-    'autocommit': True,
-    'charset': 'utf8mb4'
-}
-
-async def get_db_pool():
-    return await aiomysql.create_pool(**DB_CONFIG)
+app = FastAPI(title="Equipos Service", lifespan=lifespan)
+# Comprime JSON grandes en el salto hacia el gateway
+app.add_middleware(CompressionMiddleware)
+# Escrituras y peticiones con X-Read-Your-Writes leen del primario, no de réplicas
+app.add_middleware(ReadYourWritesMiddleware)
+# Latencias por ruta y por sentencia SQL en /metrics (formato Prometheus)
+instrument(app, "equipos")
 
 class EquipoCreate(BaseModel):
     codigo_inventario: str
@@ -38,42 +53,149 @@ class EquipoCreate(BaseModel):
     estado_operativo: str = "operativo"
     notas: Optional[str] = None
 
+@app.get("/db/pool")
+async def db_pool_stats():
+    # Uso del pool, para dimensionarlo frente a max_connections de MySQL
+    return db.stats()
+
 @app.get("/health")
 async def health():
     return {"status": "healthy_mysql"}
 
-@app.get("/equipos")
-async def get_equipos(categoria: Optional[str] = None, estado: Optional[str] = None):
-    pool = await get_db_pool()
-    query = """
-        SELECT e.*, c.nombre as categoria_nombre,
-        CONCAT(u.edificio, ' - ', u.aula_oficina) as ubicacion_nombre,
-        p.razon_social as proveedor_nombre
-        FROM equipos e
-        LEFT JOIN categorias_equipos c ON e.categoria_id = c.id
-        LEFT JOIN ubicaciones u ON e.ubicacion_actual_id = u.id
-        LEFT JOIN proveedores p ON e.proveedor_id = p.id
-        WHERE 1=1
-    """
-    params = []
+async def equipo_filters(
+    request: Request,
+    response: Response,
+    categoria: Optional[str] = None,
+    categoria_id: Optional[int] = None,
+    estado: Optional[str] = None,
+    ubicacion_id: Optional[int] = None,
+    proveedor_id: Optional[int] = None,
+    garantia_desde: Optional[date] = None,
+    garantia_hasta: Optional[date] = None,
+):
+    # Filtros comunes al listado y a la exportación; None si ningún equipo puede cumplirlos.
+    # Además acepta filtros por especificaciones: ?ram_gb__lt=8&cpu__contains=i7
+    try:
+        spec_filters, unindexed = parse_spec_filters(request.query_params.multi_items(), await active_keys())
+    except SpecQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if unindexed:
+        # Claves sin columna indexada: se filtran recorriendo el JSON de cada equipo
+        response.headers["X-Especificaciones-Sin-Indice"] = ",".join(unindexed)
+    categoria_ids = None
     if categoria:
-        query += " AND c.nombre = %s"
-        params.append(categoria)
-    if estado:
-        query += " AND e.estado_operativo = %s"
-        params.append(estado)
-    
-    query += " ORDER BY e.fecha_registro DESC"
-    
-    async with pool.acquire() as conn:
+        # El nombre se traduce a ids con la caché de referencia, sin JOIN
+        categoria_ids = tuple(
+            c["id"] for c in await reference_cache.rows("categorias") if c["nombre"].casefold() == categoria.casefold()
+        )
+        if not categoria_ids:
+            return None
+    return [
+        (f"e.categoria_id IN ({', '.join(['%s'] * len(categoria_ids or ()))})", categoria_ids),
+        ("e.categoria_id = %s", categoria_id),
+        ("e.estado_operativo = %s", estado),
+        ("e.ubicacion_actual_id = %s", ubicacion_id),
+        ("e.proveedor_id = %s", proveedor_id),
+        ("e.fecha_garantia_fin >= %s", garantia_desde),
+        ("e.fecha_garantia_fin <= %s", garantia_hasta),
+        *spec_filters,
+    ]
+
+@app.get("/equipos")
+async def get_equipos(
+    filters: Optional[list] = Depends(equipo_filters),
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+):
+    # Página de equipos ordenada por fecha_registro DESC; next_cursor pide la siguiente
+    if filters is None:
+        return {"items": [], "next_cursor": None, "limit": limit}
+    try:
+        names = parse_fields(fields)
+        query, params = build_query(names, filters, cursor, limit)
+    except ListingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async with db.acquire(readonly=True) as conn:
         async with conn.cursor(aiomysql.DictCursor) as cur:
-            await cur.execute(query, tuple(params))
-            result = await cur.fetchall()
-            return result
+            await timed_execute(cur, query, params)
+            rows = await cur.fetchall()
+    return paginate(await resolve_names(rows, names), limit)
+
+@app.get("/equipos/export")
+async def export_equipos(
+    filters: Optional[list] = Depends(equipo_filters),
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    fields: Optional[str] = None,
+):
+    # Inventario completo en streaming (NDJSON o CSV) con los mismos filtros que /equipos
+    try:
+        names = parse_fields(fields)
+    except ListingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if filters is None:
+        # Ninguna fila: la consulta devuelve vacío sin recorrer la tabla
+        filters = [("FALSE", ())]
+    query, params = build_where(select_from(names), filters)
+
+    async def with_names(rows):
+        return await resolve_names(rows, names)
+
+    # Orden por PK: MySQL entrega filas según recorre el índice, sin ordenar antes
+    return export_response(query + " ORDER BY e.id", params, formato, names, "equipos", with_names)
+
+@app.get("/equipos/buscar")
+async def buscar_equipos(
+    q: str,
+    fields: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    prefix: bool = True,
+    fuzzy: bool = True,
+):
+    # Busca en código, serie, nombre, marca, modelo y especificaciones (prefijos y errores de tipeo)
+    if not search_index.ready:
+        raise HTTPException(status_code=503, detail="Índice de búsqueda en construcción", headers={"Retry-After": "5"})
+    try:
+        names = parse_fields(fields)
+    except ListingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    started = time.perf_counter()
+    total, hits = search_index.search(q, limit=limit, prefix=prefix, fuzzy=fuzzy)
+    items = []
+    if hits:
+        query = select_from(names, ["e.id AS _id"]) + f" WHERE e.id IN ({', '.join(['%s'] * len(hits))})"
+        async with db.acquire(readonly=True) as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+                await timed_execute(cur, query, tuple(equipo_id for equipo_id, _ in hits))
+                rows = {row.pop("_id"): row for row in await resolve_names(await cur.fetchall(), names)}
+        items = [{**rows[equipo_id], "score": score} for equipo_id, score in hits if equipo_id in rows]
+    return {"items": items, "total": total, "took_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+@app.get("/equipos/buscar/indice")
+async def indice_busqueda():
+    return search_index.stats()
+
+class EspecificacionIndexada(BaseModel):
+    clave: str
+    tipo: str = "texto"
+
+@app.get("/equipos/especificaciones/indices")
+async def get_especificaciones_indexadas():
+    # Claves consultables con índice y las que se están construyendo o fallaron
+    return await reference_cache.rows("especificaciones")
+
+@app.post("/equipos/especificaciones/indices", status_code=202)
+async def registrar_especificacion(spec: EspecificacionIndexada):
+    # Columna generada + índice creados en línea; la tabla sigue aceptando escrituras
+    try:
+        return await register_key(spec.clave, spec.tipo)
+    except SpecQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/equipos")
 async def create_equipo(eq: EquipoCreate):
-    pool = await get_db_pool()
     specs_json = json.dumps(eq.especificaciones) if eq.especificaciones else None
     
     query = """
@@ -90,27 +212,94 @@ async def create_equipo(eq: EquipoCreate):
         eq.estado_operativo, eq.notas
     )
     
-    async with pool.acquire() as conn:
+    async with db.acquire() as conn:
         async with conn.cursor() as cur:
+            await conn.begin()
             try:
-                await cur.execute(query, values)
+                await timed_execute(cur, query, values)
                 equipo_id = cur.lastrowid
-                return {"id": equipo_id, "message": "Equipo creado"}
+                await add_equipos(cur, [(eq.estado_operativo, eq.costo_compra)])
+                await reference_cache.bump(cur, "equipos")
+                await conn.commit()
             except Exception as e:
+                await conn.rollback()
                 raise HTTPException(status_code=400, detail=str(e))
+    # Buscable de inmediato en esta instancia; las demás lo toman al refrescar
+    search_index.add({**eq.model_dump(), "id": equipo_id})
+    return {"id": equipo_id, "message": "Equipo creado"}
+
+def _name_key(*parts):
+    return " ".join(" ".join(str(p or "") for p in parts).split()).lower()
+
+async def load_lookups():
+    # Nombre (normalizado) -> id de las tablas de referencia para la importación
+    lookups = {"categoria": {}, "ubicacion": {}, "proveedor": {}}
+    for c in await reference_cache.rows("categorias"):
+        lookups["categoria"][_name_key(c["nombre"])] = c["id"]
+    for u in await reference_cache.rows("ubicaciones"):
+        lookups["ubicacion"][_name_key(u["edificio"], "-", u["aula_oficina"])] = u["id"]
+    for p in await reference_cache.rows("proveedores"):
+        lookups["proveedor"][_name_key(p["razon_social"])] = p["id"]
+        lookups["proveedor"][_name_key(p["ruc"])] = p["id"]
+    return lookups
+
+@app.post("/equipos/importar")
+async def importar_equipos(archivo: UploadFile = File(...), modo: str = Query("lotes", pattern="^(lotes|atomico)$")):
+    # Alta masiva desde CSV/XLSX. modo=lotes confirma lote a lote y omite las filas
+    # con error; modo=atomico no inserta nada si alguna fila falla
+    started = time.perf_counter()
+    try:
+        rows = reader_for(archivo.filename)(archivo.file)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    lookups = await load_lookups()
+    try:
+        # Parseo y validación fuera del event loop (es trabajo de CPU) y antes de
+        # tomar una conexión: el pool no queda retenido mientras se lee el archivo
+        valid, errors = await run_in_threadpool(parse_rows, rows, EquipoCreate, lookups)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"No se pudo leer el archivo: {e}")
+    total_rows = len(valid) + len(errors)
+
+    async with db.acquire() as conn:
+        existing = await existing_codes(conn, [values[0] for _, values in valid])
+        if existing:
+            errors.extend(
+                {"fila": number, "codigo_inventario": values[0], "errores": ["codigo_inventario ya registrado"]}
+                for number, values in valid if values[0] in existing
+            )
+            valid = [(number, values) for number, values in valid if values[0] not in existing]
+
+        inserted = 0
+        if valid and not (modo == "atomico" and errors):
+            inserted, insert_errors = await insert_batches(conn, valid, atomic=modo == "atomico")
+            errors.extend(insert_errors)
+        if inserted:
+            # Una sola subida de versión por importación, no una por fila
+            async with conn.cursor() as cur:
+                await reference_cache.bump(cur, "equipos")
+
+    errors.sort(key=lambda e: e["fila"] or 0)
+    return {
+        "filas": total_rows,
+        "insertados": inserted,
+        "con_errores": len(errors),
+        "errores": errors[:MAX_REPORTED_ERRORS],
+        "duracion_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
 
 @app.get("/categorias")
 async def get_categorias():
-    pool = await get_db_pool()
-    async with pool.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
-            await cur.execute("SELECT * FROM categorias_equipos ORDER BY nombre")
-            return await cur.fetchall()
+    # Tablas pequeñas y casi estáticas: se sirven desde la caché en memoria
+    return await reference_cache.rows("categorias")
 
 @app.get("/ubicaciones")
 async def get_ubicaciones():
-    pool = await get_db_pool()
-    async with pool.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
-            await cur.execute("SELECT *, CONCAT(edificio, ' - ', aula_oficina) as nombre_completo FROM ubicaciones WHERE activo = 1")
-            return await cur.fetchall()
\ No newline at end of file
+    return [u for u in await reference_cache.rows("ubicaciones") if u["activo"]]
+
+@app.get("/cache/referencias")
+async def referencias_cache_stats():
+    return reference_cache.stats()
\ No newline at end of file
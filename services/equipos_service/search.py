@@ -0,0 +1,349 @@
+import asyncio
+import json
+import math
+import os
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+import aiomysql
+import numpy as np
+from common.db import db
+from common.metrics import timed_execute
+
+# Campos indexados y su peso en el ranking (un código o una serie pesan más)
+FIELDS = ("codigo_inventario", "numero_serie", "nombre", "marca", "modelo", "especificaciones")
+FIELD_WEIGHTS = np.array([5.0, 5.0, 3.0, 2.0, 2.0, 1.0, 0.0, 0.0], dtype=np.float32)
+IDENTIFIER_FIELDS = (0, 1)
+
+# Peso según cómo coincidió el término
+EXACT, PREFIX, FUZZY = 1.0, 0.6, 0.35
+
+MIN_PREFIX = 2
+MAX_EXPANSIONS = 64
+MIN_FUZZY = 4
+# Trigramas demasiado comunes no discriminan y cuestan mucho de recorrer
+MAX_TRIGRAM_POSTINGS = 20000
+PENDING_MERGE = 2000
+
+# Cada cuánto se incorporan equipos creados por otras instancias o importaciones
+REFRESH_INTERVAL = float(os.getenv("SEARCH_REFRESH_INTERVAL", 10))
+LOAD_BATCH = 2000
+# Ids por debajo del último leído que se vuelven a revisar: una transacción que
+# confirma tarde (una importación atómica) deja filas con id menor al ya leído
+TRAILING_IDS = int(os.getenv("SEARCH_TRAILING_IDS", 5000))
+
+_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    text = str(text).lower()
+    if text.isascii():
+        return text
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    return [t for t in _SPLIT.split(normalize(text)) if t]
+
+
+def _spec_values(value):
+    # Claves y valores del JSON de especificaciones, aplanados
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield str(key)
+            yield from _spec_values(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _spec_values(item)
+    elif value is not None:
+        yield str(value)
+
+
+def document_tokens(row):
+    """(token, campo) de un equipo; los identificadores también se indexan
+    compactados (UNT-LAP-001 -> untlap001) para buscarlos con o sin guiones."""
+    result = set()
+    for field, name in enumerate(FIELDS):
+        value = row.get(name)
+        if value is None:
+            continue
+        if name == "especificaciones":
+            if isinstance(value, (str, bytes)):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            texts = list(_spec_values(value))
+        else:
+            texts = [value]
+        for text in texts:
+            tokens = tokenize(text)
+            result.update((t, field) for t in tokens)
+            if field in IDENTIFIER_FIELDS and len(tokens) > 1:
+                result.add(("".join(tokens), field))
+    return result
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a, b, max_dist):
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_dist:
+            return max_dist + 1
+        previous = current
+    return previous[-1]
+
+
+class SearchIndex:
+    """Índice invertido en memoria sobre el inventario.
+
+    Cada token apunta a un array compacto de (documento << 3 | campo). Sobre el
+    vocabulario se mantiene una lista ordenada (búsqueda por prefijo) y un índice
+    de trigramas (búsqueda tolerante a errores). Los documentos se añaden de
+    forma incremental; reindexar un equipo deja la versión anterior como baja.
+    """
+
+    def __init__(self):
+        self.doc_ids = array("i")
+        self.doc_of = {}
+        self.dead = set()
+        # postings[token_id]: un entero si el token aparece una sola vez (series,
+        # códigos), un array("I") en cuanto tiene más de una entrada
+        self.postings = []
+        self.tokens = []
+        self.token_ids = {}
+        self.vocab = []
+        self.vocab_pending = []
+        self.trigram_index = {}
+        # Último id leído de la base; las altas locales no lo mueven para no
+        # saltarse equipos que otra instancia insertó con un id menor (los que
+        # confirman tarde se recogen revisando TRAILING_IDS por debajo)
+        self.max_id = 0
+        self.ready = False
+
+    def __len__(self):
+        return len(self.doc_of)
+
+    def _token_id(self, token):
+        token_id = self.token_ids.get(token)
+        if token_id is None:
+            token_id = self.token_ids[token] = len(self.tokens)
+            self.tokens.append(token)
+            self.postings.append(None)
+            self.vocab_pending.append(token)
+            if len(token) >= MIN_FUZZY - 1:
+                for gram in trigrams(token):
+                    self.trigram_index.setdefault(gram, array("i")).append(token_id)
+        return token_id
+
+    def add(self, row):
+        equipo_id = row["id"]
+        previous = self.doc_of.get(equipo_id)
+        if previous is not None:
+            self.dead.add(previous)
+        doc = len(self.doc_ids)
+        self.doc_ids.append(equipo_id)
+        self.doc_of[equipo_id] = doc
+        for token, field in document_tokens(row):
+            token_id = self._token_id(token)
+            entry = doc << 3 | field
+            postings = self.postings[token_id]
+            if postings is None:
+                self.postings[token_id] = entry
+            elif isinstance(postings, int):
+                self.postings[token_id] = array("I", (postings, entry))
+            else:
+                postings.append(entry)
+
+    def _entries(self, token):
+        postings = self.postings[self.token_ids[token]]
+        if isinstance(postings, int):
+            return np.array([postings], dtype=np.uint32)
+        return np.frombuffer(postings, dtype=np.uint32)
+
+    def _idf(self, entries):
+        return math.log(1 + len(self.doc_of) / (1 + len(entries)))
+
+    def _expand(self, term, prefix, fuzzy):
+        # Tokens del vocabulario que cuentan como coincidencia de `term`, con su peso
+        matches = {}
+        if term in self.token_ids:
+            matches[term] = EXACT
+        if prefix and len(term) >= MIN_PREFIX:
+            for token in self._prefixed(term):
+                matches.setdefault(token, PREFIX)
+        if fuzzy and not matches and len(term) >= MIN_FUZZY:
+            matches.update(self._fuzzy(term))
+        return matches
+
+    def merge_vocab(self):
+        # Dos tramos ya ordenados: timsort los mezcla en tiempo lineal
+        self.vocab_pending.sort()
+        self.vocab = sorted(self.vocab + self.vocab_pending)
+        self.vocab_pending = []
+
+    def _prefixed(self, term):
+        # Los tokens nuevos esperan en una lista corta; se ordenan por lotes
+        if len(self.vocab_pending) > PENDING_MERGE:
+            self.merge_vocab()
+        start = bisect_left(self.vocab, term)
+        found = []
+        for token in self.vocab[start:start + MAX_EXPANSIONS]:
+            if not token.startswith(term):
+                break
+            found.append(token)
+        found.extend(t for t in self.vocab_pending if t.startswith(term))
+        return found[:MAX_EXPANSIONS]
+
+    def _fuzzy(self, term):
+        max_dist = 1 if len(term) <= 6 else 2
+        grams = trigrams(term)
+        # Cada edición destruye como mucho 3 trigramas
+        needed = len(grams) - 3 * max_dist
+        lists = []
+        for gram in grams:
+            ids = self.trigram_index.get(gram)
+            if ids is None:
+                continue
+            if len(ids) > MAX_TRIGRAM_POSTINGS:
+                needed -= 1
+                continue
+            lists.append(np.frombuffer(ids, dtype=np.int32))
+        if needed <= 0 or not lists:
+            return {}
+        counts = np.bincount(np.concatenate(lists))
+        candidates = np.flatnonzero(counts >= needed)
+        if len(candidates) > MAX_EXPANSIONS * 4:
+            candidates = candidates[np.argsort(-counts[candidates], kind="stable")[:MAX_EXPANSIONS * 4]]
+        matches = {}
+        for token_id in candidates.tolist():
+            token = self.tokens[token_id]
+            dist = bounded_levenshtein(term, token, max_dist)
+            if dist <= max_dist:
+                matches[token] = FUZZY / dist
+        return matches
+
+    def search(self, query, limit=20, prefix=True, fuzzy=True):
+        """Devuelve (total, [(equipo_id, score)]) con todos los términos presentes."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return 0, []
+        expanded = [self._expand(term, prefix, fuzzy) for term in terms]
+        if not all(expanded):
+            return 0, []
+        # Puntuación densa por documento: máximo por término, suma entre términos
+        n = len(self.doc_ids)
+        total, present = None, None
+        for matches in expanded:
+            term_scores = np.zeros(n, dtype=np.float32)
+            for token, weight in matches.items():
+                entries = self._entries(token)
+                scores = FIELD_WEIGHTS[entries & 7] * np.float32(weight * self._idf(entries))
+                np.maximum.at(term_scores, (entries >> 3).astype(np.intp), scores)
+            if total is None:
+                total, present = term_scores, term_scores > 0
+            else:
+                total += term_scores
+                present &= term_scores > 0
+        total[~present] = 0
+        if self.dead:
+            total[list(self.dead)] = 0
+        docs = np.flatnonzero(total)
+        count = len(docs)
+        if count > limit:
+            # Top-k sin ordenar todo; entre empatados en el corte, los más recientes
+            values = total[docs]
+            kth = np.partition(values, count - limit)[count - limit]
+            above = docs[values > kth]
+            ties = docs[values == kth]
+            docs = np.concatenate([above, ties[len(ties) - (limit - len(above)):]])
+        # Más puntuación primero; a igualdad, el equipo indexado más recientemente
+        docs = sorted(docs.tolist(), key=lambda d: (-total[d], -d))
+        return count, [(self.doc_ids[d], round(float(total[d]), 4)) for d in docs]
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "documents": len(self.doc_of),
+            "superseded": len(self.dead),
+            "tokens": len(self.tokens),
+            "postings": sum(1 if isinstance(p, int) else len(p) for p in self.postings),
+            "trigrams": len(self.trigram_index),
+            "max_id": self.max_id,
+        }
+
+
+async def _index_rows(conn, index, query, params):
+    """Indexa por lotes las filas de `query` que no estén ya en el índice (las
+    altas locales ya se añadieron); devuelve (indexadas, último id leído)."""
+    loaded, last_id = 0, None
+    async with conn.cursor(aiomysql.SSDictCursor) as cur:
+        await timed_execute(cur, query, params)
+        while True:
+            rows = await cur.fetchmany(LOAD_BATCH)
+            if not rows:
+                break
+            for row in rows:
+                if row["id"] not in index.doc_of:
+                    index.add(row)
+                    loaded += 1
+            last_id = rows[-1]["id"]
+            await asyncio.sleep(0)
+    return loaded, last_id
+
+
+async def load_new(index):
+    """Indexa los equipos con id mayor al último indexado, más los que faltan
+    en la ventana de TRAILING_IDS por debajo, leyendo por lotes con un cursor
+    sin buffer y cediendo el event loop entre lotes."""
+    select = f"SELECT id, {', '.join(FIELDS)} FROM equipos"
+    loaded = 0
+    async with db.acquire(readonly=True) as conn:
+        if index.max_id:
+            # Solo ids (cubiertos por la PK) para ver qué falta; las filas, después
+            async with conn.cursor() as cur:
+                await timed_execute(
+                    cur, "SELECT id FROM equipos WHERE id > %s AND id <= %s",
+                    (max(index.max_id - TRAILING_IDS, 0), index.max_id),
+                )
+                late = [row[0] for row in await cur.fetchall() if row[0] not in index.doc_of]
+            for start in range(0, len(late), LOAD_BATCH):
+                chunk = late[start:start + LOAD_BATCH]
+                count, _ = await _index_rows(
+                    conn, index, f"{select} WHERE id IN ({', '.join(['%s'] * len(chunk))}) ORDER BY id", tuple(chunk)
+                )
+                loaded += count
+        count, last_id = await _index_rows(conn, index, f"{select} WHERE id > %s ORDER BY id", (index.max_id,))
+        loaded += count
+        if last_id is not None:
+            index.max_id = last_id
+    return loaded
+
+
+async def keep_in_sync(index):
+    while True:
+        try:
+            loaded = await load_new(index)
+            if not index.ready:
+                index.merge_vocab()
+                index.ready = True
+                print(f"🔎 Índice de búsqueda listo: {len(index)} equipos")
+            elif loaded:
+                print(f"🔎 Índice de búsqueda: {loaded} equipos nuevos")
+        except Exception as e:
+            print(f"⚠️ Error actualizando el índice de búsqueda: {e}")
+        await asyncio.sleep(REFRESH_INTERVAL)
+
+
+search_index = SearchIndex()
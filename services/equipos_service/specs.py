@@ -0,0 +1,189 @@
+import asyncio
+import re
+from decimal import Decimal, InvalidOperation
+import aiomysql
+from common.db import db
+from common.metrics import timed_execute
+from common.refcache import reference_cache
+
+# Claves de especificaciones con columna generada e índice (migración 0004 y registro en caliente)
+reference_cache.register("especificaciones", "SELECT * FROM especificaciones_indexadas ORDER BY clave")
+
+# Claves ad hoc: se interpolan en la ruta JSON, así que solo letras, dígitos y _
+KEY_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9_]{0,47}$")
+# Claves registrables: además dan nombre a la columna y al índice
+INDEXED_KEY_PATTERN = re.compile(r"^[a-z][a-z0-9_]{0,47}$")
+
+# tipo -> (tipo de la columna generada, RETURNING de JSON_VALUE)
+TYPES = {
+    "numero": ("DECIMAL(14,3)", "DECIMAL(14,3)"),
+    "texto": ("VARCHAR(128)", "CHAR(128)"),
+}
+COMPARISONS = {"eq": "=", "ne": "<>", "lt": "<", "lte": "<=", "gt": ">", "gte": ">="}
+OPERATORS = set(COMPARISONS) | {"in", "contains", "exists"}
+
+REGISTRY_LOCK = "especificaciones_indexadas"
+
+# Construcciones de índice en curso (referencia fuerte para que no se recolecten)
+_builds = set()
+
+
+class SpecQueryError(ValueError):
+    pass
+
+
+def spec_expression(clave, tipo, source="especificaciones"):
+    # Misma expresión para la columna generada y para el filtro ad hoc sin índice
+    return f"JSON_VALUE({source}, '$.{clave}' RETURNING {TYPES[tipo][1]} NULL ON EMPTY NULL ON ERROR)"
+
+
+def column_name(clave):
+    return f"spec_{clave}"
+
+
+def index_name(clave):
+    return f"idx_equipos_spec_{clave}"
+
+
+async def active_keys():
+    return {row["clave"]: row for row in await reference_cache.rows("especificaciones") if row["estado"] == "activa"}
+
+
+def _number(clave, value):
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    if number is None or not number.is_finite():
+        raise SpecQueryError(f"{clave}: '{value}' no es un número")
+    return number
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def parse_spec_filters(items, registry):
+    """Traduce parámetros clave__operador=valor a filtros (cláusula, valor).
+
+    Las claves registradas comparan contra su columna generada indexada; el
+    resto usa JSON_VALUE sobre la columna JSON (recorre la tabla) y se
+    devuelve aparte para avisar al cliente. Devuelve (filtros, claves sin índice).
+    """
+    filters, unindexed = [], []
+    for param, value in items:
+        if "__" not in param:
+            continue
+        clave, op = param.rsplit("__", 1)
+        if op not in OPERATORS:
+            raise SpecQueryError(f"Operador desconocido '{op}' en {param}; use {', '.join(sorted(OPERATORS))}")
+        if not KEY_PATTERN.match(clave):
+            raise SpecQueryError(f"Clave de especificación inválida: {clave}")
+
+        spec = registry.get(clave)
+        if spec is not None:
+            tipo = spec["tipo"]
+            expression = f"e.{spec['columna']}"
+        else:
+            # Sin tipo registrado: los rangos comparan como número, el resto como texto
+            tipo = "numero" if op in ("lt", "lte", "gt", "gte") else "texto"
+            expression = spec_expression(clave, tipo, "e.especificaciones")
+            if clave not in unindexed:
+                unindexed.append(clave)
+
+        if op == "exists":
+            present = value.lower() in ("1", "true", "yes", "si")
+            filters.append((f"{expression} IS {'NOT ' if present else ''}NULL", ()))
+        elif op == "contains":
+            if tipo != "texto":
+                raise SpecQueryError(f"{clave}: contains solo aplica a claves de texto")
+            filters.append((f"{expression} LIKE %s", f"%{_escape_like(value)}%"))
+        elif op == "in":
+            values = [v.strip() for v in value.split(",") if v.strip()]
+            if not values:
+                raise SpecQueryError(f"{param}: lista vacía")
+            if tipo == "numero":
+                values = [_number(clave, v) for v in values]
+            filters.append((f"{expression} IN ({', '.join(['%s'] * len(values))})", tuple(values)))
+        else:
+            filters.append((f"{expression} {COMPARISONS[op]} %s", _number(clave, value) if tipo == "numero" else value))
+    return filters, unindexed
+
+
+async def _has(cur, query, params):
+    await timed_execute(cur, query, params)
+    return (await cur.fetchone())[0] > 0
+
+
+async def build_index(clave, tipo):
+    """Crea la columna generada y su índice sin bloquear escrituras.
+
+    ADD COLUMN ... VIRTUAL es instantáneo (solo metadatos) y el índice se
+    construye con ALGORITHM=INPLACE, LOCK=NONE. Cada paso comprueba si ya
+    existe, así que reintentar tras un fallo continúa donde se quedó.
+    """
+    column, index = column_name(clave), index_name(clave)
+    async with db.acquire() as conn:
+        async with conn.cursor() as cur:
+            await timed_execute(cur, "SELECT GET_LOCK(%s, 30)", (REGISTRY_LOCK,))
+            if (await cur.fetchone())[0] != 1:
+                # Sin esto la clave quedaría 'construyendo' para siempre; en error se
+                # puede reintentar registrándola de nuevo
+                await timed_execute(
+                    cur,
+                    "UPDATE especificaciones_indexadas SET estado = 'error', error = %s WHERE clave = %s",
+                    ("Tiempo de espera agotado por otra construcción de índice; reintente", clave),
+                )
+                await reference_cache.bump(cur, "especificaciones")
+                return
+            try:
+                if not await _has(cur, """
+                    SELECT COUNT(*) FROM information_schema.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'equipos' AND COLUMN_NAME = %s
+                """, (column,)):
+                    await timed_execute(cur, f"""
+                        ALTER TABLE equipos ADD COLUMN {column} {TYPES[tipo][0]}
+                        GENERATED ALWAYS AS ({spec_expression(clave, tipo)}) VIRTUAL, ALGORITHM=INSTANT
+                    """)
+                if not await _has(cur, """
+                    SELECT COUNT(*) FROM information_schema.STATISTICS
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'equipos' AND INDEX_NAME = %s
+                """, (index,)):
+                    await timed_execute(cur, f"CREATE INDEX {index} ON equipos ({column}) ALGORITHM=INPLACE LOCK=NONE")
+                await timed_execute(
+                    cur, "UPDATE especificaciones_indexadas SET estado = 'activa', error = NULL WHERE clave = %s", (clave,)
+                )
+            except Exception as e:
+                print(f"❌ Índice de especificación '{clave}': {e}")
+                await timed_execute(
+                    cur, "UPDATE especificaciones_indexadas SET estado = 'error', error = %s WHERE clave = %s", (str(e), clave)
+                )
+            finally:
+                await reference_cache.bump(cur, "especificaciones")
+                await timed_execute(cur, "SELECT RELEASE_LOCK(%s)", (REGISTRY_LOCK,))
+
+
+async def register_key(clave, tipo):
+    # Alta (o reintento si quedó en error o a medias) de una clave indexada; el índice
+    # se construye en segundo plano y la clave se usa en consultas al quedar activa
+    if not INDEXED_KEY_PATTERN.match(clave):
+        raise SpecQueryError("La clave debe ser snake_case en minúsculas (máx. 48 caracteres)")
+    if tipo not in TYPES:
+        raise SpecQueryError(f"Tipo desconocido '{tipo}'; use {', '.join(TYPES)}")
+    async with db.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await timed_execute(cur, "SELECT * FROM especificaciones_indexadas WHERE clave = %s", (clave,))
+            current = await cur.fetchone()
+            if current is not None and current["tipo"] != tipo:
+                raise SpecQueryError(f"La clave '{clave}' ya está registrada como {current['tipo']}")
+            if current is not None and current["estado"] == "activa":
+                return current
+            await timed_execute(cur, """
+                INSERT INTO especificaciones_indexadas (clave, tipo, columna, estado) VALUES (%s, %s, %s, 'construyendo')
+                ON DUPLICATE KEY UPDATE estado = 'construyendo', error = NULL
+            """, (clave, tipo, column_name(clave)))
+            await reference_cache.bump(cur, "especificaciones")
+    task = asyncio.create_task(build_index(clave, tipo))
+    _builds.add(task)
+    task.add_done_callback(_builds.discard)
+    return {"clave": clave, "tipo": tipo, "columna": column_name(clave), "estado": "construyendo"}
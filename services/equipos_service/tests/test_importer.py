@@ -0,0 +1,102 @@
+from datetime import date, datetime
+from io import BytesIO
+from typing import Optional
+import pytest
+from openpyxl import Workbook
+from pydantic import BaseModel
+import importer
+
+
+class Equipo(BaseModel):
+    # Mismos campos que EquipoCreate de main.py
+    codigo_inventario: str
+    categoria_id: int
+    nombre: str
+    marca: Optional[str] = None
+    modelo: Optional[str] = None
+    numero_serie: Optional[str] = None
+    especificaciones: Optional[dict] = None
+    proveedor_id: Optional[int] = None
+    fecha_compra: Optional[date] = None
+    costo_compra: Optional[float] = None
+    fecha_garantia_fin: Optional[date] = None
+    ubicacion_actual_id: Optional[int] = None
+    estado_operativo: str = "operativo"
+    notas: Optional[str] = None
+
+
+LOOKUPS = {"categoria": {"laptops": 1}, "ubicacion": {"edificio a - 101": 7}, "proveedor": {}}
+
+
+def test_clean():
+    row = importer._clean({
+        "nombre": "  Dell  ", "notas": "   ", "": "sin cabecera",
+        "fecha_compra": datetime(2024, 3, 1, 0, 0), "numero_serie": 1234.0, "codigo_inventario": 99,
+        "costo_compra": 1500.5, "categoria_id": 2,
+    })
+    assert row == {
+        "nombre": "Dell", "notas": None, "fecha_compra": date(2024, 3, 1),
+        "numero_serie": "1234", "codigo_inventario": "99", "costo_compra": 1500.5, "categoria_id": 2,
+    }
+
+
+def test_parse_rows_resolves_names_and_reports_errors():
+    rows = [
+        (2, {"codigo_inventario": "EQ-1", "nombre": "Laptop", "categoria": " LAPTOPS ",
+             "ubicacion": "Edificio  A - 101", "especificaciones": '{"ram_gb": 16}', "costo_compra": "900"}),
+        (3, {"codigo_inventario": "EQ-2", "nombre": "Impresora", "categoria": "Impresoras", "especificaciones": "{"}),
+        (4, {"codigo_inventario": "EQ-1", "nombre": "Repetido", "categoria_id": "1"}),
+        (5, {"codigo_inventario": "EQ-3", "categoria_id": "uno"}),
+    ]
+    valid, errors = importer.parse_rows(rows, Equipo, LOOKUPS)
+
+    assert len(valid) == 1
+    number, values = valid[0]
+    record = dict(zip(importer.INSERT_COLUMNS, values))
+    assert number == 2
+    assert record["categoria_id"] == 1 and record["ubicacion_actual_id"] == 7
+    assert record["especificaciones"] == '{"ram_gb": 16}'
+    assert record["estado_operativo"] == "operativo"
+
+    assert [e["fila"] for e in errors] == [3, 4, 5]
+    assert errors[0]["errores"] == [
+        "categoria: 'Impresoras' no existe", "especificaciones: JSON inválido", "categoria_id: Field required",
+    ]
+    assert errors[1]["errores"] == ["codigo_inventario repetido en la fila 2"]
+    assert {e.split(":")[0] for e in errors[2]["errores"]} == {"categoria_id", "nombre"}
+
+
+def test_iter_csv_skips_blank_rows():
+    data = "\ufeffCodigo Inventario,Nombre\nEQ-1,Laptop\n , \nEQ-2,Monitor\n".encode()
+    assert list(importer.iter_csv(BytesIO(data))) == [
+        (2, {"codigo_inventario": "EQ-1", "nombre": "Laptop"}),
+        (4, {"codigo_inventario": "EQ-2", "nombre": "Monitor"}),
+    ]
+    with pytest.raises(importer.ImportFormatError):
+        list(importer.iter_csv(BytesIO(b"")))
+
+
+def test_iter_xlsx():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Codigo Inventario", "Numero Serie"])
+    sheet.append(["EQ-1", 1234])
+    sheet.append([None, None])
+    sheet.append(["EQ-2", "SN-9"])
+    buffer = BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    assert list(importer.iter_xlsx(buffer)) == [
+        (2, {"codigo_inventario": "EQ-1", "numero_serie": 1234}),
+        (4, {"codigo_inventario": "EQ-2", "numero_serie": "SN-9"}),
+    ]
+
+
+@pytest.mark.parametrize("filename, reader", [("a.CSV", importer.iter_csv), ("b.xlsx", importer.iter_xlsx)])
+def test_reader_for(filename, reader):
+    assert importer.reader_for(filename) is reader
+
+
+def test_reader_for_rejects_other_formats():
+    with pytest.raises(importer.ImportFormatError):
+        importer.reader_for("equipos.xls")
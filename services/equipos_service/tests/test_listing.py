@@ -0,0 +1,70 @@
+import sqlite3
+from datetime import datetime
+import pytest
+import listing
+
+
+def test_cursor_round_trip():
+    fecha = datetime(2024, 5, 1, 10, 30, 15)
+    assert listing.decode_cursor(listing.encode_cursor(fecha, 42)) == (fecha, 42)
+    assert listing.decode_cursor(listing.encode_cursor(None, 7)) == (None, 7)
+
+
+@pytest.mark.parametrize("cursor", ["", "no-es-base64!", "W10", listing.encode_cursor(None, 1)[:-2]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(listing.ListingError):
+        listing.decode_cursor(cursor)
+
+
+def test_parse_fields():
+    assert listing.parse_fields("id, nombre,categoria_nombre") == ["id", "nombre", "categoria_nombre"]
+    assert listing.parse_fields(None) == list(listing.FIELDS) + list(listing.NAME_FIELDS)
+    with pytest.raises(listing.ListingError, match="inexistente"):
+        listing.parse_fields("id,inexistente")
+
+
+def test_build_where_skips_none_and_expands_tuples():
+    query, params = listing.build_where("SELECT 1", [("a = %s", 1), ("b = %s", None), ("c IN (%s, %s)", (2, 3))])
+    assert query == "SELECT 1 WHERE a = %s AND c IN (%s, %s)"
+    assert params == (1, 2, 3)
+
+
+def test_paginate_cursor_on_null_fecha():
+    rows = [
+        {"_id": 5, "_fecha_registro": datetime(2024, 1, 1), "nombre": "a"},
+        {"_id": 3, "_fecha_registro": None, "nombre": "b"},
+        {"_id": 2, "_fecha_registro": None, "nombre": "c"},
+    ]
+    page = listing.paginate(rows, 2)
+    assert page["items"] == [{"nombre": "a"}, {"nombre": "b"}]
+    assert listing.decode_cursor(page["next_cursor"]) == (None, 3)
+    last = [{"_id": 1, "_fecha_registro": None, "nombre": "d"}]
+    assert listing.paginate(last, 2)["next_cursor"] is None
+
+
+@pytest.fixture
+def equipos():
+    # SQLite ordena los NULL igual que MySQL: primero en ASC, al final en DESC
+    sqlite3.register_converter("timestamp", lambda b: datetime.fromisoformat(b.decode()))
+    sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+    conn = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE equipos (id INTEGER PRIMARY KEY, nombre TEXT, fecha_registro timestamp)")
+    fechas = [datetime(2024, 3, 1), None, datetime(2024, 3, 1), datetime(2024, 1, 1), None,
+              datetime(2024, 5, 1), None, datetime(2024, 3, 1)]
+    conn.executemany("INSERT INTO equipos VALUES (?, ?, ?)", [(i, f"E{i}", f) for i, f in enumerate(fechas, 1)])
+    return conn
+
+
+def test_keyset_walks_every_row_once(equipos):
+    expected = [r["id"] for r in equipos.execute("SELECT id FROM equipos ORDER BY fecha_registro DESC, id DESC")]
+    seen, cursor = [], None
+    for _ in range(10):
+        query, params = listing.build_query(["nombre"], [], cursor, 3)
+        rows = [dict(r) for r in equipos.execute(query.replace("%s", "?"), params)]
+        page = listing.paginate(rows, 3)
+        seen += [int(item["nombre"][1:]) for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == expected
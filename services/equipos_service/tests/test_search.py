@@ -0,0 +1,53 @@
+import search
+
+
+def equipo(equipo_id, **fields):
+    return {"id": equipo_id, **fields}
+
+
+def build(*rows):
+    index = search.SearchIndex()
+    for row in rows:
+        index.add(row)
+    return index
+
+
+def test_tokens():
+    assert search.tokenize("Cámara Ñandú-4K") == ["camara", "nandu", "4k"]
+    tokens = search.document_tokens(equipo(1, codigo_inventario="UNT-LAP-001", especificaciones='{"ram": {"gb": 16}}'))
+    assert ("untlap001", 0) in tokens and ("lap", 0) in tokens
+    assert {("ram", 5), ("gb", 5), ("16", 5)} <= tokens
+
+
+def test_bounded_levenshtein():
+    assert search.bounded_levenshtein("lenovo", "lenvo", 1) == 1
+    assert search.bounded_levenshtein("lenovo", "dell", 2) == 3
+    assert search.bounded_levenshtein("abc", "abc", 0) == 0
+
+
+def test_exact_prefix_and_fuzzy():
+    index = build(
+        equipo(1, nombre="Laptop Lenovo ThinkPad", codigo_inventario="UNT-LAP-001"),
+        equipo(2, nombre="Proyector Epson", marca="Epson"),
+        equipo(3, nombre="Laptop Dell Latitude"),
+    )
+    assert index.search("lenovo")[1][0][0] == 1
+    # Todos los términos deben aparecer
+    assert [d for d, _ in index.search("laptop dell")[1]] == [3]
+    assert [d for d, _ in index.search("lat")[1]] == [3]
+    assert [d for d, _ in index.search("epsn")[1]] == [2]
+    assert index.search("epsn", fuzzy=False) == (0, [])
+    assert [d for d, _ in index.search("UNTLAP001")[1]] == [1]
+    assert index.search("   ") == (0, [])
+
+
+def test_ranking_limit_and_reindex():
+    index = build(*[equipo(i, nombre="Monitor Samsung") for i in range(1, 6)], equipo(6, marca="Monitor"))
+    total, results = index.search("monitor", limit=2)
+    # Nombre pesa más que marca; a igualdad, el más reciente primero
+    assert total == 6 and [d for d, _ in results] == [5, 4]
+
+    index.add(equipo(5, nombre="Teclado"))
+    assert [d for d, _ in index.search("monitor")[1]][:1] == [4]
+    assert [d for d, _ in index.search("teclado")[1]] == [5]
+    assert len(index) == 6 and index.stats()["superseded"] == 1
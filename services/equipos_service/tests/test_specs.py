@@ -0,0 +1,49 @@
+from decimal import Decimal
+import pytest
+import specs
+
+REGISTRY = {
+    "ram_gb": {"clave": "ram_gb", "tipo": "numero", "columna": "spec_ram_gb"},
+    "cpu": {"clave": "cpu", "tipo": "texto", "columna": "spec_cpu"},
+}
+
+
+def test_registered_keys_use_generated_column():
+    filters, unindexed = specs.parse_spec_filters(
+        [("ram_gb__gte", "8"), ("cpu__contains", "i7_%"), ("estado", "operativo")], REGISTRY
+    )
+    assert filters == [
+        ("e.spec_ram_gb >= %s", Decimal("8")),
+        ("e.spec_cpu LIKE %s", "%i7\\_\\%%"),
+    ]
+    assert unindexed == []
+
+
+def test_unregistered_keys_use_json_value_once():
+    filters, unindexed = specs.parse_spec_filters([("disco__lt", "512"), ("disco__gt", "128"), ("color__eq", "gris")], {})
+    assert unindexed == ["disco", "color"]
+    assert filters[0] == (f"{specs.spec_expression('disco', 'numero', 'e.especificaciones')} < %s", Decimal("512"))
+    assert filters[2] == (f"{specs.spec_expression('color', 'texto', 'e.especificaciones')} = %s", "gris")
+
+
+def test_in_and_exists():
+    filters, _ = specs.parse_spec_filters([("ram_gb__in", "8, 16,,"), ("cpu__exists", "no"), ("ram_gb__exists", "si")], REGISTRY)
+    assert filters == [
+        ("e.spec_ram_gb IN (%s, %s)", (Decimal("8"), Decimal("16"))),
+        ("e.spec_cpu IS NULL", ()),
+        ("e.spec_ram_gb IS NOT NULL", ()),
+    ]
+
+
+@pytest.mark.parametrize("items, message", [
+    ([("ram_gb__like", "8")], "Operador desconocido"),
+    ([("ram-gb__eq", "8")], "inválida"),
+    ([("x') OR 1=1 -- __eq", "8")], "inválida"),
+    ([("ram_gb__lt", "ocho")], "no es un número"),
+    ([("ram_gb__lt", "NaN")], "no es un número"),
+    ([("ram_gb__contains", "8")], "solo aplica a claves de texto"),
+    ([("cpu__in", " , ")], "lista vacía"),
+])
+def test_invalid_filters(items, message):
+    with pytest.raises(specs.SpecQueryError, match=message):
+        specs.parse_spec_filters(items, REGISTRY)
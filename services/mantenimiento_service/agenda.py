@@ -0,0 +1,98 @@
+import base64
+import json
+from collections import Counter
+from datetime import date
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+# Ventana máxima del calendario: acota los conteos por día
+MAX_WINDOW_DAYS = 366
+
+PAGE_COLUMNS = """
+    m.id, m.equipo_id, e.codigo_inventario, e.nombre as equipo_nombre, m.tipo, m.descripcion,
+    m.fecha_programada, m.fecha_realizada, m.costo, m.estado, m.prioridad
+"""
+
+
+class AgendaError(ValueError):
+    pass
+
+
+def encode_cursor(fecha, mant_id):
+    raw = json.dumps([fecha.isoformat(), mant_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        fecha, mant_id = json.loads(raw)
+        return date.fromisoformat(fecha), int(mant_id)
+    except Exception:
+        raise AgendaError("Cursor inválido")
+
+
+def window_filters(desde, hasta, estado, prioridad, equipo_id):
+    if hasta < desde:
+        raise AgendaError("'to' es anterior a 'from'")
+    if (hasta - desde).days > MAX_WINDOW_DAYS:
+        raise AgendaError(f"La ventana no puede superar {MAX_WINDOW_DAYS} días")
+    where = ["m.fecha_programada >= %s", "m.fecha_programada <= %s"]
+    params = [desde, hasta]
+    for clause, value in (("m.estado = %s", estado), ("m.prioridad = %s", prioridad), ("m.equipo_id = %s", equipo_id)):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    return where, params
+
+
+def page_query(where, params, cursor, limit):
+    """Página ordenada por (fecha_programada, id): cada página es un rango sobre
+    el índice, así que el coste no crece con los años de historial."""
+    where, params = list(where), list(params)
+    if cursor:
+        fecha, mant_id = decode_cursor(cursor)
+        where.append("(m.fecha_programada > %s OR (m.fecha_programada = %s AND m.id > %s))")
+        params.extend((fecha, fecha, mant_id))
+    query = f"""
+        SELECT {PAGE_COLUMNS}
+        FROM mantenimientos m
+        LEFT JOIN equipos e ON m.equipo_id = e.id
+        WHERE {' AND '.join(where)}
+        ORDER BY m.fecha_programada, m.id
+        LIMIT %s
+    """
+    return query, (*params, limit + 1)
+
+
+def counts_query(where, params):
+    # Solo columnas de idx_mantenimientos_dia_estado: se resuelve sin leer filas
+    query = f"""
+        SELECT m.fecha_programada, m.estado, m.prioridad, COUNT(*) as cantidad
+        FROM mantenimientos m
+        WHERE {' AND '.join(where)}
+        GROUP BY m.fecha_programada, m.estado, m.prioridad
+    """
+    return query, tuple(params)
+
+
+def fold_counts(rows):
+    days = {}
+    for fecha, estado, prioridad, cantidad in rows:
+        day = days.get(fecha)
+        if day is None:
+            day = days[fecha] = {"fecha": fecha, "total": 0, "por_estado": Counter(), "por_prioridad": Counter()}
+        day["total"] += cantidad
+        day["por_estado"][estado] += cantidad
+        day["por_prioridad"][prioridad] += cantidad
+    for day in days.values():
+        day["por_estado"] = dict(day["por_estado"])
+        day["por_prioridad"] = dict(day["por_prioridad"])
+    return [days[fecha] for fecha in sorted(days)]
+
+
+def paginate(rows, limit):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]["fecha_programada"], rows[-1]["id"]) if has_more else None
+    return rows, next_cursor
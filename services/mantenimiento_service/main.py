@@ -1,22 +1,31 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional
 import aiomysql
-import os
-from datetime import date
-
-app = FastAPI(title="Mantenimiento Service")
-
-# Configuración para MySQL
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'mysql'),
-    'user': os.getenv('DB_USER', 'user_ti'),
-    'password': os.getenv('DB_PASSWORD', 'password'),
-    'db': os.getenv('DB_NAME', 'ti_management'),
-    'port': 3306,
-    'autocommit': True,
-    'charset': 'utf8mb4'  # <--- AQUÍ ES DONDE SE AÑADE EL CHARSET
-}
+from datetime import date, timedelta
+from decimal import Decimal
+from common.compression import CompressionMiddleware
+from common.metrics import instrument, timed_execute
+from common.db import ReadYourWritesMiddleware, db, db_lifespan
+from common.export import export_response
+from common.refcache import reference_cache
+from common.resumen import add_mantenimientos
+from common.serialization import FastJSONResponse
+from agenda import (
+    DEFAULT_LIMIT, MAX_LIMIT, AgendaError, counts_query, fold_counts, page_query, paginate, window_filters,
+)
+from scheduling import (
+    BATCH_SIZE, MAX_EQUIPOS, SCHEDULE_LOCK, SchedulingError, already_scheduled, assign_dates, day_load, insert_all,
+    summarize, target_equipos,
+)
+
+app = FastAPI(title="Mantenimiento Service", lifespan=db_lifespan)
+# Comprime JSON grandes en el salto hacia el gateway
+app.add_middleware(CompressionMiddleware)
+# Escrituras y peticiones con X-Read-Your-Writes leen del primario, no de réplicas
+app.add_middleware(ReadYourWritesMiddleware)
+# Latencias por ruta y por sentencia SQL en /metrics (formato Prometheus)
+instrument(app, "mantenimiento")
 
 class MantenimientoCreate(BaseModel):
     equipo_id: int
@@ -31,8 +40,29 @@ class MantenimientoUpdate(BaseModel):
     estado: Optional[str] = None
     observaciones: Optional[str] = None
 
-async def get_db_pool():
-    return await aiomysql.create_pool(**DB_CONFIG)
+class MantenimientoLote(BaseModel):
+    # Selección de equipos: lista explícita y/o filtros (se combinan con AND)
+    equipo_ids: Optional[List[int]] = Field(None, max_length=MAX_EQUIPOS)
+    categoria_id: Optional[int] = None
+    ubicacion_id: Optional[int] = None
+    estado_operativo: Optional[str] = None
+    tipo: str
+    descripcion: str
+    prioridad: str = "media"
+    # Ventana en la que se reparten las fechas y cupo de órdenes abiertas por día
+    desde: date
+    hasta: date
+    capacidad_diaria: int = Field(10, ge=1, le=1000)
+    solo_dias_habiles: bool = True
+    dry_run: bool = False
+
+class MantenimientoCierreLote(MantenimientoUpdate):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_EQUIPOS)
+
+@app.get("/db/pool")
+async def db_pool_stats():
+    # Uso del pool, para dimensionarlo frente a max_connections de MySQL
+    return db.stats()
 
 @app.get("/")
 async def root():
@@ -40,42 +70,164 @@ async def root():
 
 @app.get("/mantenimientos")
 async def get_mantenimientos():
-    pool = await get_db_pool()
-    async with pool.acquire() as conn:
+    async with db.acquire(readonly=True) as conn:
         async with conn.cursor(aiomysql.DictCursor) as cur:
             # Usamos sintaxis MySQL
-            await cur.execute("""
+            await timed_execute(cur, """
                 SELECT m.*, e.nombre as equipo_nombre, e.codigo_inventario 
                 FROM mantenimientos m
                 JOIN equipos e ON m.equipo_id = e.id 
                 ORDER BY m.fecha_programada ASC
             """)
             result = await cur.fetchall()
-            
-            # Convertir fechas a string para evitar errores de JSON
-            for r in result:
-                if r.get('fecha_programada'): r['fecha_programada'] = str(r['fecha_programada'])
-                if r.get('fecha_realizada'): r['fecha_realizada'] = str(r['fecha_realizada'])
-            return result
+    # Fechas y decimales se serializan directamente, sin recorrer cada fila
+    return FastJSONResponse(result)
+
+@app.get("/mantenimientos/calendario")
+async def get_calendario(
+    desde: Optional[date] = Query(None, alias="from"),
+    hasta: Optional[date] = Query(None, alias="to"),
+    estado: Optional[str] = None,
+    prioridad: Optional[str] = None,
+    equipo_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+):
+    # Órdenes de una ventana de fechas (por defecto el mes en curso), paginadas con
+    # next_cursor; la primera página trae además los conteos por día del calendario
+    today = date.today()
+    desde = desde or today.replace(day=1)
+    hasta = hasta or (desde.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    try:
+        where, params = window_filters(desde, hasta, estado, prioridad, equipo_id)
+        query, page_params = page_query(where, params, cursor, limit)
+    except AgendaError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async with db.acquire(readonly=True) as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await timed_execute(cur, query, page_params)
+            items, next_cursor = paginate(await cur.fetchall(), limit)
+        dias = None
+        if not cursor:
+            async with conn.cursor() as cur:
+                await timed_execute(cur, *counts_query(where, params))
+                dias = fold_counts(await cur.fetchall())
+    return FastJSONResponse({
+        "from": desde, "to": hasta, "items": items, "next_cursor": next_cursor, "limit": limit, "dias": dias,
+    })
+
+EXPORT_COLUMNS = [
+    "id", "equipo_id", "codigo_inventario", "equipo_nombre", "tipo", "fecha_programada",
+    "fecha_realizada", "descripcion", "costo", "estado", "prioridad", "tecnico_id",
+    "observaciones", "fecha_creacion",
+]
+
+@app.get("/mantenimientos/export")
+async def export_mantenimientos(
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    equipo_id: Optional[int] = None,
+    estado: Optional[str] = None,
+    tipo: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+):
+    # Historial completo de mantenimientos en streaming (NDJSON o CSV), por fecha programada
+    where, params = [], []
+    for clause, value in (
+        ("m.equipo_id = %s", equipo_id),
+        ("m.estado = %s", estado),
+        ("m.tipo = %s", tipo),
+        ("m.fecha_programada >= %s", desde),
+        ("m.fecha_programada <= %s", hasta),
+    ):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    query = """
+        SELECT m.id, m.equipo_id, e.codigo_inventario, e.nombre as equipo_nombre, m.tipo,
+               m.fecha_programada, m.fecha_realizada, m.descripcion, m.costo, m.estado,
+               m.prioridad, m.tecnico_id, m.observaciones, m.fecha_creacion
+        FROM mantenimientos m
+        JOIN equipos e ON m.equipo_id = e.id
+    """
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    # Orden por PK: las filas salen mientras se recorre la tabla, sin filesort previo
+    query += " ORDER BY m.id"
+    return export_response(query, tuple(params), formato, EXPORT_COLUMNS, "mantenimientos")
 
 @app.post("/mantenimientos")
 async def create_mantenimiento(mant: MantenimientoCreate):
-    pool = await get_db_pool()
-    async with pool.acquire() as conn:
+    async with db.acquire() as conn:
         async with conn.cursor() as cur:
-            # Usamos %s en lugar de $1 para MySQL
-            await cur.execute("""
-                INSERT INTO mantenimientos (equipo_id, tipo, fecha_programada, descripcion, prioridad)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (mant.equipo_id, mant.tipo, mant.fecha_programada, mant.descripcion, mant.prioridad))
-            return {"message": "Mantenimiento programado", "id": cur.lastrowid}
+            await conn.begin()
+            try:
+                # Usamos %s en lugar de $1 para MySQL
+                await timed_execute(cur, """
+                    INSERT INTO mantenimientos (equipo_id, tipo, fecha_programada, descripcion, prioridad)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (mant.equipo_id, mant.tipo, mant.fecha_programada, mant.descripcion, mant.prioridad))
+                mant_id = cur.lastrowid
+                await add_mantenimientos(cur, [(mant.fecha_programada, 1, None)])
+                await reference_cache.bump(cur, "mantenimientos")
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+            return {"message": "Mantenimiento programado", "id": mant_id}
 
-@app.put("/mantenimientos/{mant_id}")
-async def update_mantenimiento(mant_id: int, mant: MantenimientoUpdate):
-    pool = await get_db_pool()
+@app.post("/mantenimientos/lote")
+async def programar_lote(lote: MantenimientoLote):
+    # Programa un mantenimiento para muchos equipos a la vez, repartido en la ventana
+    # sin superar capacidad_diaria; dry_run devuelve el plan sin insertar nada
+    if lote.hasta < lote.desde:
+        raise HTTPException(status_code=400, detail="'hasta' es anterior a 'desde'")
+    if (lote.hasta - lote.desde).days > 366:
+        raise HTTPException(status_code=400, detail="La ventana no puede superar un año")
+
+    async with db.acquire() as conn:
+        async with conn.cursor() as cur:
+            await timed_execute(cur, "SELECT GET_LOCK(%s, 10)", (SCHEDULE_LOCK,))
+            if (await cur.fetchone())[0] != 1:
+                raise HTTPException(status_code=409, detail="Otra programación masiva está en curso", headers={"Retry-After": "5"})
+            try:
+                try:
+                    ids = await target_equipos(cur, lote)
+                except SchedulingError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                skipped = await already_scheduled(cur, ids, lote)
+                ids = [equipo_id for equipo_id in ids if equipo_id not in skipped]
+                assignments, unassigned = assign_dates(ids, lote, await day_load(cur, lote))
+                result = {
+                    "dry_run": lote.dry_run,
+                    "equipos": len(ids) + len(skipped),
+                    "ya_programados": len(skipped),
+                    "programados": len(assignments),
+                    "sin_cupo": len(unassigned),
+                    "por_dia": summarize(assignments),
+                }
+                if lote.dry_run:
+                    result["muestra"] = [{"equipo_id": e, "fecha_programada": d} for e, d in assignments[:50]]
+                    return result
+                if unassigned:
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"Sin cupo para {len(unassigned)} equipos: amplíe la ventana o la capacidad diaria",
+                    )
+                rows = [(e, lote.tipo, d, lote.descripcion, lote.prioridad) for e, d in assignments]
+                try:
+                    await insert_all(conn, cur, rows)
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail=f"Programación revertida: {e}")
+                return result
+            finally:
+                await timed_execute(cur, "SELECT RELEASE_LOCK(%s)", (SCHEDULE_LOCK,))
+
+def update_clauses(mant):
     updates = []
     params = []
-    
+
     if mant.fecha_realizada:
         updates.append("fecha_realizada = %s")
         params.append(mant.fecha_realizada)
@@ -88,17 +240,81 @@ async def update_mantenimiento(mant_id: int, mant: MantenimientoUpdate):
     if mant.observaciones:
         updates.append("observaciones = %s")
         params.append(mant.observaciones)
+    return updates, params
 
+def cost_changes(rows, costo):
+    # (fecha_programada, costo anterior) de las filas tocadas -> cambios para el resumen mensual
+    if costo is None:
+        return []
+    return [(fecha, 0, Decimal(str(costo)) - (anterior or 0)) for fecha, anterior in rows]
+
+@app.put("/mantenimientos/lote")
+async def cerrar_lote(cierre: MantenimientoCierreLote):
+    # Cierra (o actualiza) muchas órdenes con los mismos valores en una transacción
+    updates, params = update_clauses(cierre)
+    if not updates:
+        raise HTTPException(status_code=400, detail="Nada que actualizar")
+    ids = sorted(set(cierre.ids))
+
+    async with db.acquire() as conn:
+        async with conn.cursor() as cur:
+            await conn.begin()
+            try:
+                found, previous = set(), []
+                for start in range(0, len(ids), BATCH_SIZE):
+                    chunk = ids[start:start + BATCH_SIZE]
+                    placeholders = ", ".join(["%s"] * len(chunk))
+                    # FOR UPDATE: las filas quedan bloqueadas hasta el commit y se sabe cuáles existen
+                    await timed_execute(
+                        cur,
+                        f"SELECT id, fecha_programada, costo FROM mantenimientos WHERE id IN ({placeholders}) FOR UPDATE",
+                        tuple(chunk),
+                    )
+                    for mant_id, fecha, costo in await cur.fetchall():
+                        found.add(mant_id)
+                        previous.append((fecha, costo))
+                    await timed_execute(
+                        cur,
+                        f"UPDATE mantenimientos SET {', '.join(updates)} WHERE id IN ({placeholders})",
+                        (*params, *chunk),
+                    )
+                # Al final de la transacción: resumen y versión quedan bloqueados solo hasta el commit
+                await add_mantenimientos(cur, cost_changes(previous, cierre.costo))
+                await reference_cache.bump(cur, "mantenimientos")
+                await conn.commit()
+            except Exception as e:
+                await conn.rollback()
+                raise HTTPException(status_code=400, detail=f"Actualización revertida: {e}")
+
+    return {
+        "message": "Mantenimientos actualizados",
+        "actualizados": len(found),
+        "no_encontrados": [mant_id for mant_id in ids if mant_id not in found],
+    }
+
+@app.put("/mantenimientos/{mant_id}")
+async def update_mantenimiento(mant_id: int, mant: MantenimientoUpdate):
+    updates, params = update_clauses(mant)
     if not updates:
         raise HTTPException(status_code=400, detail="Nada que actualizar")
 
     params.append(mant_id)
     query = f"UPDATE mantenimientos SET {', '.join(updates)} WHERE id = %s"
 
-    async with pool.acquire() as conn:
+    async with db.acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute(query, tuple(params))
-            if cur.rowcount == 0:
-                raise HTTPException(status_code=404, detail="Mantenimiento no encontrado")
+            await conn.begin()
+            try:
+                await timed_execute(cur, "SELECT fecha_programada, costo FROM mantenimientos WHERE id = %s FOR UPDATE", (mant_id,))
+                previous = await cur.fetchone()
+                if previous is None:
+                    raise HTTPException(status_code=404, detail="Mantenimiento no encontrado")
+                await timed_execute(cur, query, tuple(params))
+                await add_mantenimientos(cur, cost_changes([previous], mant.costo))
+                await reference_cache.bump(cur, "mantenimientos")
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
             
     return {"message": "Mantenimiento actualizado"}
\ No newline at end of file
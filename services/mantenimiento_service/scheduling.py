@@ -0,0 +1,119 @@
+import os
+from collections import Counter
+from datetime import timedelta
+from common.metrics import timed_execute
+from common.refcache import reference_cache
+from common.resumen import add_mantenimientos
+
+BATCH_SIZE = int(os.getenv("MANT_BATCH_SIZE", 1000))
+# Equipos por operación masiva como máximo
+MAX_EQUIPOS = int(os.getenv("MANT_LOTE_MAX", 5000))
+# Serializa las programaciones masivas: el cupo por día se calcula y ocupa sin carreras
+SCHEDULE_LOCK = "programacion_mantenimientos"
+# Estados que ya no ocupan cupo en el calendario
+CLOSED_STATES = ("completado", "cancelado")
+
+INSERT_QUERY = """
+    INSERT INTO mantenimientos (equipo_id, tipo, fecha_programada, descripcion, prioridad)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+
+class SchedulingError(ValueError):
+    pass
+
+
+def _in(values):
+    return ", ".join(["%s"] * len(values))
+
+
+async def target_equipos(cur, lote):
+    # Equipos agrupados por ubicación: el mismo laboratorio cae en días contiguos
+    where, params = [], []
+    if lote.equipo_ids:
+        where.append(f"id IN ({_in(lote.equipo_ids)})")
+        params.extend(lote.equipo_ids)
+    for clause, value in (
+        ("categoria_id = %s", lote.categoria_id),
+        ("ubicacion_actual_id = %s", lote.ubicacion_id),
+        ("estado_operativo = %s", lote.estado_operativo),
+    ):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    if not where:
+        raise SchedulingError("Indique equipo_ids, categoria_id, ubicacion_id o estado_operativo")
+    await timed_execute(
+        cur,
+        f"SELECT id FROM equipos WHERE {' AND '.join(where)} ORDER BY ubicacion_actual_id, id LIMIT %s",
+        (*params, MAX_EQUIPOS + 1),
+    )
+    ids = [row[0] for row in await cur.fetchall()]
+    if len(ids) > MAX_EQUIPOS:
+        raise SchedulingError(f"La selección supera {MAX_EQUIPOS} equipos; acótela con más filtros")
+    return ids
+
+
+async def already_scheduled(cur, ids, lote):
+    # Equipos con un mantenimiento abierto del mismo tipo dentro de la ventana
+    found = set()
+    for start in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[start:start + BATCH_SIZE]
+        await timed_execute(cur, f"""
+            SELECT DISTINCT equipo_id FROM mantenimientos
+            WHERE equipo_id IN ({_in(chunk)}) AND tipo = %s
+              AND fecha_programada >= %s AND fecha_programada <= %s
+              AND estado NOT IN ({_in(CLOSED_STATES)})
+        """, (*chunk, lote.tipo, lote.desde, lote.hasta, *CLOSED_STATES))
+        found.update(row[0] for row in await cur.fetchall())
+    return found
+
+
+async def day_load(cur, lote):
+    # Órdenes abiertas ya programadas por día: rango sobre idx_mantenimientos_programada
+    await timed_execute(cur, f"""
+        SELECT fecha_programada, COUNT(*) FROM mantenimientos
+        WHERE fecha_programada >= %s AND fecha_programada <= %s AND estado NOT IN ({_in(CLOSED_STATES)})
+        GROUP BY fecha_programada
+    """, (lote.desde, lote.hasta, *CLOSED_STATES))
+    return {row[0]: row[1] for row in await cur.fetchall()}
+
+
+def assign_dates(ids, lote, load):
+    """Reparte los equipos en la ventana sin pasar de capacidad_diaria por día
+    (contando lo ya programado). Devuelve (asignaciones, equipos sin cupo)."""
+    assignments = []
+    pending = iter(ids)
+    day = lote.desde
+    equipo_id = next(pending, None)
+    while equipo_id is not None and day <= lote.hasta:
+        if not (lote.solo_dias_habiles and day.weekday() >= 5):
+            free = lote.capacidad_diaria - load.get(day, 0)
+            while free > 0 and equipo_id is not None:
+                assignments.append((equipo_id, day))
+                free -= 1
+                equipo_id = next(pending, None)
+        day += timedelta(days=1)
+    unassigned = [] if equipo_id is None else [equipo_id, *pending]
+    return assignments, unassigned
+
+
+async def insert_all(conn, cur, rows):
+    # Un INSERT multi-fila por lote, todo en una transacción: o entran todas o ninguna
+    await conn.begin()
+    try:
+        for start in range(0, len(rows), BATCH_SIZE):
+            await timed_execute(
+                cur, INSERT_QUERY, rows[start:start + BATCH_SIZE], statement="INSERT mantenimientos (lote)", many=True
+            )
+        # Contadores y versión una vez por lote, justo antes del commit
+        await add_mantenimientos(cur, [(row[2], 1, None) for row in rows])
+        await reference_cache.bump(cur, "mantenimientos")
+        await conn.commit()
+    except Exception:
+        await conn.rollback()
+        raise
+
+
+def summarize(assignments):
+    return {str(day): count for day, count in sorted(Counter(day for _, day in assignments).items())}
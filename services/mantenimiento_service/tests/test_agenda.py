@@ -0,0 +1,47 @@
+from datetime import date
+import pytest
+import agenda
+
+
+def test_cursor_round_trip():
+    assert agenda.decode_cursor(agenda.encode_cursor(date(2024, 5, 1), 42)) == (date(2024, 5, 1), 42)
+    with pytest.raises(agenda.AgendaError):
+        agenda.decode_cursor("no-es-un-cursor")
+
+
+def test_window_filters():
+    where, params = agenda.window_filters(date(2024, 1, 1), date(2024, 1, 31), "pendiente", None, 9)
+    assert where == ["m.fecha_programada >= %s", "m.fecha_programada <= %s", "m.estado = %s", "m.equipo_id = %s"]
+    assert params == [date(2024, 1, 1), date(2024, 1, 31), "pendiente", 9]
+
+
+@pytest.mark.parametrize("desde, hasta", [(date(2024, 2, 1), date(2024, 1, 1)), (date(2024, 1, 1), date(2025, 1, 2))])
+def test_invalid_window(desde, hasta):
+    with pytest.raises(agenda.AgendaError):
+        agenda.window_filters(desde, hasta, None, None, None)
+
+
+def test_page_query_continues_after_cursor():
+    where, params = agenda.window_filters(date(2024, 1, 1), date(2024, 1, 31), None, None, None)
+    query, query_params = agenda.page_query(where, params, agenda.encode_cursor(date(2024, 1, 10), 7), 50)
+    assert "(m.fecha_programada > %s OR (m.fecha_programada = %s AND m.id > %s))" in query
+    assert query_params == (date(2024, 1, 1), date(2024, 1, 31), date(2024, 1, 10), date(2024, 1, 10), 7, 51)
+    # La lista de filtros de la ventana no se modifica
+    assert len(where) == 2
+
+
+def test_paginate_and_fold_counts():
+    rows = [{"id": i, "fecha_programada": date(2024, 1, i)} for i in (1, 2, 3)]
+    page, cursor = agenda.paginate(rows, 2)
+    assert page == rows[:2] and agenda.decode_cursor(cursor) == (date(2024, 1, 2), 2)
+    assert agenda.paginate(rows, 3) == (rows, None)
+
+    days = agenda.fold_counts([
+        (date(2024, 1, 2), "pendiente", "alta", 2),
+        (date(2024, 1, 1), "pendiente", "media", 1),
+        (date(2024, 1, 2), "completado", "alta", 3),
+    ])
+    assert days == [
+        {"fecha": date(2024, 1, 1), "total": 1, "por_estado": {"pendiente": 1}, "por_prioridad": {"media": 1}},
+        {"fecha": date(2024, 1, 2), "total": 5, "por_estado": {"pendiente": 2, "completado": 3}, "por_prioridad": {"alta": 5}},
+    ]
@@ -0,0 +1,27 @@
+from datetime import date
+from types import SimpleNamespace
+import scheduling
+
+
+def lote(desde, hasta, capacidad=2, solo_dias_habiles=True):
+    return SimpleNamespace(desde=desde, hasta=hasta, capacidad_diaria=capacidad, solo_dias_habiles=solo_dias_habiles)
+
+
+def test_assign_dates_respects_capacity_and_weekends():
+    # Viernes 2024-03-01 a lunes 2024-03-04; el viernes ya tiene una orden
+    assignments, unassigned = scheduling.assign_dates([1, 2, 3, 4], lote(date(2024, 3, 1), date(2024, 3, 4)), {date(2024, 3, 1): 1})
+    assert assignments == [(1, date(2024, 3, 1)), (2, date(2024, 3, 4)), (3, date(2024, 3, 4))]
+    assert unassigned == [4]
+    assert scheduling.summarize(assignments) == {"2024-03-01": 1, "2024-03-04": 2}
+
+
+def test_assign_dates_including_weekends():
+    assignments, unassigned = scheduling.assign_dates([1, 2, 3], lote(date(2024, 3, 2), date(2024, 3, 3), 1, False), {})
+    assert assignments == [(1, date(2024, 3, 2)), (2, date(2024, 3, 3))]
+    assert unassigned == [3]
+
+
+def test_assign_dates_full_window():
+    load = {date(2024, 3, 4): 5}
+    assert scheduling.assign_dates([1, 2], lote(date(2024, 3, 4), date(2024, 3, 4)), load) == ([], [1, 2])
+    assert scheduling.assign_dates([], lote(date(2024, 3, 4), date(2024, 3, 4)), {}) == ([], [])
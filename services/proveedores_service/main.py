@@ -1,20 +1,18 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-import aiomysql
-import os
+from common.compression import CompressionMiddleware
+from common.metrics import instrument, timed_execute
+from common.db import ReadYourWritesMiddleware, db, db_lifespan
+from common.refcache import reference_cache
 
-app = FastAPI(title="Proveedores Service")
-
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'mysql'),
-    'user': os.getenv('DB_USER', 'user_ti'),
-    'password': os.getenv('DB_PASSWORD', 'password'),
-    'db': os.getenv('DB_NAME', 'ti_management'),
-    'port': 3306,
-    'autocommit': True,
-    'charset': 'utf8mb4'
-}
+app = FastAPI(title="Proveedores Service", lifespan=db_lifespan)
+# Comprime JSON grandes en el salto hacia el gateway
+app.add_middleware(CompressionMiddleware)
+# Escrituras y peticiones con X-Read-Your-Writes leen del primario, no de réplicas
+app.add_middleware(ReadYourWritesMiddleware)
+# Latencias por ruta y por sentencia SQL en /metrics (formato Prometheus)
+instrument(app, "proveedores")
 
 class ProveedorCreate(BaseModel):
     razon_social: str
@@ -24,33 +22,32 @@ class ProveedorCreate(BaseModel):
     telefono: Optional[str] = None
     sitio_web: Optional[str] = None
 
+@app.get("/db/pool")
+async def db_pool_stats():
+    # Uso del pool, para dimensionarlo frente a max_connections de MySQL
+    return db.stats()
+
 @app.get("/proveedores")
 async def get_proveedores():
-    pool = await aiomysql.create_pool(**DB_CONFIG)
-    try:
-        async with pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cur:
-                await cur.execute("SELECT * FROM proveedores ORDER BY razon_social")
-                return await cur.fetchall()
-    finally:
-        pool.close()
-        await pool.wait_closed()
+    # Se sirve desde memoria; las altas suben la versión e invalidan en todas las instancias
+    return await reference_cache.rows("proveedores")
+
+@app.get("/cache/referencias")
+async def referencias_cache_stats():
+    return reference_cache.stats()
 
 @app.post("/proveedores")
 async def create_proveedor(p: ProveedorCreate):
-    pool = await aiomysql.create_pool(**DB_CONFIG)
     query = """
         INSERT INTO proveedores (razon_social, ruc, email, contacto_nombre, telefono, sitio_web)
         VALUES (%s, %s, %s, %s, %s, %s)
     """
-    try:
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cur:
-                try:
-                    await cur.execute(query, (p.razon_social, p.ruc, p.email, p.contacto_nombre, p.telefono, p.sitio_web))
-                    return {"id": cur.lastrowid, "message": "Proveedor registrado"}
-                except Exception as e:
-                    raise HTTPException(status_code=400, detail=f"Error (duplicado?): {e}")
-    finally:
-        pool.close()
-        await pool.wait_closed()
\ No newline at end of file
+    async with db.acquire() as conn:
+        async with conn.cursor() as cur:
+            try:
+                await timed_execute(cur, query, (p.razon_social, p.ruc, p.email, p.contacto_nombre, p.telefono, p.sitio_web))
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Error (duplicado?): {e}")
+            proveedor_id = cur.lastrowid
+            await reference_cache.bump(cur, "proveedores")
+            return {"id": proveedor_id, "message": "Proveedor registrado"}
\ No newline at end of file
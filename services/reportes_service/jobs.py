@@ -0,0 +1,291 @@
+import asyncio
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from common.db import db
+from common.refcache import reference_cache
+import render
+
+# Volumen reportes_data: los archivos sobreviven a reinicios del servicio
+REPORTS_DIR = os.getenv("REPORTES_DIR", "/app/reportes")
+# Procesos que generan reportes en paralelo y trabajos admitidos a la vez (en cola + en curso)
+JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", 2))
+MAX_PENDING = int(os.getenv("REPORT_JOB_MAX_PENDING", 20))
+# Vida de un archivo generado y cada cuánto se borran los vencidos
+FILE_TTL = float(os.getenv("REPORT_FILE_TTL", 3600))
+CLEANUP_INTERVAL = float(os.getenv("REPORT_CLEANUP_INTERVAL", 300))
+
+# tipo -> cómo se genera; "tablas" definen la versión de datos con la que se deduplica
+REPORTS = {
+    "equipos": {
+        "render": render.render_equipos_pdf,
+        "tablas": ("equipos", "ubicaciones", "categorias"),
+        "agrupaciones": tuple(render.GROUPS),
+        "extension": "pdf",
+        "media_type": "application/pdf",
+        "filename": "reporte_inventario",
+    },
+}
+
+ACTIVE_STATES = ("pendiente", "procesando")
+
+
+class JobError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id, tipo, params, clave, version, creado=None, **state):
+        self.id = job_id
+        self.tipo = tipo
+        self.params = params
+        self.clave = clave
+        self.version = version
+        self.creado = creado or time.time()
+        self.estado = state.get("estado", "pendiente")
+        self.progreso = state.get("progreso", 0.0)
+        self.mensaje = state.get("mensaje")
+        self.iniciado = state.get("iniciado")
+        self.terminado = state.get("terminado")
+        self.expira = state.get("expira")
+        self.resultado = state.get("resultado")
+        self.error = state.get("error")
+
+    @property
+    def spec(self):
+        return REPORTS[self.tipo]
+
+    @property
+    def path(self):
+        return os.path.join(REPORTS_DIR, f"{self.id}.{self.spec['extension']}")
+
+    @property
+    def meta_path(self):
+        return os.path.join(REPORTS_DIR, f"{self.id}.json")
+
+    @property
+    def progress_path(self):
+        return os.path.join(REPORTS_DIR, f"{self.id}.progress")
+
+    @property
+    def filename(self):
+        return f"{self.spec['filename']}.{self.spec['extension']}"
+
+    def available(self):
+        return self.estado == "listo" and (self.expira is None or self.expira > time.time()) and os.path.exists(self.path)
+
+    def to_dict(self):
+        return {
+            "id": self.id, "tipo": self.tipo, "params": self.params, "clave": self.clave, "version": self.version,
+            "creado": self.creado, "estado": self.estado, "progreso": self.progreso, "mensaje": self.mensaje,
+            "iniciado": self.iniciado, "terminado": self.terminado, "expira": self.expira,
+            "resultado": self.resultado, "error": self.error,
+        }
+
+    def status(self):
+        result = self.to_dict()
+        del result["clave"]
+        if self.estado == "procesando":
+            # El proceso que genera el archivo deja su avance en <id>.progress
+            try:
+                with open(self.progress_path) as f:
+                    result.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+        if self.estado == "listo":
+            result["archivo"] = f"/export/jobs/{self.id}/file"
+        return result
+
+
+class JobManager:
+    """Cola de trabajos de reportes ejecutados en un ProcessPoolExecutor.
+
+    El render (CPU) corre en otros procesos, así que no frena el event loop.
+    Un trabajo idéntico (mismo tipo y parámetros) sobre la misma versión de
+    datos reutiliza el que ya está en curso o su archivo, sin generar otro.
+    El estado se guarda junto al archivo en el volumen de reportes.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.by_key = {}
+        self.tasks = {}
+        self.executor = None
+        self.cleanup_task = None
+        self.deduplicated = 0
+
+    def _new_executor(self):
+        # spawn: los procesos no heredan el event loop ni los sockets del servicio
+        return ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+    def _replace_executor(self, broken):
+        # Todos los trabajos del pool roto fallan a la vez: solo el primero lo
+        # reemplaza y los demás reintentan en el nuevo
+        if self.executor is broken:
+            broken.shutdown(wait=False)
+            self.executor = self._new_executor()
+        return self.executor
+
+    def start(self):
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        self.executor = self._new_executor()
+        self._load_finished()
+        self.cleanup_task = asyncio.create_task(self._cleanup_loop())
+
+    async def stop(self):
+        if self.cleanup_task is not None:
+            self.cleanup_task.cancel()
+        for task in list(self.tasks.values()):
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _load_finished(self):
+        # Trabajos terminados en ejecuciones anteriores; los que quedaron a medias se descartan
+        for name in os.listdir(REPORTS_DIR):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(REPORTS_DIR, name)) as f:
+                    data = json.load(f)
+                job = Job(data.pop("id"), **data)
+            except (OSError, ValueError, TypeError, KeyError):
+                continue
+            if job.tipo in REPORTS and job.available():
+                self.jobs[job.id] = job
+                self.by_key[job.clave] = job.id
+            else:
+                self._delete_files(job)
+
+    def _save(self, job):
+        tmp = f"{job.meta_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(job.to_dict(), f)
+        os.replace(tmp, job.meta_path)
+
+    @staticmethod
+    def _delete_files(job):
+        paths = [job.meta_path, job.progress_path]
+        if job.tipo in REPORTS:
+            paths += [job.path, f"{job.path}.tmp"]
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def submit(self, tipo, params=None):
+        """Devuelve (trabajo, deduplicado)."""
+        if tipo not in REPORTS:
+            raise JobError(f"Tipo de reporte desconocido '{tipo}'; use {', '.join(REPORTS)}")
+        params = params or {}
+        versions = await reference_cache.current_versions()
+        version = {table: versions.get(table, 0) for table in REPORTS[tipo]["tablas"]}
+        clave = hashlib.sha256(json.dumps([tipo, params, version], sort_keys=True, default=str).encode()).hexdigest()
+
+        existing = self.jobs.get(self.by_key.get(clave))
+        if existing is not None and (existing.estado in ACTIVE_STATES or existing.available()):
+            self.deduplicated += 1
+            return existing, True
+
+        if sum(1 for job in self.jobs.values() if job.estado in ACTIVE_STATES) >= MAX_PENDING:
+            raise JobError("Demasiados reportes en cola, intente nuevamente en unos segundos")
+
+        job = Job(uuid.uuid4().hex, tipo, params, clave, version)
+        self.jobs[job.id] = job
+        self.by_key[clave] = job.id
+        self._save(job)
+        task = asyncio.create_task(self._run(job))
+        self.tasks[job.id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job.id, None))
+        return job, False
+
+    async def _run(self, job):
+        loop = asyncio.get_running_loop()
+        tmp = f"{job.path}.tmp"
+        call = functools.partial(job.spec["render"], db.read_config(), tmp, job.progress_path, **job.params)
+        job.estado = "procesando"
+        job.iniciado = time.time()
+        self._save(job)
+        try:
+            executor = self.executor
+            try:
+                job.resultado = await loop.run_in_executor(executor, call)
+            except BrokenProcessPool:
+                # Un proceso murió (p. ej. sin memoria): se rehace el pool y se reintenta una vez
+                job.resultado = await loop.run_in_executor(self._replace_executor(executor), call)
+            os.replace(tmp, job.path)
+            job.estado = "listo"
+            job.progreso = 1.0
+            job.mensaje = "Listo"
+            job.expira = time.time() + FILE_TTL
+        except Exception as e:
+            print(f"❌ ERROR GENERANDO REPORTE {job.id}: {e}")
+            job.estado = "error"
+            job.error = str(e)
+            for path in (tmp, job.path):
+                if os.path.exists(path):
+                    os.remove(path)
+        finally:
+            job.terminado = time.time()
+            if os.path.exists(job.progress_path):
+                os.remove(job.progress_path)
+            self._save(job)
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise JobError("Trabajo no encontrado")
+        return job
+
+    async def wait(self, job):
+        task = self.tasks.get(job.id)
+        if task is not None:
+            # shield: si el cliente corta, el trabajo sigue para quien lo pida después
+            await asyncio.shield(task)
+        return job
+
+    def expire(self):
+        now = time.time()
+        expired = [
+            job for job in self.jobs.values()
+            if job.estado not in ACTIVE_STATES and (job.expira or (job.terminado or now) + FILE_TTL) <= now
+        ]
+        for job in expired:
+            self._delete_files(job)
+            del self.jobs[job.id]
+            if self.by_key.get(job.clave) == job.id:
+                del self.by_key[job.clave]
+        return len(expired)
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(CLEANUP_INTERVAL)
+            try:
+                removed = self.expire()
+                if removed:
+                    print(f"🧹 {removed} reportes vencidos eliminados")
+            except Exception as e:
+                print(f"❌ Limpieza de reportes: {e}")
+
+    def stats(self):
+        states = {}
+        for job in self.jobs.values():
+            states[job.estado] = states.get(job.estado, 0) + 1
+        return {
+            "workers": JOB_WORKERS,
+            "max_pending": MAX_PENDING,
+            "file_ttl": FILE_TTL,
+            "jobs": len(self.jobs),
+            "estados": states,
+            "deduplicated": self.deduplicated,
+        }
+
+
+job_manager = JobManager()
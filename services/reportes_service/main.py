@@ -1,93 +1,92 @@
-<<<<<<< HEAD
-from fastapi import FastAPI, HTTPException
-=======
-from fastapi import FastAPI
->>>>>>> c23fc51978c85d04894b8fb4a4d49b2747c4d4dd
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
 import aiomysql
-import os
-from io import BytesIO
-from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER
-
-app = FastAPI(title="Reportes Service")
-
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'mysql'),
-    'user': os.getenv('DB_USER', 'user_ti'),
-    'password': os.getenv('DB_PASSWORD', 'password'),
-    'db': os.getenv('DB_NAME', 'ti_management'),
-    'port': 3306,
-    'autocommit': True,
-    'charset': 'utf8mb4'
-}
-
-async def get_data_from_db(query):
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Optional
+from common.compression import CompressionMiddleware
+from common.metrics import instrument, timed_execute
+from common.db import ReadYourWritesMiddleware, db, db_lifespan
+from common.export import export_response
+from jobs import REPORTS, JobError, job_manager
+from resultcache import report_cache
+from resumen import DASHBOARD_QUERY, RECONCILE_INTERVAL, keep_reconciled, last_run, reconcile
+from spreadsheets import SHEETS, ExportBusy, columns, sheet_query, xlsx_response
+
+@asynccontextmanager
+async def lifespan(app):
+    async with db_lifespan(app):
+        # Corrige periódicamente la deriva de los contadores del dashboard
+        reconcile_task = asyncio.create_task(keep_reconciled())
+        job_manager.start()
+        yield
+        await job_manager.stop()
+        reconcile_task.cancel()
+
+app = FastAPI(title="Reportes Service", lifespan=lifespan)
+# Comprime JSON grandes en el salto hacia el gateway
+app.add_middleware(CompressionMiddleware)
+# Escrituras y peticiones con X-Read-Your-Writes leen del primario, no de réplicas
+app.add_middleware(ReadYourWritesMiddleware)
+# Latencias por ruta y por sentencia SQL en /metrics (formato Prometheus)
+instrument(app, "reportes")
+
+async def fetch_rows(query, params=None):
+    return await db.fetchall(query, params, cursor_class=aiomysql.Cursor)
+
+async def get_data_from_db(query, params=None):
     try:
-        pool = await aiomysql.create_pool(**DB_CONFIG)
-        async with pool.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(query)
-                result = await cur.fetchall()
-        pool.close()
-        await pool.wait_closed()
-        return result
+        return await fetch_rows(query, params)
     except Exception as e:
         print(f"Error DB: {e}")
         return []
 
+@app.get("/db/pool")
+async def db_pool_stats():
+    # Uso del pool, para dimensionarlo frente a max_connections de MySQL
+    return db.stats()
+
 # --- DASHBOARD CONECTADO (Lógica Real) ---
 @app.get("/dashboard")
 async def dashboard():
-    pool = await aiomysql.create_pool(**DB_CONFIG)
-    async with pool.acquire() as conn:
+    # Contadores mantenidos por los endpoints que escriben (migración 0006): lectura por PK, sin
+    # recorrer equipos ni mantenimientos
+    async with db.acquire(readonly=True) as conn:
         async with conn.cursor() as cur:
-            # 1. Total Equipos
-            await cur.execute("SELECT COUNT(*) FROM equipos")
-            total = (await cur.fetchone())[0]
-            
-            # 2. Equipos Operativos
-            await cur.execute("SELECT COUNT(*) FROM equipos WHERE estado_operativo='operativo'")
-            operativos = (await cur.fetchone())[0]
-            
-            # 3. Valor Inventario
-            await cur.execute("SELECT COALESCE(SUM(costo_compra), 0) FROM equipos")
-            valor = (await cur.fetchone())[0]
-
-            # 4. Mantenimientos del Mes (REAL)
-            # Usamos CURRENT_DATE() de MySQL
-            await cur.execute("""
-                SELECT COUNT(*) FROM mantenimientos 
-                WHERE MONTH(fecha_programada) = MONTH(CURRENT_DATE()) 
-                AND YEAR(fecha_programada) = YEAR(CURRENT_DATE())
-            """)
-            mant_mes = (await cur.fetchone())[0]
-
-            # 5. Costo Mantenimiento Mes (REAL)
-            await cur.execute("""
-                SELECT COALESCE(SUM(costo), 0) FROM mantenimientos 
-                WHERE MONTH(fecha_programada) = MONTH(CURRENT_DATE()) 
-                AND YEAR(fecha_programada) = YEAR(CURRENT_DATE())
-            """)
-            costo_mes = (await cur.fetchone())[0]
-            
-            return {
-                "total_equipos": total,
-                "equipos_operativos": operativos,
-                "tasa_disponibilidad": round((operativos/total*100),1) if total else 0,
-                "valor_inventario": float(valor),
-                "mantenimientos_mes": mant_mes,             
-                "equipos_reparacion": total - operativos,
-                "costo_mantenimiento_mes": float(costo_mes) 
-            }
+            await timed_execute(cur, DASHBOARD_QUERY)
+            row = await cur.fetchone()
+    if row is None:
+        raise HTTPException(status_code=503, detail="Resumen del dashboard no inicializado")
+    total, operativos, valor, mant_mes, costo_mes = row
+    return {
+        "total_equipos": total,
+        "equipos_operativos": operativos,
+        "tasa_disponibilidad": round((operativos/total*100),1) if total else 0,
+        "valor_inventario": float(valor),
+        "mantenimientos_mes": mant_mes,
+        "equipos_reparacion": total - operativos,
+        "costo_mantenimiento_mes": float(costo_mes)
+    }
+
+@app.post("/dashboard/reconciliar")
+async def reconciliar_dashboard():
+    # Recalcula los contadores desde las tablas base y devuelve la deriva corregida
+    drift = await reconcile()
+    if drift is None:
+        raise HTTPException(status_code=409, detail="Ya hay una reconciliación en curso")
+    return {"deriva": drift or None}
 
+@app.get("/dashboard/reconciliacion")
+async def estado_reconciliacion():
+    return {"intervalo_s": RECONCILE_INTERVAL, **last_run}
+
+# Reportes agregados: se cachean hasta que cambian sus tablas (ver resultcache.py)
 @app.get("/equipos-por-ubicacion")
+@report_cache.cached("equipos-por-ubicacion", "equipos", "ubicaciones", fallback=[])
 async def eq_ubicacion():
-    data = await get_data_from_db("""
+    data = await fetch_rows("""
         SELECT CONCAT(IFNULL(u.edificio,''), ' - ', IFNULL(u.aula_oficina,'')) as ubicacion, COUNT(*) as cantidad
         FROM equipos e JOIN ubicaciones u ON e.ubicacion_actual_id = u.id
         GROUP BY u.id, u.edificio, u.aula_oficina
@@ -95,13 +94,15 @@ async def eq_ubicacion():
     return [{"ubicacion": r[0], "cantidad": r[1]} for r in data]
 
 @app.get("/equipos-por-estado")
+@report_cache.cached("equipos-por-estado", "equipos", fallback=[])
 async def eq_estado():
-    data = await get_data_from_db("SELECT estado_operativo as estado, COUNT(*) as cantidad FROM equipos GROUP BY estado_operativo")
+    data = await fetch_rows("SELECT estado_operativo as estado, COUNT(*) as cantidad FROM equipos GROUP BY estado_operativo")
     return [{"estado": r[0], "cantidad": r[1]} for r in data]
 
 @app.get("/equipos-por-categoria")
+@report_cache.cached("equipos-por-categoria", "equipos", "categorias", fallback=[])
 async def eq_cat():
-    data = await get_data_from_db("""
+    data = await fetch_rows("""
         SELECT c.nombre as categoria, COUNT(*) as cantidad, COALESCE(SUM(e.costo_compra), 0) as valor_total
         FROM equipos e JOIN categorias_equipos c ON e.categoria_id = c.id
         GROUP BY c.nombre
@@ -109,84 +110,107 @@ async def eq_cat():
     return [{"categoria": r[0], "cantidad": r[1], "valor_total": float(r[2])} for r in data]
 
 @app.get("/costos-mantenimiento")
+@report_cache.cached("costos-mantenimiento", "mantenimientos", fallback=[])
 async def costos(year: int = 2024):
-    data = await get_data_from_db(f"""
-        SELECT DATE_FORMAT(fecha_realizada, '%M') as mes, tipo, SUM(costo) as total_costo
-        FROM mantenimientos WHERE YEAR(fecha_realizada) = {year}
+    # Rango del año en vez de YEAR(fecha_realizada) para usar idx_mantenimientos_realizada
+    data = await fetch_rows("""
+        SELECT DATE_FORMAT(fecha_realizada, '%%M') as mes, tipo, SUM(costo) as total_costo
+        FROM mantenimientos WHERE fecha_realizada >= %s AND fecha_realizada < %s
         GROUP BY mes, tipo
-    """)
+    """, (date(year, 1, 1), date(year + 1, 1, 1)))
     return [{"mes": r[0], "tipo": r[1], "total_costo": float(r[2])} for r in data]
 
-# --- PDF GENERATOR (Versión Estable) ---
+@app.get("/cache/reportes")
+async def reportes_cache_stats():
+    return report_cache.stats()
+
+# --- REPORTES EN SEGUNDO PLANO ---
+class ReportJobCreate(BaseModel):
+    tipo: str = "equipos"
+    # Subtotales por "ubicacion" o "categoria"
+    agrupar_por: Optional[str] = None
+
+def job_params(tipo, agrupar_por):
+    if tipo not in REPORTS:
+        raise HTTPException(status_code=400, detail=f"Tipo de reporte desconocido; use {', '.join(REPORTS)}")
+    if agrupar_por is None:
+        return {}
+    if agrupar_por not in REPORTS[tipo].get("agrupaciones", ()):
+        raise HTTPException(status_code=400, detail=f"No se puede agrupar por '{agrupar_por}'; use {', '.join(REPORTS[tipo].get('agrupaciones', ()))}")
+    return {"agrupar_por": agrupar_por}
+
+def job_file_response(job):
+    if not job.available():
+        raise HTTPException(status_code=410, detail="El archivo del reporte venció; genere uno nuevo")
+    return FileResponse(job.path, media_type=job.spec["media_type"], filename=job.filename)
+
+@app.post("/export/jobs", status_code=202)
+async def crear_reporte(payload: ReportJobCreate):
+    # Encola el reporte y responde al momento; el archivo se genera en otro proceso
+    params = job_params(payload.tipo, payload.agrupar_por)
+    try:
+        job, deduplicated = await job_manager.submit(payload.tipo, params)
+    except JobError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+    return {**job.status(), "deduplicado": deduplicated}
+
+@app.get("/export/jobs")
+async def reportes_jobs_stats():
+    return job_manager.stats()
+
+@app.get("/export/jobs/{job_id}")
+async def estado_reporte(job_id: str):
+    try:
+        return job_manager.get(job_id).status()
+    except JobError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/export/jobs/{job_id}/file")
+async def archivo_reporte(job_id: str):
+    try:
+        job = job_manager.get(job_id)
+    except JobError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if job.estado != "listo":
+        raise HTTPException(status_code=409, detail=f"El reporte está {job.estado}", headers={"Retry-After": "2"})
+    return job_file_response(job)
+
 @app.post("/export/pdf")
 async def export_pdf(payload: dict):
+    # Compatibilidad: mismo trabajo que /export/jobs, esperando a que termine
+    params = job_params("equipos", payload.get("agrupar_por"))
     try:
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        title_style = ParagraphStyle('TitleCustom', parent=styles['Title'], fontSize=16, spaceAfter=20, textColor=colors.navy)
-        subtitle_style = ParagraphStyle('SubTitleCustom', parent=styles['Normal'], fontSize=10, textColor=colors.grey)
-        header_style = ParagraphStyle('HeaderCustom', parent=styles['Normal'], fontSize=12, alignment=TA_CENTER)
-
-        elements.append(Paragraph("UNIVERSIDAD NACIONAL DE TRUJILLO", title_style))
-        elements.append(Paragraph("Dirección de Tecnologías de Información", header_style))
-        elements.append(Spacer(1, 10))
-        elements.append(Paragraph(f"Fecha de Emisión: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", subtitle_style))
-        elements.append(Spacer(1, 25))
-
-        elements.append(Paragraph("Detalle de Inventario", styles['Heading2']))
-        
-        data = await get_data_from_db("""
-            SELECT e.codigo_inventario, e.nombre, e.marca, e.estado_operativo, 
-                   CONCAT(IFNULL(u.edificio,''), ' - ', IFNULL(u.aula_oficina,'')),
-                   e.costo_compra
-            FROM equipos e 
-            LEFT JOIN ubicaciones u ON e.ubicacion_actual_id = u.id
-            ORDER BY e.codigo_inventario
-        """)
-        
-        if not data:
-            elements.append(Paragraph("No hay datos para mostrar", styles['Normal']))
-        else:
-            table_data = [['Código', 'Equipo', 'Marca', 'Estado', 'Ubicación', 'Costo']]
-            for row in data:
-                costo_fmt = f"${float(row[5]):,.2f}" if row[5] else "$0.00"
-                fila = [
-                    str(row[0]), str(row[1])[:20], str(row[2]) if row[2] else '-', 
-                    str(row[3]), str(row[4])[:20], costo_fmt
-                ]
-                table_data.append(fila)
-            
-            t = Table(table_data, colWidths=[70, 120, 60, 70, 110, 60])
-            t.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.navy),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('FONTSIZE', (0, 1), (-1, -1), 7),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.white])
-            ]))
-            elements.append(t)
-
-        elements.append(Spacer(1, 30))
-        elements.append(Paragraph("Generado por Sistema de Gestión TI v1.0", subtitle_style))
-
-        doc.build(elements)
-        buffer.seek(0)
-        
-        return StreamingResponse(
-            buffer, media_type="application/pdf", 
-            headers={"Content-Disposition": "attachment; filename=reporte_inventario.pdf"}
-        )
-    except Exception as e:
-        print(f"❌ ERROR GENERANDO PDF: {str(e)}")
-<<<<<<< HEAD
-=======
-        from fastapi import HTTPException
->>>>>>> c23fc51978c85d04894b8fb4a4d49b2747c4d4dd
-        raise HTTPException(status_code=500, detail=f"Fallo PDF: {str(e)}")
\ No newline at end of file
+        job, _ = await job_manager.submit("equipos", params)
+        await job_manager.wait(job)
+    except JobError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+    if job.estado != "listo":
+        raise HTTPException(status_code=500, detail=f"Fallo PDF: {job.error}")
+    return job_file_response(job)
+
+# --- EXPORTACIÓN A EXCEL / CSV (streaming) ---
+@app.get("/export/xlsx")
+async def export_xlsx(
+    hojas: str = ",".join(SHEETS),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+):
+    # Un libro con una hoja por nombre en `hojas`; desde/hasta filtran mantenimientos y costos
+    names = [h.strip() for h in hojas.split(",") if h.strip()]
+    unknown = [h for h in names if h not in SHEETS]
+    if not names or unknown:
+        raise HTTPException(status_code=400, detail=f"Hojas desconocidas {unknown}; use {', '.join(SHEETS)}")
+    try:
+        return xlsx_response(list(dict.fromkeys(names)), desde, hasta)
+    except ExportBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+
+@app.get("/export/csv")
+async def export_csv(
+    hoja: str = Query("equipos", pattern=f"^({'|'.join(SHEETS)})$"),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+):
+    # Una hoja por archivo: el CSV no tiene pestañas
+    query, params = sheet_query(hoja, desde, hasta)
+    return export_response(query, params, "csv", columns(hoja), hoja)
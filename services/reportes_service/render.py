@@ -0,0 +1,324 @@
+"""Generación de reportes en procesos aparte (ProcessPoolExecutor).
+
+Este módulo se importa en los procesos del pool: no depende de FastAPI ni del
+event loop. Cada función lee de MySQL con pymysql, escribe el archivo en
+`output_path` y va dejando el avance en `progress_path` para que el servicio
+lo informe en GET /export/jobs/{id}.
+"""
+import json
+import os
+import time
+import zlib
+from datetime import datetime
+from decimal import Decimal
+import pymysql
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFDictionary, PDFName, PDFStream
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_CENTER
+
+# Filas que se piden al cursor sin buffer en cada lectura
+FETCH_SIZE = int(os.getenv("REPORT_FETCH_SIZE", 1000))
+# El render es más lento que la lectura; MySQL corta la consulta si no puede escribir en este plazo
+NET_WRITE_TIMEOUT = int(os.getenv("EXPORT_NET_WRITE_TIMEOUT", 600))
+
+UBICACION = "CONCAT(IFNULL(u.edificio,''), ' - ', IFNULL(u.aula_oficina,''))"
+
+# agrupar_por -> (título del grupo, expresión SQL)
+GROUPS = {
+    "ubicacion": ("Ubicación", f"IF(u.id IS NULL, 'Sin ubicación', {UBICACION})"),
+    "categoria": ("Categoría", "IFNULL(c.nombre, 'Sin categoría')"),
+}
+
+HEADER = ['Código', 'Equipo', 'Marca', 'Estado', 'Ubicación', 'Costo']
+COL_WIDTHS = [70, 120, 60, 70, 110, 60]
+TABLE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.navy),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('FONTSIZE', (0, 1), (-1, -1), 7),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.white])
+]
+SUBTOTAL_STYLE = [
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lavender),
+    ('SPAN', (0, 0), (4, 0)),
+    ('ALIGN', (0, 0), (4, 0), 'RIGHT'),
+]
+
+
+def equipos_query(agrupar_por=None):
+    group = GROUPS[agrupar_por][1] if agrupar_por else "NULL"
+    order = "grupo, e.codigo_inventario" if agrupar_por else "e.codigo_inventario"
+    return f"""
+        SELECT e.codigo_inventario, e.nombre, e.marca, e.estado_operativo,
+               {UBICACION}, e.costo_compra, {group} AS grupo
+        FROM equipos e
+        LEFT JOIN ubicaciones u ON e.ubicacion_actual_id = u.id
+        LEFT JOIN categorias_equipos c ON e.categoria_id = c.id
+        ORDER BY {order}
+    """
+
+
+def connect(db_config, **kwargs):
+    return pymysql.connect(
+        host=db_config["host"],
+        port=db_config["port"],
+        user=db_config["user"],
+        password=db_config["password"],
+        database=db_config["db"],
+        charset=db_config.get("charset", "utf8mb4"),
+        **kwargs,
+    )
+
+
+def stream_rows(conn, query, params=None, fetch_size=FETCH_SIZE):
+    """Filas de un cursor sin buffer (SSCursor), leídas de a `fetch_size`."""
+    cur = conn.cursor(pymysql.cursors.SSCursor)
+    cur.execute("SET SESSION net_write_timeout = %s", (NET_WRITE_TIMEOUT,))
+    cur.execute(query, params)
+    while True:
+        rows = cur.fetchmany(fetch_size)
+        if not rows:
+            break
+        yield from rows
+    cur.close()
+
+
+class Progress:
+    """Escribe el avance (0..1) en un archivo JSON, como mucho cada `interval` s."""
+
+    def __init__(self, path, interval=0.5):
+        self.path = path
+        self.interval = interval
+        self.written_at = 0.0
+
+    def __call__(self, fraction, message, force=False):
+        if not self.path or (not force and time.monotonic() - self.written_at < self.interval):
+            return
+        self.written_at = time.monotonic()
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"progreso": round(fraction, 3), "mensaje": message}, f)
+        os.replace(tmp, self.path)
+
+
+class StreamingDocument:
+    """PDF A4 que se dibuja flowable a flowable directamente sobre el canvas.
+
+    SimpleDocTemplate.build necesita la lista completa de flowables y parte las
+    tablas grandes una y otra vez; aquí cada flowable se coloca en la página y
+    se descarta. ReportLab guarda el contenido de todas las páginas hasta
+    save(); al cerrar cada una se comprime, así que lo único que crece con el
+    tamaño del reporte es del orden del PDF final.
+    """
+
+    margin = 72
+
+    def __init__(self, path, pagesize=A4):
+        self.canv = Canvas(path, pagesize=pagesize, pageCompression=1)
+        self.page_width, self.page_height = pagesize
+        self.width = self.page_width - 2 * self.margin
+        self.top = self.page_height - self.margin
+        self.bottom = self.margin
+        self.y = self.top
+        self.pages = 1
+
+    @property
+    def available(self):
+        return self.y - self.bottom
+
+    def _footer(self):
+        self.canv.setFont('Helvetica', 7)
+        self.canv.setFillColor(colors.grey)
+        self.canv.drawRightString(self.page_width - self.margin, self.margin / 2, f"Página {self.pages}")
+
+    def _compress_last_page(self):
+        # Mismo FlateDecode que aplicaría save(), pero ahora: el texto sin comprimir se libera.
+        # Usa internos del canvas (reportlab fijado en requirements.txt; lo cubre tests/test_render.py)
+        page = self.canv._doc.Pages.pages[-1]
+        page.Contents = PDFStream(
+            PDFDictionary({"Filter": PDFArray([PDFName("FlateDecode")])}),
+            zlib.compress(page.stream.encode("utf8")),
+        )
+        page.stream = None
+
+    def new_page(self):
+        self._footer()
+        self.canv.showPage()
+        self._compress_last_page()
+        self.pages += 1
+        self.y = self.top
+
+    def ensure(self, height):
+        # Salta de página si no queda `height` libre (p. ej. un título sin filas debajo)
+        if height > self.available and self.y < self.top:
+            self.new_page()
+
+    def add(self, flowable):
+        if self.y < self.top:
+            self.y -= flowable.getSpaceBefore()
+        _, height = flowable.wrapOn(self.canv, self.width, self.available)
+        if height > self.available and self.y < self.top:
+            self.new_page()
+            _, height = flowable.wrapOn(self.canv, self.width, self.available)
+        if height > self.available:
+            # Ni en una página vacía entra: se parte (las tablas repiten la cabecera)
+            parts = flowable.splitOn(self.canv, self.width, self.available)
+            if len(parts) < 2:
+                raise ValueError("Elemento más alto que una página")
+            for part in parts:
+                self.add(part)
+            return
+        flowable.drawOn(self.canv, self.margin, self.y - height)
+        self.y -= height + flowable.getSpaceAfter()
+
+    def save(self):
+        self._footer()
+        self.canv.save()
+
+
+class TableWriter:
+    """Recibe filas de a una y las dibuja en tablas del tamaño de lo que queda de página.
+
+    Cada trozo lleva su cabecera, así que todas las páginas la repiten, y
+    nunca hay en memoria más filas que las de una página.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.rows = []
+        self.extra_styles = []
+        self.capacity = None
+        header_height = self._height([HEADER])
+        self.header_height = header_height
+        self.row_height = self._height([HEADER, ['X'] * len(HEADER)]) - header_height
+
+    def _height(self, rows):
+        table = Table(rows, colWidths=COL_WIDTHS)
+        table.setStyle(TableStyle(TABLE_STYLE))
+        return table.wrapOn(self.doc.canv, self.doc.width, self.doc.page_height)[1]
+
+    def _fits(self):
+        # Un punto de margen por redondeos en la altura de las filas
+        return int((self.doc.available - self.header_height - 1) // self.row_height)
+
+    def add(self, cells, style=None):
+        if self.capacity is None:
+            self.capacity = self._fits()
+            if self.capacity < 1:
+                self.doc.new_page()
+                self.capacity = self._fits()
+        if style:
+            row = len(self.rows) + 1
+            self.extra_styles += [(cmd, (c0, row), (c1, row), *args) for cmd, (c0, _), (c1, _), *args in style]
+        self.rows.append(cells)
+        if len(self.rows) >= self.capacity:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            table = Table([HEADER] + self.rows, colWidths=COL_WIDTHS, repeatRows=1)
+            table.setStyle(TableStyle(TABLE_STYLE + self.extra_styles))
+            self.doc.add(table)
+        self.rows = []
+        self.extra_styles = []
+        self.capacity = None
+
+
+def money(value):
+    return f"${float(value):,.2f}" if value else "$0.00"
+
+
+def write_equipos_pdf(rows, output_path, total=None, agrupar_por=None, progress=None):
+    """Escribe el PDF de inventario a partir de un iterable de filas.
+
+    `rows` trae (código, nombre, marca, estado, ubicación, costo, grupo) en el
+    orden del reporte; con `agrupar_por` cada grupo lleva su título y subtotal.
+    Devuelve el número de filas y de páginas.
+    """
+    progress = progress or (lambda *args, **kwargs: None)
+    doc = StreamingDocument(output_path)
+    styles = getSampleStyleSheet()
+
+    title_style = ParagraphStyle('TitleCustom', parent=styles['Title'], fontSize=16, spaceAfter=20, textColor=colors.navy)
+    subtitle_style = ParagraphStyle('SubTitleCustom', parent=styles['Normal'], fontSize=10, textColor=colors.grey)
+    header_style = ParagraphStyle('HeaderCustom', parent=styles['Normal'], fontSize=12, alignment=TA_CENTER)
+
+    doc.add(Paragraph("UNIVERSIDAD NACIONAL DE TRUJILLO", title_style))
+    doc.add(Paragraph("Dirección de Tecnologías de Información", header_style))
+    doc.add(Spacer(1, 10))
+    doc.add(Paragraph(f"Fecha de Emisión: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", subtitle_style))
+    doc.add(Spacer(1, 25))
+
+    doc.add(Paragraph("Detalle de Inventario", styles['Heading2']))
+
+    writer = TableWriter(doc)
+    group_title = GROUPS[agrupar_por][0] if agrupar_por else None
+    count, cost = 0, Decimal(0)
+    group, group_count, group_cost = None, 0, Decimal(0)
+
+    def close_group():
+        writer.add([f"Subtotal {group}: {group_count} equipos", '', '', '', '', money(group_cost)], SUBTOTAL_STYLE)
+        writer.flush()
+
+    for row in rows:
+        if group_title and (count == 0 or row[6] != group):
+            if count:
+                close_group()
+            group, group_count, group_cost = row[6], 0, Decimal(0)
+            heading = Paragraph(f"{group_title}: {group}", styles['Heading3'])
+            # Que el título no quede solo al pie de la página
+            doc.ensure(heading.wrapOn(doc.canv, doc.width, doc.page_height)[1] + writer.header_height + writer.row_height * 2)
+            doc.add(heading)
+        writer.add([
+            str(row[0]), str(row[1])[:20], str(row[2]) if row[2] else '-',
+            str(row[3]), str(row[4])[:20], money(row[5])
+        ])
+        count += 1
+        group_count += 1
+        row_cost = Decimal(row[5] or 0)
+        cost += row_cost
+        group_cost += row_cost
+        if total and count % FETCH_SIZE == 0:
+            progress(0.05 + 0.9 * count / total, f"{count} de {total} equipos")
+
+    if not count:
+        doc.add(Paragraph("No hay datos para mostrar", styles['Normal']))
+    else:
+        if group_title:
+            close_group()
+        writer.flush()
+        doc.add(Spacer(1, 10))
+        doc.add(Paragraph(f"Total general: {count} equipos, {money(cost)}", styles['Heading4']))
+
+    doc.add(Spacer(1, 30))
+    doc.add(Paragraph("Generado por Sistema de Gestión TI v1.0", subtitle_style))
+    progress(0.97, "Guardando PDF", force=True)
+    doc.save()
+    return {"filas": count, "paginas": doc.pages}
+
+
+def render_equipos_pdf(db_config, output_path, progress_path=None, agrupar_por=None):
+    progress = Progress(progress_path)
+    progress(0.01, "Consultando equipos", force=True)
+    conn = connect(db_config)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM equipos")
+            total = cur.fetchone()[0]
+        result = write_equipos_pdf(
+            stream_rows(conn, equipos_query(agrupar_por)), output_path, total, agrupar_por, progress
+        )
+    finally:
+        # Si el render falla a mitad, cerrar la conexión evita drenar las filas pendientes
+        conn.close()
+    progress(1.0, "Listo", force=True)
+    return result
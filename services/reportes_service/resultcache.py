@@ -0,0 +1,149 @@
+import asyncio
+import functools
+import os
+import time
+from collections import Counter, OrderedDict, defaultdict
+from common.refcache import reference_cache
+
+# Vida de un resultado; pasado el TTL se sirve viejo mientras se recalcula en segundo plano
+TTL = float(os.getenv("REPORT_CACHE_TTL", 300))
+STALE_TTL = float(os.getenv("REPORT_CACHE_STALE_TTL", 600))
+MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", 256))
+
+
+class _Entry:
+    def __init__(self, value, versions):
+        self.value = value
+        self.versions = versions
+        self.created_at = time.monotonic()
+
+
+class ResultCache:
+    """Resultados de los reportes en memoria, por endpoint y parámetros.
+
+    Cada endpoint declara de qué tablas depende; su versión en
+    cambios_referencia la suben los endpoints que escriben (equipos,
+    mantenimientos, categorías, ubicaciones), una vez por petición. Si cambió alguna, el
+    resultado se recalcula al momento; si solo venció el TTL, se sirve el
+    anterior y se recalcula en segundo plano (stale-while-revalidate).
+    """
+
+    def __init__(self, ttl=TTL, stale_ttl=STALE_TTL, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # Los locks se crean dentro del event loop (en 3.9 se atan al loop al crearse)
+        self.locks = {}
+        self.refreshing = set()
+        # Referencia a las tareas de refresco para que no se recolecten a medias
+        self.tasks = set()
+        self.stats_by_endpoint = defaultdict(Counter)
+
+    def _store(self, key, value, versions):
+        self.entries[key] = _Entry(value, versions)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            evicted, _ = self.entries.popitem(last=False)
+            lock = self.locks.get(evicted)
+            if lock is not None and not lock.locked():
+                del self.locks[evicted]
+            self.stats_by_endpoint[evicted[0]]["evictions"] += 1
+
+    async def _load(self, key, tables, loader):
+        lock = self.locks.get(key)
+        if lock is None:
+            lock = self.locks[key] = asyncio.Lock()
+        async with lock:
+            # Otra petición pudo recalcularlo mientras esperábamos el lock
+            versions = await self._versions(tables)
+            entry = self.entries.get(key)
+            if entry is not None and entry.versions == versions and time.monotonic() - entry.created_at < self.ttl:
+                return entry.value
+            self.stats_by_endpoint[key[0]]["loads"] += 1
+            value = await loader()
+            self._store(key, value, versions)
+            return value
+
+    async def _refresh(self, key, tables, loader):
+        try:
+            await self._load(key, tables, loader)
+        except Exception as e:
+            print(f"❌ Recalculando {key[0]} en segundo plano: {e}")
+        finally:
+            self.refreshing.discard(key)
+
+    @staticmethod
+    async def _versions(tables):
+        versions = await reference_cache.current_versions()
+        return tuple(versions.get(table, 0) for table in tables)
+
+    async def get(self, endpoint, params, tables, loader, fallback=None):
+        key = (endpoint, tuple(sorted(params.items())))
+        stats = self.stats_by_endpoint[endpoint]
+        try:
+            versions = await self._versions(tables)
+        except Exception as e:
+            # Sin poder comprobar versiones se sirve lo que haya
+            print(f"❌ Versiones de {endpoint}: {e}")
+            versions = None
+        entry = self.entries.get(key)
+
+        if entry is not None and versions is not None:
+            if entry.versions != versions:
+                stats["invalidations"] += 1
+            else:
+                age = time.monotonic() - entry.created_at
+                if age < self.ttl:
+                    stats["hits"] += 1
+                    self.entries.move_to_end(key)
+                    return entry.value
+                if age < self.ttl + self.stale_ttl:
+                    stats["stale"] += 1
+                    if key not in self.refreshing:
+                        self.refreshing.add(key)
+                        task = asyncio.create_task(self._refresh(key, tables, loader))
+                        self.tasks.add(task)
+                        task.add_done_callback(self.tasks.discard)
+                    return entry.value
+
+        stats["misses"] += 1
+        try:
+            return await self._load(key, tables, loader)
+        except Exception as e:
+            print(f"Error DB: {e}")
+            if entry is not None:
+                # Mejor un resultado anterior que una respuesta vacía
+                stats["stale_on_error"] += 1
+                return entry.value
+            return fallback
+
+    def cached(self, endpoint, *tables, fallback=None):
+        # Decorador para endpoints: la clave incluye sus parámetros de consulta
+        def decorator(fn):
+            @functools.wraps(fn)
+            async def wrapper(**kwargs):
+                return await self.get(endpoint, kwargs, tables, lambda: fn(**kwargs), fallback)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        endpoints = {}
+        for endpoint, counts in self.stats_by_endpoint.items():
+            served = counts["hits"] + counts["stale"] + counts["misses"]
+            endpoints[endpoint] = {
+                **counts,
+                "entries": sum(1 for key in self.entries if key[0] == endpoint),
+                "hit_ratio": round((counts["hits"] + counts["stale"]) / served, 3) if served else None,
+            }
+        return {
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "max_entries": self.max_entries,
+            "entries": len(self.entries),
+            "refreshing": len(self.refreshing),
+            "endpoints": endpoints,
+        }
+
+
+report_cache = ResultCache()
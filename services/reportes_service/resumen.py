@@ -0,0 +1,133 @@
+import asyncio
+import os
+import time
+from common.db import db
+from common.metrics import timed_execute
+
+# Cada cuánto se recalculan los contadores del dashboard desde las tablas base
+RECONCILE_INTERVAL = float(os.getenv("DASHBOARD_RECONCILE_INTERVAL", 3600))
+RECONCILE_LOCK = "resumen_dashboard"
+
+# Dos lecturas por PK: la fila de contadores y la del mes en curso
+DASHBOARD_QUERY = """
+    SELECT r.total_equipos, r.equipos_operativos, r.valor_inventario,
+           COALESCE(m.cantidad, 0), COALESCE(m.costo, 0)
+    FROM resumen_dashboard r
+    LEFT JOIN resumen_mantenimientos_mes m
+      ON m.mes = CURRENT_DATE() - INTERVAL (DAYOFMONTH(CURRENT_DATE()) - 1) DAY
+    WHERE r.id = 1
+"""
+
+EQUIPOS_QUERY = """
+    SELECT COUNT(*), COALESCE(SUM(estado_operativo <=> 'operativo'), 0), COALESCE(SUM(costo_compra), 0)
+    FROM equipos
+"""
+MESES_QUERY = """
+    SELECT fecha_programada - INTERVAL (DAYOFMONTH(fecha_programada) - 1) DAY AS mes, COUNT(*), COALESCE(SUM(costo), 0)
+    FROM mantenimientos
+    WHERE fecha_programada IS NOT NULL
+    GROUP BY mes
+"""
+
+last_run = {"fecha": None, "duracion_ms": None, "deriva": None, "error": None}
+
+
+async def _snapshot(cur):
+    """Contadores y recuento real leídos en una misma instantánea, sin bloquear.
+
+    Los endpoints actualizan el resumen en la transacción de la fila base
+    (common/resumen.py), así que en la instantánea ambos son coherentes: la diferencia es deriva real y
+    no una escritura a medio confirmar.
+    """
+    await timed_execute(cur, "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+    await timed_execute(cur, "START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+    try:
+        await timed_execute(cur, "SELECT total_equipos, equipos_operativos, valor_inventario FROM resumen_dashboard WHERE id = 1")
+        current = await cur.fetchone()
+        await timed_execute(cur, "SELECT mes, cantidad, costo FROM resumen_mantenimientos_mes")
+        current_months = {row[0]: (row[1], row[2]) for row in await cur.fetchall()}
+        await timed_execute(cur, EQUIPOS_QUERY)
+        expected = await cur.fetchone()
+        await timed_execute(cur, MESES_QUERY)
+        expected_months = {row[0]: (row[1], row[2]) for row in await cur.fetchall()}
+    finally:
+        await timed_execute(cur, "COMMIT")
+    return current, current_months, expected, expected_months
+
+
+async def reconcile():
+    """Recalcula los contadores y corrige la deriva (escrituras por SQL directo).
+
+    Los recuentos sobre las tablas base se hacen en una instantánea sin
+    bloqueos (_snapshot); luego, en una transacción corta, se aplica solo la
+    corrección como incremento (x = x + deriva), que no pisa lo que los
+    endpoints sumen entretanto. Devuelve las diferencias encontradas (vacío si
+    no había deriva).
+    """
+    started = time.perf_counter()
+    drift = {}
+    async with db.acquire() as conn:
+        async with conn.cursor() as cur:
+            await timed_execute(cur, "SELECT GET_LOCK(%s, 0)", (RECONCILE_LOCK,))
+            if (await cur.fetchone())[0] != 1:
+                # Otra instancia está reconciliando; aplicar la corrección dos veces la duplicaría
+                return None
+            try:
+                current, current_months, expected, expected_months = await _snapshot(cur)
+
+                delta = tuple(e - c for e, c in zip(expected, current or (0, 0, 0)))
+                months = {}
+                for mes in expected_months.keys() | current_months.keys():
+                    cantidad, costo = expected_months.get(mes, (0, 0))
+                    antes = current_months.get(mes, (0, 0))
+                    if (cantidad, costo) != antes:
+                        months[mes] = (cantidad - antes[0], costo - antes[1])
+
+                await conn.begin()
+                try:
+                    if current is None or any(delta):
+                        drift["equipos"] = {"antes": current, "despues": expected}
+                    await timed_execute(cur, """
+                        INSERT INTO resumen_dashboard (id, total_equipos, equipos_operativos, valor_inventario, fecha_reconciliacion)
+                        VALUES (1, %s, %s, %s, NOW())
+                        ON DUPLICATE KEY UPDATE total_equipos = total_equipos + VALUES(total_equipos),
+                            equipos_operativos = equipos_operativos + VALUES(equipos_operativos),
+                            valor_inventario = valor_inventario + VALUES(valor_inventario), fecha_reconciliacion = NOW()
+                    """, delta)
+                    if months:
+                        await timed_execute(cur, """
+                            INSERT INTO resumen_mantenimientos_mes (mes, cantidad, costo) VALUES (%s, %s, %s)
+                            ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad), costo = costo + VALUES(costo)
+                        """, [(mes, cantidad, costo) for mes, (cantidad, costo) in months.items()],
+                            statement="UPSERT resumen_mantenimientos_mes", many=True)
+                        # Meses que quedaron sin mantenimientos
+                        await timed_execute(
+                            cur,
+                            f"DELETE FROM resumen_mantenimientos_mes WHERE cantidad = 0 AND mes IN ({', '.join(['%s'] * len(months))})",
+                            tuple(months),
+                        )
+                        drift["meses"] = {str(mes): current_months.get(mes) for mes in months}
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    raise
+            finally:
+                await timed_execute(cur, "SELECT RELEASE_LOCK(%s)", (RECONCILE_LOCK,))
+
+    if drift:
+        print(f"⚠️ Contadores del dashboard corregidos: {drift}")
+    last_run.update(
+        fecha=time.time(), duracion_ms=round((time.perf_counter() - started) * 1000, 1), deriva=drift or None, error=None
+    )
+    return drift
+
+
+async def keep_reconciled():
+    # Primera pasada al arrancar y luego cada RECONCILE_INTERVAL
+    while True:
+        try:
+            await reconcile()
+        except Exception as e:
+            last_run.update(fecha=time.time(), error=str(e))
+            print(f"❌ Reconciliación del dashboard: {e}")
+        await asyncio.sleep(RECONCILE_INTERVAL)
@@ -0,0 +1,356 @@
+"""Exportación de inventario, mantenimientos y costos a Excel (xlsx) y CSV.
+
+Cada hoja es una consulta que se lee con un cursor sin buffer. El xlsx se
+arma con un workbook write-only de openpyxl en un hilo aparte y cada hoja se
+escribe directo en su entrada del ZIP de la respuesta: el cliente recibe bytes
+a medida que se leen las filas y la memoria no depende de cuántas sean.
+"""
+import asyncio
+import os
+import threading
+from datetime import datetime
+from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import date
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._writer import WorksheetWriter
+from openpyxl.writer.excel import ExcelWriter
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from common.db import db
+import render
+
+# Bytes por fragmento enviado y fragmentos en cola antes de frenar al hilo que escribe
+CHUNK_SIZE = int(os.getenv("XLSX_CHUNK_SIZE", 64 * 1024))
+QUEUE_CHUNKS = int(os.getenv("XLSX_QUEUE_CHUNKS", 16))
+# Exportaciones xlsx simultáneas (cada una ocupa un hilo y una conexión)
+MAX_CONCURRENT = int(os.getenv("XLSX_MAX_CONCURRENT", 4))
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+NUMBER_FORMATS = {
+    "fecha": "DD/MM/YYYY",
+    "fecha_hora": "DD/MM/YYYY HH:MM",
+    "moneda": "#,##0.00",
+    "entero": "0",
+}
+
+# hoja -> título, columnas (clave, encabezado, formato, ancho) y consulta; desde/hasta filtran por `fecha`
+SHEETS = {
+    "equipos": {
+        "titulo": "Equipos",
+        "columnas": [
+            ("id", "ID", "entero", 8),
+            ("codigo_inventario", "Código", None, 16),
+            ("nombre", "Equipo", None, 30),
+            ("categoria", "Categoría", None, 18),
+            ("marca", "Marca", None, 14),
+            ("modelo", "Modelo", None, 16),
+            ("numero_serie", "N° de serie", None, 18),
+            ("proveedor", "Proveedor", None, 24),
+            ("ubicacion", "Ubicación", None, 24),
+            ("estado_operativo", "Estado operativo", None, 16),
+            ("estado_fisico", "Estado físico", None, 14),
+            ("fecha_compra", "Fecha de compra", "fecha", 14),
+            ("costo_compra", "Costo de compra", "moneda", 16),
+            ("fecha_garantia_fin", "Fin de garantía", "fecha", 14),
+            ("fecha_registro", "Registrado", "fecha_hora", 18),
+        ],
+        "consulta": f"""
+            SELECT e.id, e.codigo_inventario, e.nombre, c.nombre AS categoria, e.marca, e.modelo,
+                   e.numero_serie, p.razon_social AS proveedor, {render.UBICACION} AS ubicacion,
+                   e.estado_operativo, e.estado_fisico, e.fecha_compra, e.costo_compra,
+                   e.fecha_garantia_fin, e.fecha_registro
+            FROM equipos e
+            LEFT JOIN categorias_equipos c ON e.categoria_id = c.id
+            LEFT JOIN proveedores p ON e.proveedor_id = p.id
+            LEFT JOIN ubicaciones u ON e.ubicacion_actual_id = u.id
+            {{where}}
+            ORDER BY e.id
+        """,
+        "fecha": None,
+    },
+    "mantenimientos": {
+        "titulo": "Mantenimientos",
+        "columnas": [
+            ("id", "ID", "entero", 8),
+            ("codigo_inventario", "Código", None, 16),
+            ("equipo_nombre", "Equipo", None, 30),
+            ("tipo", "Tipo", None, 14),
+            ("estado", "Estado", None, 14),
+            ("prioridad", "Prioridad", None, 10),
+            ("fecha_programada", "Programado", "fecha", 14),
+            ("fecha_realizada", "Realizado", "fecha", 14),
+            ("costo", "Costo", "moneda", 14),
+            ("descripcion", "Descripción", None, 40),
+            ("observaciones", "Observaciones", None, 40),
+        ],
+        "consulta": """
+            SELECT m.id, e.codigo_inventario, e.nombre AS equipo_nombre, m.tipo, m.estado, m.prioridad,
+                   m.fecha_programada, m.fecha_realizada, m.costo, m.descripcion, m.observaciones
+            FROM mantenimientos m
+            LEFT JOIN equipos e ON m.equipo_id = e.id
+            {where}
+            ORDER BY m.id
+        """,
+        "fecha": "m.fecha_programada",
+    },
+    "costos": {
+        "titulo": "Costos",
+        "columnas": [
+            ("mes", "Mes", "fecha", 12),
+            ("categoria", "Categoría", None, 18),
+            ("tipo", "Tipo", None, 14),
+            ("cantidad", "Mantenimientos", "entero", 16),
+            ("costo_total", "Costo total", "moneda", 16),
+            ("costo_promedio", "Costo promedio", "moneda", 16),
+        ],
+        # Costo realizado por mes, categoría y tipo de mantenimiento
+        "consulta": """
+            SELECT m.fecha_realizada - INTERVAL (DAYOFMONTH(m.fecha_realizada) - 1) DAY AS mes,
+                   IFNULL(c.nombre, 'Sin categoría') AS categoria, m.tipo,
+                   COUNT(*) AS cantidad, COALESCE(SUM(m.costo), 0) AS costo_total,
+                   CAST(COALESCE(AVG(m.costo), 0) AS DECIMAL(12, 2)) AS costo_promedio
+            FROM mantenimientos m
+            LEFT JOIN equipos e ON m.equipo_id = e.id
+            LEFT JOIN categorias_equipos c ON e.categoria_id = c.id
+            WHERE m.fecha_realizada IS NOT NULL {and_where}
+            GROUP BY mes, categoria, m.tipo
+            ORDER BY mes, categoria, m.tipo
+        """,
+        "fecha": "m.fecha_realizada",
+    },
+}
+
+
+class ExportBusy(Exception):
+    pass
+
+
+def sheet_query(name, desde=None, hasta=None):
+    """Consulta y parámetros de una hoja con el rango de fechas aplicado."""
+    sheet = SHEETS[name]
+    where, params = [], []
+    if sheet["fecha"]:
+        for clause, value in ((f"{sheet['fecha']} >= %s", desde), (f"{sheet['fecha']} <= %s", hasta)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+    query = sheet["consulta"].format(
+        where=f"WHERE {' AND '.join(where)}" if where else "",
+        and_where="".join(f" AND {clause}" for clause in where),
+    )
+    return query, tuple(params)
+
+
+def columns(name):
+    return [key for key, _, _, _ in SHEETS[name]["columnas"]]
+
+
+class _QueueWriter:
+    """Archivo de solo escritura que pasa los bytes al event loop en fragmentos.
+
+    No admite seek: zipfile lo detecta y escribe el ZIP en modo streaming.
+    Si la cola está llena el hilo espera, así que un cliente lento frena la
+    escritura en vez de acumular el archivo en memoria.
+    """
+
+    def __init__(self, loop, queue, cancelled):
+        self.loop = loop
+        self.queue = queue
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+        # Ya se avisó del corte: lo que zipfile/openpyxl escriban al cerrarse se descarta
+        self.aborted = False
+
+    def _put(self, item):
+        future = asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop)
+        while True:
+            if self.cancelled.is_set():
+                future.cancel()
+                self._abort()
+            try:
+                return future.result(timeout=1)
+            except FutureTimeout:
+                continue
+
+    def _abort(self):
+        self.aborted = True
+        self.buffer.clear()
+        raise ConnectionAbortedError("El cliente cerró la descarga")
+
+    def write(self, data):
+        if self.aborted:
+            return len(data)
+        if self.cancelled.is_set():
+            # Siempre, aunque el buffer esté vacío: el hilo deja de leer filas
+            self._abort()
+        self.buffer += data
+        if len(self.buffer) >= CHUNK_SIZE:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.aborted or self.cancelled.is_set():
+            self.buffer.clear()
+            return
+        if self.buffer:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+
+
+class _StreamedExcelWriter(ExcelWriter):
+    # Las hojas ya están en su entrada del ZIP: solo se registran en el manifiesto
+    def write_worksheet(self, ws):
+        ws._drawing = None
+        ws._rels = ws._writer._rels
+        self.manifest.append(ws)
+
+
+class _StreamedWorkbook:
+    """Único punto que toca internos de openpyxl (WorksheetWriter, ws._writer,
+    ws._drawing, ws._rels); openpyxl va fijado en requirements.txt y
+    tests/test_spreadsheets.py relee el archivo para detectar si cambian.
+
+    openpyxl escribe cada hoja write-only en un temporal y la copia al ZIP en
+    save(); aquí cada hoja se escribe directo en su entrada del ZIP.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.wb = Workbook(write_only=True)
+        self.wb.properties.modified = datetime.utcnow()
+
+    def create_sheet(self, title):
+        return self.wb.create_sheet(title)
+
+    def open_sheet(self, ws, entry):
+        ws._writer = WorksheetWriter(ws, out=entry)
+        ws._writer.write_top()
+
+    def save(self):
+        # Libro, estilos y manifiesto al final, cuando ya se conocen todas las hojas
+        _StreamedExcelWriter(self.wb, self.archive).save()
+
+
+def write_xlsx(fileobj, db_config, names, desde=None, hasta=None):
+    """Escribe un xlsx con una hoja por nombre en `names` (corre en un hilo)."""
+    archive = ZipFile(fileobj, "w", ZIP_DEFLATED, allowZip64=True)
+    wb = _StreamedWorkbook(archive)
+    bold = Font(bold=True)
+    conn = render.connect(db_config)
+    try:
+        for index, name in enumerate(names, 1):
+            sheet = SHEETS[name]
+            ws = wb.create_sheet(sheet["titulo"])
+            for column, (_, _, _, width) in enumerate(sheet["columnas"], 1):
+                ws.column_dimensions[get_column_letter(column)].width = width
+            ws.freeze_panes = "A2"
+            header = []
+            for _, title, _, _ in sheet["columnas"]:
+                cell = WriteOnlyCell(ws, value=title)
+                cell.font = bold
+                header.append(cell)
+
+            formats = [NUMBER_FORMATS.get(fmt) for _, _, fmt, _ in sheet["columnas"]]
+            query, params = sheet_query(name, desde, hasta)
+            info = ZipInfo(f"xl/worksheets/sheet{index}.xml", date_time=datetime.now().timetuple()[:6])
+            info.compress_type = ZIP_DEFLATED
+            with archive.open(info, "w", force_zip64=True) as entry:
+                wb.open_sheet(ws, entry)
+                try:
+                    ws.append(header)
+                    for row in render.stream_rows(conn, query, params):
+                        cells = []
+                        for value, number_format in zip(row, formats):
+                            if number_format and value is not None:
+                                # Celdas tipadas: fechas y montos quedan como fecha/número en Excel
+                                cell = WriteOnlyCell(ws, value=value)
+                                cell.number_format = number_format
+                                cells.append(cell)
+                            else:
+                                cells.append(value)
+                        ws.append(cells)
+                finally:
+                    # También si se cortó: el XML de la hoja se cierra con la entrada aún abierta
+                    ws.close()
+        wb.save()
+    finally:
+        # Cerrar sin drenar si se cortó a mitad de una hoja
+        conn.close()
+    fileobj.close()
+
+
+_active = 0
+
+
+class _Slot:
+    """Cupo de una exportación: se toma al aceptar la petición y se devuelve una vez."""
+
+    def __init__(self):
+        global _active
+        _active += 1
+        self.released = False
+
+    def release(self):
+        global _active
+        if not self.released:
+            self.released = True
+            _active -= 1
+
+
+async def stream_xlsx(slot, names, desde=None, hasta=None):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    done = object()
+    failure = []
+
+    def produce():
+        try:
+            write_xlsx(_QueueWriter(loop, queue, cancelled), db.read_config(), names, desde, hasta)
+        except Exception as e:
+            if not cancelled.is_set():
+                print(f"❌ ERROR EXPORTANDO XLSX: {e}")
+                failure.append(e)
+        finally:
+            if not cancelled.is_set():
+                asyncio.run_coroutine_threadsafe(queue.put(done), loop)
+
+    thread = threading.Thread(target=produce, name="xlsx-export", daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is done:
+                break
+            yield chunk
+        if failure:
+            # Los encabezados ya salieron: cortar la respuesta es la única señal posible
+            raise failure[0]
+    finally:
+        cancelled.set()
+        slot.release()
+
+
+def xlsx_response(names, desde=None, hasta=None):
+    # El cupo se reserva aquí y no al empezar el cuerpo: una ráfaga de peticiones
+    # vería _active sin incrementar y pasaría el límite
+    if _active >= MAX_CONCURRENT:
+        raise ExportBusy("Demasiadas exportaciones en curso, intente nuevamente en unos segundos")
+    slot = _Slot()
+    filename = f"inventario_{date.today().isoformat()}.xlsx"
+    return StreamingResponse(
+        stream_xlsx(slot, names, desde, hasta),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+        # Si el cuerpo nunca se recorre (el cliente cortó antes) el finally no corre
+        background=BackgroundTask(slot.release),
+    )
@@ -0,0 +1,30 @@
+import jobs
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.shutdown_calls = []
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdown_calls.append(wait)
+
+
+def test_broken_executor_replaced_once(monkeypatch):
+    manager = jobs.JobManager()
+    created = []
+
+    def new_executor():
+        created.append(FakeExecutor())
+        return created[-1]
+
+    monkeypatch.setattr(manager, "_new_executor", new_executor)
+    broken = manager.executor = FakeExecutor()
+
+    # Tres trabajos que corrían en el pool roto
+    replacements = [manager._replace_executor(broken) for _ in range(3)]
+
+    assert len(created) == 1
+    assert replacements == [created[0]] * 3
+    assert manager.executor is created[0]
+    assert broken.shutdown_calls == [False]
+    assert created[0].shutdown_calls == []
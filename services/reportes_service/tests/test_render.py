@@ -0,0 +1,46 @@
+import base64
+import re
+import zlib
+import render
+
+OBJECT = re.compile(rb"(\d+) 0 obj\s*<<((?:(?!endobj).)*?)>>\s*stream\r?\n", re.S)
+PAGE = re.compile(rb"/Contents (\d+) 0 R[^\n]*\n(?:.*?\n)*?\s*/Type /Page\n", re.S)
+
+
+def rows(n, groups=3):
+    for i in range(n):
+        ubicacion = f"Pabellón {i * groups // n}"
+        yield (f"UNT-{i:05d}", f"Equipo {i}", "Dell" if i % 2 else None, "operativo", ubicacion, 100 + i, ubicacion)
+
+
+def streams(data):
+    """Contenido de cada stream del PDF, por número de objeto."""
+    found = {}
+    for match in OBJECT.finditer(data):
+        length = int(re.search(rb"/Length (\d+)", match.group(2)).group(1))
+        start = match.end()
+        found[int(match.group(1))] = (match.group(2), data[start:start + length])
+    return found
+
+
+def decode(header, body):
+    # Las páginas cerradas las comprime StreamingDocument; la última, save() (ASCII85 + Flate)
+    assert b"/FlateDecode" in header
+    if b"/ASCII85Decode" in header:
+        body = base64.a85decode(body.strip().removesuffix(b"~>"))
+    return zlib.decompress(body)
+
+
+def test_every_page_stream_decompresses(tmp_path):
+    path = tmp_path / "inventario.pdf"
+    result = render.write_equipos_pdf(rows(300), str(path), 300, "ubicacion")
+    data = path.read_bytes()
+    assert result["filas"] == 300
+    pages = [int(n) for n in PAGE.findall(data)]
+    assert len(pages) == result["paginas"] > 1
+    found = streams(data)
+    for number, obj in enumerate(pages, 1):
+        text = decode(*found[obj])
+        # Cada página lleva su pie; las de tabla, la cabecera repetida
+        assert f"gina {number}".encode() in text
+    assert b"Subtotal" in decode(*found[pages[-1]])
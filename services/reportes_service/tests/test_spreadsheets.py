@@ -0,0 +1,120 @@
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from io import BytesIO
+import pytest
+from openpyxl import load_workbook
+import render
+import spreadsheets
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Sink:
+    """Archivo sin seek, como la respuesta: zipfile escribe en modo streaming."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        raise OSError("sin seek")
+
+    def close(self):
+        pass
+
+
+ROWS = {
+    "equipos": [
+        (1, "UNT-001", "Laptop", "Laptops", "Dell", "5420", "SN1", "ACME", "A - 101",
+         "operativo", "bueno", date(2024, 3, 1), Decimal("3500.50"), None, datetime(2024, 3, 2, 10, 30)),
+        (2, "UNT-002", "Proyector", None, None, None, None, None, None,
+         "baja", None, None, None, None, datetime(2024, 4, 1, 8, 0)),
+    ],
+    "mantenimientos": [
+        (7, "UNT-001", "Laptop", "preventivo", "completado", "alta",
+         date(2024, 5, 1), date(2024, 5, 3), Decimal("120.00"), "Limpieza", None),
+    ],
+}
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(render, "connect", lambda db_config: conn)
+    return conn
+
+
+def test_xlsx_round_trip(monkeypatch, fake_db):
+    def stream_rows(conn, query, params=None):
+        name = "mantenimientos" if "FROM mantenimientos" in query else "equipos"
+        return iter(ROWS[name])
+
+    monkeypatch.setattr(render, "stream_rows", stream_rows)
+    sink = Sink()
+    spreadsheets.write_xlsx(sink, {}, ["equipos", "mantenimientos"])
+    assert fake_db.closed
+
+    wb = load_workbook(BytesIO(bytes(sink.data)))
+    assert wb.sheetnames == ["Equipos", "Mantenimientos"]
+    ws = wb["Equipos"]
+    assert ws.freeze_panes == "A2"
+    assert [c.value for c in ws[1]] == [title for _, title, _, _ in spreadsheets.SHEETS["equipos"]["columnas"]]
+    assert ws[1][0].font.bold
+    first = ws[2]
+    assert first[1].value == "UNT-001"
+    assert first[11].value == datetime(2024, 3, 1)
+    assert first[11].number_format == "DD/MM/YYYY"
+    assert first[12].value == pytest.approx(3500.5)
+    assert first[12].number_format == "#,##0.00"
+    assert ws.max_row == 3
+    mant = wb["Mantenimientos"]
+    assert mant[2][8].value == pytest.approx(120.0)
+    assert mant.column_dimensions["J"].width == 40
+
+
+def test_cancel_with_empty_buffer_stops_reading(monkeypatch, fake_db):
+    # Corte justo después de enviar un fragmento: el buffer queda vacío
+    monkeypatch.setattr(spreadsheets, "CHUNK_SIZE", 1024)
+    cancelled = threading.Event()
+    writer = spreadsheets._QueueWriter(None, None, cancelled)
+    sent = []
+
+    def put(item):
+        sent.append(item)
+        cancelled.set()
+
+    monkeypatch.setattr(writer, "_put", put)
+    read = []
+
+    def stream_rows(conn, query, params=None):
+        for i in range(100000):
+            read.append(i)
+            yield ROWS["equipos"][0]
+
+    monkeypatch.setattr(render, "stream_rows", stream_rows)
+    with pytest.raises(ConnectionAbortedError):
+        spreadsheets.write_xlsx(writer, {}, ["equipos"])
+    assert fake_db.closed
+    assert len(sent) == 1
+    # Se deja de leer en la próxima escritura; el XML de la hoja guarda unos
+    # cientos de filas en su propio buffer antes de escribir
+    assert len(read) < 5000
+    # Lo que se escriba al cerrar después del corte se descarta sin error
+    assert writer.write(b"x") == 1
+    writer.close()